@@ -1,31 +1,80 @@
 """CLI entry point for the builder module."""
 
 import argparse
+import atexit
+import hashlib
+import io
 import sys
+from pathlib import Path
 
 from . import artifacts
+from . import dedupe
+from . import packing
+from . import timing
+from . import yamlio
 from .context import BuildContext
+from .deps import DEFAULT_DEPS_DIR, write_dependency_files
+from .fleet import render_fleet
 from .renderer import (
     render_script,
+    render_scripts_to_dir,
     render_cloud_init_to_file,
     render_autoinstall_to_file,
+    render_all,
+    render_cloud_init_layers_to_files,
     get_available_fragments,
+    compile_templates,
+    get_render_cache,
+    save_config_reads,
+    track_config_reads,
+    use_render_cache,
+    BuildPlan,
+    TEMPLATE_BUNDLE_PATH,
 )
 
 
+def print_cache_stats():
+    """Print render cache statistics to stderr."""
+    cache = get_render_cache()
+    if cache is None:
+        return
+    stats = cache.stats()
+    print(f"Render cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['evictions']} evicted, {stats['entries']} entries ({stats['bytes']} bytes)",
+          file=sys.stderr)
+
+
+def print_results(results):
+    """Print each artifact path as generated or up to date."""
+    for path, written in results.items():
+        print(f"{'Generated' if written else 'Up to date'}: {path}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         prog='builder',
         description='Build deployment artifacts from templates'
     )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Print per-stage and per-fragment timings to stderr when done'
+    )
+    parser.add_argument(
+        '--trace',
+        metavar='FILE',
+        help='Write a Chrome/Perfetto trace-event JSON file of the run'
+    )
     subparsers = parser.add_subparsers(dest='command')
 
     # render subcommand
     render_parser = subparsers.add_parser('render', help='Render templates')
     render_parser.add_argument(
         'target',
-        choices=['script', 'cloud-init', 'autoinstall'],
-        help='Type of artifact to render'
+        choices=['script', 'scripts', 'cloud-init', 'autoinstall', 'all', 'fleet'],
+        help='Type of artifact to render ("scripts", "all" and "fleet" write into the '
+             '--output directory; "all" renders scripts, cloud-init.yaml and '
+             'user-data in one pass; "fleet" does so for every host in --hosts)'
     )
     render_parser.add_argument(
         'input',
@@ -35,7 +84,7 @@ def main():
     render_parser.add_argument(
         '-o', '--output',
         required=True,
-        help='Output file path'
+        help='Output file path (directory for scripts, all and fleet targets)'
     )
     render_parser.add_argument(
         '-c', '--config-dir',
@@ -62,11 +111,70 @@ def main():
         metavar='LAYER',
         help='Include fragments up to build_layer N'
     )
+    render_parser.add_argument(
+        '--all-layers',
+        action='store_true',
+        help='Render cloud-init for every build layer in one pass, writing '
+             '<output stem>.layer-NN<suffix> per layer (cloud-init target)'
+    )
     render_parser.add_argument(
         '--for-iso',
         action='store_true',
         help='Building for ISO (always include iso_required fragments)'
     )
+    render_parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Render fragments (hosts for fleet) in N worker processes (default: 1)'
+    )
+    render_parser.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='Re-render artifacts even if their input fingerprints are unchanged '
+             '(implies --no-cache)'
+    )
+    render_parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Render every template instead of reusing output/.cache/render'
+    )
+    render_parser.add_argument(
+        '--cache-stats',
+        action='store_true',
+        help='Print render cache hits, misses and size to stderr when done'
+    )
+    render_parser.add_argument(
+        '--track-reads',
+        action='store_true',
+        help='Record the config paths each template reads, so later incremental '
+             'renders only rebuild artifacts whose read values changed'
+    )
+    render_parser.add_argument(
+        '--pack',
+        nargs='?',
+        type=int,
+        const=packing.DEFAULT_THRESHOLD,
+        metavar='BYTES',
+        help='Gzip+base64 encode write_files contents of at least BYTES '
+             f'(default: {packing.DEFAULT_THRESHOLD}) in cloud-init and user-data, '
+             'and report the bytes saved per fragment'
+    )
+    render_parser.add_argument(
+        '--dedupe',
+        nargs='?',
+        type=int,
+        const=dedupe.DEFAULT_MIN_SIZE,
+        metavar='CHARS',
+        help='Write repeated strings and subtrees of at least CHARS '
+             f'(default: {dedupe.DEFAULT_MIN_SIZE}) once, as YAML anchors and aliases'
+    )
+    render_parser.add_argument(
+        '--hosts',
+        metavar='DIR',
+        help='Directory of per-host overlay files <host>.yaml (fleet target)'
+    )
 
     # list-fragments subcommand
     list_parser = subparsers.add_parser(
@@ -74,6 +182,316 @@ def main():
         help='List available cloud-init fragments'
     )
 
+    # compile subcommand
+    compile_parser = subparsers.add_parser(
+        'compile',
+        help='Precompile templates into a bundle loaded by later renders'
+    )
+    compile_parser.add_argument(
+        '-o', '--output',
+        default=TEMPLATE_BUNDLE_PATH,
+        help=f'Bundle path (default: {TEMPLATE_BUNDLE_PATH})'
+    )
+
+    # deps subcommand
+    deps_parser = subparsers.add_parser(
+        'deps',
+        help='Write make .d dependency files for the artifacts of "render all"'
+    )
+    deps_parser.add_argument(
+        '-o', '--output',
+        default='output/',
+        help='Output directory the artifacts are rendered into (default: output/)'
+    )
+    deps_parser.add_argument(
+        '-d', '--deps-dir',
+        default=DEFAULT_DEPS_DIR,
+        help=f'Directory for the .d files (default: {DEFAULT_DEPS_DIR})'
+    )
+    deps_parser.add_argument(
+        '-c', '--config-dir',
+        default='src/config',
+        help='Configuration directory (default: src/config)'
+    )
+    deps_parser.add_argument(
+        '-i', '--include',
+        action='append',
+        metavar='FRAGMENT',
+        help='Include only specified fragments, as for render (can be repeated)'
+    )
+    deps_parser.add_argument(
+        '-x', '--exclude',
+        action='append',
+        metavar='FRAGMENT',
+        help='Exclude specified fragments, as for render (can be repeated)'
+    )
+    deps_parser.add_argument(
+        '-l', '--layer',
+        type=int,
+        metavar='LAYER',
+        help='Include fragments up to build_layer N, as for render'
+    )
+    deps_parser.add_argument(
+        '--for-iso',
+        action='store_true',
+        help='Building for ISO (always include iso_required fragments)'
+    )
+
+    # bench subcommand
+    bench_parser = subparsers.add_parser(
+        'bench',
+        help='Time the build pipeline stages on a synthetic fragment tree'
+    )
+    bench_parser.add_argument(
+        '-o', '--output',
+        default='output/bench.json',
+        help='Results JSON path (default: output/bench.json)'
+    )
+    bench_parser.add_argument(
+        '-b', '--baseline',
+        help='Results JSON to compare against; exit 1 if a stage regressed'
+    )
+    bench_parser.add_argument(
+        '-t', '--threshold',
+        type=float,
+        default=0.25,
+        help='Allowed slowdown against the baseline as a fraction (default: 0.25)'
+    )
+    bench_parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=5,
+        help='Samples per stage (default: 5)'
+    )
+    bench_parser.add_argument(
+        '--fragments',
+        type=int,
+        default=200,
+        help='Synthetic fragments to generate (default: 200)'
+    )
+    bench_parser.add_argument(
+        '--payload-kib',
+        type=int,
+        default=16,
+        help='Size of each fragment script in KiB (default: 16)'
+    )
+    bench_parser.add_argument(
+        '--depth',
+        type=int,
+        default=8,
+        help='Nesting depth of the synthetic config (default: 8)'
+    )
+    bench_parser.add_argument(
+        '--env-overrides',
+        type=int,
+        default=200,
+        help='AUTOINSTALL_* environment overrides to apply (default: 200)'
+    )
+
+    # watch subcommand
+    watch_parser = subparsers.add_parser(
+        'watch',
+        help='Render scripts, cloud-init.yaml and user-data, then rebuild them as sources change'
+    )
+    watch_parser.add_argument(
+        '-o', '--output',
+        default='output/',
+        help='Output directory, as for "render all" (default: output/)'
+    )
+    watch_parser.add_argument(
+        '-c', '--config-dir',
+        default='src/config',
+        help='Configuration directory (default: src/config)'
+    )
+    watch_parser.add_argument(
+        '-i', '--include',
+        action='append',
+        metavar='FRAGMENT',
+        help='Include only specified fragments in cloud-init.yaml (can be repeated)'
+    )
+    watch_parser.add_argument(
+        '-x', '--exclude',
+        action='append',
+        metavar='FRAGMENT',
+        help='Exclude specified fragments from cloud-init.yaml (can be repeated)'
+    )
+    watch_parser.add_argument(
+        '-l', '--layer',
+        type=int,
+        metavar='LAYER',
+        help='Include fragments up to build_layer N'
+    )
+    watch_parser.add_argument(
+        '--for-iso',
+        action='store_true',
+        help='Building for ISO (always include iso_required fragments)'
+    )
+    watch_parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Render fragments in N worker processes (default: 1)'
+    )
+    watch_parser.add_argument(
+        '--pack',
+        nargs='?',
+        type=int,
+        const=packing.DEFAULT_THRESHOLD,
+        metavar='BYTES',
+        help='Pack large write_files contents, as for render'
+    )
+    watch_parser.add_argument(
+        '--dedupe',
+        nargs='?',
+        type=int,
+        const=dedupe.DEFAULT_MIN_SIZE,
+        metavar='CHARS',
+        help='Write repeated values as YAML anchors and aliases, as for render'
+    )
+    watch_parser.add_argument(
+        '--poll',
+        nargs='?',
+        type=float,
+        const=0.5,
+        metavar='SECONDS',
+        help='Poll for changes every SECONDS (default: 0.5) instead of using inotify'
+    )
+    watch_parser.add_argument(
+        'paths',
+        nargs='*',
+        metavar='PATH',
+        help='Directories to watch (default: the book-* directories and --config-dir)'
+    )
+
+    # serve subcommand
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help='Serve user-data, meta-data and vendor-data over HTTP as a NoCloud seed'
+    )
+    serve_parser.add_argument(
+        '-c', '--config-dir',
+        default='src/config',
+        help='Configuration directory (default: src/config)'
+    )
+    serve_parser.add_argument(
+        '--hosts',
+        metavar='DIR',
+        help='Directory of per-host overlay files <host>.yaml, served under /<host>/'
+    )
+    serve_parser.add_argument(
+        '--client',
+        action='append',
+        default=[],
+        metavar='IP=HOST',
+        help='Serve HOST\'s overlay to requests from IP at / (can be repeated)'
+    )
+    serve_parser.add_argument(
+        '--document',
+        choices=['autoinstall', 'cloud-init'],
+        default='autoinstall',
+        help='Serve the autoinstall document (default) or the merged cloud-init as user-data'
+    )
+    serve_parser.add_argument(
+        '-i', '--include',
+        action='append',
+        metavar='FRAGMENT',
+        help='Include only specified fragments (cloud-init document, can be repeated)'
+    )
+    serve_parser.add_argument(
+        '-x', '--exclude',
+        action='append',
+        metavar='FRAGMENT',
+        help='Exclude specified fragments (cloud-init document, can be repeated)'
+    )
+    serve_parser.add_argument(
+        '-l', '--layer',
+        type=int,
+        metavar='LAYER',
+        help='Include fragments up to build_layer N (cloud-init document)'
+    )
+    serve_parser.add_argument(
+        '--for-iso',
+        action='store_true',
+        help='Always include iso_required fragments (cloud-init document)'
+    )
+    serve_parser.add_argument(
+        '-b', '--bind',
+        default='127.0.0.1',
+        help='Address to listen on (default: 127.0.0.1); documents include '
+             'password hashes, so only bind where VMs and trusted hosts can reach it'
+    )
+    serve_parser.add_argument(
+        '-p', '--port',
+        type=int,
+        default=8000,
+        help='Port to listen on (default: 8000)'
+    )
+
+    # seed subcommand
+    seed_parser = subparsers.add_parser(
+        'seed',
+        help='Write user-data, meta-data and vendor-data to a CIDATA image (NoCloud seed drive)'
+    )
+    seed_parser.add_argument(
+        '-o', '--output',
+        default='output/seed.iso',
+        help='Image path, or - for stdout (default: output/seed.iso)'
+    )
+    seed_parser.add_argument(
+        '--user-data',
+        metavar='FILE',
+        help='Use an already rendered user-data file instead of rendering one'
+    )
+    seed_parser.add_argument(
+        '--network-config',
+        metavar='FILE',
+        help='Also add FILE to the image as network-config'
+    )
+    seed_parser.add_argument(
+        '-c', '--config-dir',
+        default='src/config',
+        help='Configuration directory (default: src/config)'
+    )
+    seed_parser.add_argument(
+        '--hosts',
+        metavar='DIR',
+        help='Directory of per-host overlay files <host>.yaml'
+    )
+    seed_parser.add_argument(
+        '--host',
+        help='Render with the overlay --hosts/HOST.yaml'
+    )
+    seed_parser.add_argument(
+        '--document',
+        choices=['autoinstall', 'cloud-init'],
+        default='autoinstall',
+        help='Render the autoinstall document (default) or the merged cloud-init as user-data'
+    )
+    seed_parser.add_argument(
+        '-i', '--include',
+        action='append',
+        metavar='FRAGMENT',
+        help='Include only specified fragments (cloud-init document, can be repeated)'
+    )
+    seed_parser.add_argument(
+        '-x', '--exclude',
+        action='append',
+        metavar='FRAGMENT',
+        help='Exclude specified fragments (cloud-init document, can be repeated)'
+    )
+    seed_parser.add_argument(
+        '-l', '--layer',
+        type=int,
+        metavar='LAYER',
+        help='Include fragments up to build_layer N (cloud-init document)'
+    )
+    seed_parser.add_argument(
+        '--for-iso',
+        action='store_true',
+        help='Always include iso_required fragments (cloud-init document)'
+    )
+
     # artifacts subcommand
     artifacts_parser = subparsers.add_parser(
         'artifacts',
@@ -85,14 +503,11 @@ def main():
         help='Action to perform'
     )
     artifacts_parser.add_argument(
-        'name',
-        nargs='?',
-        help='Artifact name (e.g., "iso", "cloud_init", or "scripts:early-net.sh")'
-    )
-    artifacts_parser.add_argument(
-        'value',
-        nargs='?',
-        help='Artifact value (path)'
+        'entries',
+        nargs='*',
+        metavar='NAME=VALUE',
+        help='Artifacts to set, e.g. "iso=output/ubuntu.iso" or "scripts:early-net.sh=PATH" '
+             '(a single "NAME VALUE" pair is also accepted)'
     )
     artifacts_parser.add_argument(
         '-f', '--file',
@@ -106,6 +521,10 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    if args.timings or args.trace:
+        timing.enable()
+        atexit.register(timing.report, timings=args.timings, trace_path=args.trace)
+
     # Handle list-fragments command
     if args.command == 'list-fragments':
         fragments = get_available_fragments()
@@ -117,56 +536,271 @@ def main():
             print(f'  {f}')
         sys.exit(0)
 
+    # Handle compile command
+    if args.command == 'compile':
+        names = compile_templates(args.output)
+        print(f'Compiled {len(names)} templates: {args.output}')
+        sys.exit(0)
+
+    # Handle deps command
+    if args.command == 'deps':
+        written = write_dependency_files(
+            BuildContext(args.config_dir),
+            args.output,
+            deps_dir=args.deps_dir,
+            include=args.include,
+            exclude=args.exclude,
+            layer=args.layer,
+            for_iso=args.for_iso
+        )
+        for path in written:
+            print(f'Generated: {path}')
+        sys.exit(0)
+
+    # Handle bench command
+    if args.command == 'bench':
+        from . import bench
+        results = bench.run_benchmarks(
+            repeat=args.repeat,
+            fragments=args.fragments,
+            payload_kib=args.payload_kib,
+            depth=args.depth,
+            env_overrides=args.env_overrides
+        )
+        bench.save_results(results, args.output)
+        baseline = bench.load_results(args.baseline) if args.baseline else None
+        print(bench.format_results(results, baseline))
+        print(f'Results: {args.output}')
+        if baseline is not None:
+            if baseline.get('params') != results['params']:
+                print('Warning: baseline was run with different parameters', file=sys.stderr)
+            regressions = bench.compare(results, baseline, args.threshold)
+            for stage, before, after in regressions:
+                print(f'Regression: {stage} {before * 1000:.2f} ms -> {after * 1000:.2f} ms',
+                      file=sys.stderr)
+            if regressions:
+                sys.exit(1)
+        sys.exit(0)
+
+    # Handle watch command
+    if args.command == 'watch':
+        from . import watch
+        session = watch.WatchSession(
+            args.config_dir,
+            args.output,
+            include=args.include,
+            exclude=args.exclude,
+            layer=args.layer,
+            for_iso=args.for_iso,
+            jobs=args.jobs,
+            pack_threshold=args.pack,
+            dedupe_min_size=args.dedupe
+        )
+        try:
+            watch.watch(session, args.paths or watch.default_roots(args.config_dir), args.poll)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    # Handle serve command
+    if args.command == 'serve':
+        from . import serve
+        clients = [entry.split('=', 1) for entry in args.client]
+        if any(len(pair) != 2 or not all(pair) for pair in clients):
+            print('Error: --client takes IP=HOST', file=sys.stderr)
+            sys.exit(1)
+        seed = serve.SeedServer(
+            args.config_dir,
+            hosts_dir=args.hosts,
+            clients=dict(clients),
+            document=args.document,
+            include=args.include,
+            exclude=args.exclude,
+            layer=args.layer,
+            for_iso=args.for_iso
+        )
+        unknown = set(seed.clients.values()) - set(seed.hosts())
+        if unknown:
+            print(f"Error: no overlay for --client host(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+            sys.exit(1)
+        try:
+            serve.serve(seed, args.bind, args.port)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    # Handle seed command
+    if args.command == 'seed':
+        from . import cidata
+        from . import serve
+        if args.user_data:
+            with open(args.user_data, 'rb') as f:
+                user_data = f.read()
+            files = {
+                'user-data': user_data,
+                'meta-data': f'instance-id: iid-{hashlib.sha256(user_data).hexdigest()[:16]}\n'.encode(),
+                'vendor-data': serve.VENDOR_DATA,
+            }
+        else:
+            seed = serve.SeedServer(
+                args.config_dir,
+                hosts_dir=args.hosts,
+                document=args.document,
+                include=args.include,
+                exclude=args.exclude,
+                layer=args.layer,
+                for_iso=args.for_iso
+            )
+            try:
+                host = seed.host_for(args.host, None)
+            except KeyError:
+                print(f'Error: no overlay for host {args.host} in --hosts', file=sys.stderr)
+                sys.exit(1)
+            files = seed.documents(host)
+        if args.network_config:
+            with open(args.network_config, 'rb') as f:
+                files['network-config'] = f.read()
+
+        if args.output == '-':
+            cidata.write_image(sys.stdout.buffer, files)
+            sys.exit(0)
+        image = io.BytesIO()
+        cidata.write_image(image, files)
+        if artifacts.write(None, 'seed', args.output, content=image.getvalue()):
+            print(f'Generated: {args.output}')
+        else:
+            print(f'Up to date: {args.output}')
+        sys.exit(0)
+
     # Handle artifacts command
     if args.command == 'artifacts':
         if args.action == 'show':
             data = artifacts.load(args.file)
             if data:
-                import yaml
-                print(yaml.dump(data, default_flow_style=False, sort_keys=False))
+                print(yamlio.dump(data, default_flow_style=False, sort_keys=False))
             else:
                 print('No artifacts found')
             sys.exit(0)
 
         if args.action == 'set':
-            if not args.name or not args.value:
-                print('Error: name and value required for set action', file=sys.stderr)
-                sys.exit(1)
-
-            # Parse "category:name" or just "name" for top-level
-            if ':' in args.name:
-                category, name = args.name.split(':', 1)
+            # Accept the original "NAME VALUE" form as well as NAME=VALUE pairs
+            if len(args.entries) == 2 and '=' not in args.entries[0]:
+                pairs = [tuple(args.entries)]
             else:
-                category, name = None, args.name
+                pairs = [entry.split('=', 1) for entry in args.entries]
+            if not pairs or any(len(pair) != 2 or not all(pair) for pair in pairs):
+                print('Error: NAME=VALUE pairs required for set action', file=sys.stderr)
+                sys.exit(1)
 
-            artifacts.update(category, name, args.value, path=args.file)
-            print(f'Updated: {args.name} = {args.value}')
+            with artifacts.transaction(args.file):
+                for full_name, value in pairs:
+                    # Parse "category:name" or just "name" for top-level
+                    if ':' in full_name:
+                        category, name = full_name.split(':', 1)
+                    else:
+                        category, name = None, full_name
+                    artifacts.update(category, name, value, path=args.file)
+            for full_name, value in pairs:
+                print(f'Updated: {full_name} = {value}')
             sys.exit(0)
 
+    if args.no_cache or args.force:
+        use_render_cache(False)
+    elif args.cache_stats:
+        atexit.register(print_cache_stats)
+    if args.track_reads:
+        track_config_reads()
+        atexit.register(save_config_reads)
+
+    # Handle render fleet before building a single-host context
+    if args.target == 'fleet':
+        if not args.hosts:
+            print('Error: --hosts required for fleet target', file=sys.stderr)
+            sys.exit(1)
+        hosts = render_fleet(
+            args.config_dir,
+            args.hosts,
+            args.output,
+            include=args.include,
+            exclude=args.exclude,
+            layer=args.layer,
+            for_iso=args.for_iso,
+            jobs=args.jobs,
+            incremental=not args.force,
+            pack_threshold=args.pack,
+            dedupe_min_size=args.dedupe
+        )
+        for host in hosts:
+            print(f'Generated: {args.output.rstrip("/")}/{host}/')
+        sys.exit(0)
+
     # Handle render command
     ctx = BuildContext(args.config_dir)
+    plan = BuildPlan(ctx, jobs=args.jobs, incremental=not args.force, pack_threshold=args.pack,
+                     dedupe_min_size=args.dedupe)
+    written = True
+    results = None
 
     if args.target == 'script':
         if not args.input:
             print('Error: input path required for script target', file=sys.stderr)
             sys.exit(1)
         render_script(ctx, args.input, args.output)
+    elif args.target == 'scripts':
+        paths = render_scripts_to_dir(ctx, args.output, plan=plan)
+        results = {
+            path: path in paths
+            for path in ((Path(args.output) / name).as_posix() for name in plan.script_names())
+        }
+    elif args.target == 'all':
+        results = render_all(
+            ctx,
+            args.output,
+            include=args.include,
+            exclude=args.exclude,
+            layer=args.layer,
+            for_iso=args.for_iso,
+            plan=plan
+        )
+    elif args.target == 'cloud-init' and args.all_layers:
+        if args.layer is not None:
+            print('Error: --layer and --all-layers are mutually exclusive', file=sys.stderr)
+            sys.exit(1)
+        for path in render_cloud_init_layers_to_files(
+            ctx,
+            args.output,
+            include=args.include,
+            exclude=args.exclude,
+            for_iso=args.for_iso,
+            plan=plan
+        ):
+            print(f'Generated: {path}')
+        sys.exit(0)
     elif args.target == 'cloud-init':
-        render_cloud_init_to_file(
+        written = render_cloud_init_to_file(
             ctx,
             args.output,
             include=args.include,
             exclude=args.exclude,
             layer=args.layer,
-            for_iso=getattr(args, 'for_iso', False)
+            for_iso=getattr(args, 'for_iso', False),
+            plan=plan
         )
     elif args.target == 'autoinstall':
         if args.include or args.exclude:
             print('Warning: --include/--exclude only apply to cloud-init target',
                   file=sys.stderr)
-        render_autoinstall_to_file(ctx, args.output)
+        written = render_autoinstall_to_file(ctx, args.output, plan=plan)
+
+    for artifact, report in plan.pack_reports():
+        print(packing.format_report(report, artifact), file=sys.stderr)
 
-    print(f'Generated: {args.output}')
+    if results is not None:
+        print_results(results)
+    elif written:
+        print(f'Generated: {args.output}')
+    else:
+        print(f'Up to date: {args.output}')
 
 
 if __name__ == '__main__':
@@ -1,8 +1,20 @@
 """Build artifact tracking for output manifest."""
 
+from contextlib import contextmanager
+import hashlib
+import io
+import os
+import stat
 from pathlib import Path
 from datetime import datetime, timezone
-import yaml
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import timing
+from . import yamlio
 
 DEFAULT_PATH = 'output/artifacts.yaml'
 
@@ -12,54 +24,280 @@ def load(path=DEFAULT_PATH):
     p = Path(path)
     if p.exists():
         with open(p) as f:
-            return yaml.safe_load(f) or {}
+            return yamlio.safe_load(f) or {}
     return {}
 
 
 def save(artifacts, path=DEFAULT_PATH):
-    """Save artifacts manifest to file."""
+    """Save artifacts manifest to file.
+
+    The file is replaced atomically (temp file + rename), so readers never
+    see a partly written manifest, and a failed save leaves the previous
+    one in place.
+    """
     artifacts['build_timestamp'] = datetime.now(timezone.utc).isoformat()
-    Path(path).parent.mkdir(parents=True, exist_ok=True)
-    with open(path, 'w', newline='\n') as f:
-        yaml.dump(artifacts, f, default_flow_style=False, sort_keys=False)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'w', newline='\n') as f:
+            yamlio.dump(artifacts, f, default_flow_style=False, sort_keys=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _key(category, name):
+    """Return the 'category:name' (or 'name') key used by side tables."""
+    return f'{category}:{name}' if category else str(name)
+
+
+def _apply(artifacts, category, name, value, fingerprint=None, content=None):
+    """Set one entry (and its fingerprint and content record) in a loaded
+    manifest."""
+    if category:
+        if not isinstance(artifacts.get(category), dict):
+            artifacts[category] = {}
+        artifacts[category][name] = value
+    else:
+        artifacts[name] = value
+    if fingerprint is not None:
+        if 'fingerprints' not in artifacts:
+            artifacts['fingerprints'] = {}
+        artifacts['fingerprints'][_key(category, name)] = fingerprint
+    if content is not None:
+        if 'content' not in artifacts:
+            artifacts['content'] = {}
+        artifacts['content'][_key(category, name)] = content
+
+
+@contextmanager
+def _locked(path):
+    """Hold an exclusive lock on <path>.lock (a no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    lock_path = Path(f'{path}.lock')
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class Transaction:
+    """
+    Manifest updates collected during one build.
+
+    Entries are kept in memory and committed together: the manifest is
+    re-read under the lock, the entries are applied over it and it is
+    saved once. Entries other writers committed in the meantime are kept.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.entries = []
+        self._artifacts = None
+
+    def set(self, category, name, value, fingerprint=None, content=None):
+        """Record an entry, committed when the transaction ends."""
+        entry = (category, name, value, fingerprint, content)
+        self.entries.append(entry)
+        if self._artifacts is not None:
+            _apply(self._artifacts, *entry)
+
+    def load(self):
+        """Return the manifest with the entries set so far applied.
+
+        The file is read once per transaction; treat the result as
+        read-only.
+        """
+        if self._artifacts is None:
+            self._artifacts = load(self.path)
+            for entry in self.entries:
+                _apply(self._artifacts, *entry)
+        return self._artifacts
+
+    def commit(self):
+        """Apply the entries to the manifest on disk in one locked write."""
+        if not self.entries:
+            return load(self.path)
+        with timing.span(os.fspath(self.path), 'manifest', count=len(self.entries)), _locked(self.path):
+            artifacts = load(self.path)
+            for entry in self.entries:
+                _apply(artifacts, *entry)
+            save(artifacts, self.path)
+        self.entries = []
+        self._artifacts = artifacts
+        return artifacts
 
 
-def update(category, name, value, path=DEFAULT_PATH):
+# Open transactions, keyed by manifest path
+_transactions = {}
+
+
+@contextmanager
+def transaction(path=DEFAULT_PATH):
+    """Collect manifest updates to path and commit them in one write.
+
+    update(), write() and is_current() calls for the same manifest inside
+    the block go through the transaction. Nested blocks for the same path
+    join the outermost one. Entries are committed even if the block
+    raises, as each records a file that was already written.
+
+    Example:
+        with artifacts.transaction('output/artifacts.yaml'):
+            render_scripts_to_dir(ctx, 'output/scripts')
+    """
+    key = os.fspath(path)
+    current = _transactions.get(key)
+    if current is not None:
+        yield current
+        return
+    current = _transactions[key] = Transaction(key)
+    try:
+        yield current
+    finally:
+        del _transactions[key]
+        current.commit()
+
+
+def update(category, name, value, path=DEFAULT_PATH, fingerprint=None, content=None):
     """Update a single artifact entry and save.
 
+    Inside a transaction for path, the entry is committed with the
+    transaction instead.
+
     Args:
         category: Category key (e.g., 'scripts') or None for top-level
         name: Artifact name/key
         value: Artifact value (typically a path)
         path: Path to artifacts.yaml file
+        fingerprint: Optional input fingerprint, recorded under
+                     'fingerprints' keyed by 'category:name'
+        content: Optional {'sha256': ..., 'size': ...} of the written
+                 file, recorded under 'content' keyed by 'category:name'
     """
-    artifacts = load(path)
-    if category:
-        if category not in artifacts:
-            artifacts[category] = {}
-        artifacts[category][name] = value
-    else:
-        artifacts[name] = value
-    save(artifacts, path)
-    return artifacts
+    tx = _transactions.get(os.fspath(path))
+    if tx is not None:
+        tx.set(category, name, value, fingerprint, content)
+        return tx.load()
+    tx = Transaction(path)
+    tx.set(category, name, value, fingerprint, content)
+    return tx.commit()
+
+
+def is_current(category, name, output_path, fingerprint, artifacts_path=DEFAULT_PATH):
+    """Return True if an artifact was last written to output_path from
+    inputs with the same fingerprint and the file still holds what was
+    written: its size matches the recorded size, and then its sha256 the
+    recorded sha256."""
+    tx = _transactions.get(os.fspath(artifacts_path))
+    artifacts = tx.load() if tx is not None else load(artifacts_path)
+    entries = artifacts.get(category, {}) if category else artifacts
+    if not isinstance(entries, dict) or entries.get(name) != output_path:
+        return False
+    key = _key(category, name)
+    if artifacts.get('fingerprints', {}).get(key) != fingerprint:
+        return False
+    record = artifacts.get('content', {}).get(key)
+    if not isinstance(record, dict):
+        return False
+    return _has_content(output_path, record.get('size'), record.get('sha256'))
+
+
+def _has_content(path, size, sha256):
+    """True if the file at path is size bytes long with the given sha256."""
+    try:
+        if os.stat(path).st_size != size:
+            return False
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+    except OSError:
+        return False
+    return digest.hexdigest() == sha256
+
 
+def _same_content(path, data):
+    """True if the file at path holds exactly data."""
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
 
-def write(category, name, output_path, content=None, writer=None, artifacts_path=DEFAULT_PATH):
+
+def _replace(path, data):
+    """Atomically replace path with data (temp file + rename), keeping the
+    existing file's permissions."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write(category, name, output_path, content=None, writer=None, artifacts_path=DEFAULT_PATH,
+          fingerprint=None):
     """Write an artifact file and track it.
 
+    The artifact is rendered into memory first. If the file already holds
+    the same bytes it is left untouched, so its mtime does not change and
+    make targets depending on it (e.g. the ISO) are not rebuilt; otherwise
+    it is replaced atomically. Either way the manifest entry is updated,
+    with the content's sha256 and size recorded under 'content'.
+
     Args:
         category: Category key (e.g., 'scripts') or None for top-level
         name: Artifact name/key
         output_path: Path to write the artifact
-        content: Optional string content to write first
+        content: Optional string content to write first, or bytes to
+                 write as-is (without writer)
         writer: Optional callback for additional writes, receives file handle
-                e.g., lambda f: yaml.dump(data, f, ...)
+                e.g., lambda f: yamlio.dump(data, f, ...)
         artifacts_path: Path to artifacts.yaml file
+        fingerprint: Optional fingerprint of the inputs the artifact was
+                     rendered from (see is_current)
+
+    Returns:
+        True if the file was written, False if it was already up to date
     """
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, 'w', newline='\n') as f:
+    if isinstance(content, bytes):
+        data = content
+    else:
+        buffer = io.StringIO(newline='\n')
         if content is not None:
-            f.write(content)
+            buffer.write(content)
         if writer is not None:
-            writer(f)
-    update(category, name, output_path, path=artifacts_path)
+            writer(buffer)
+        data = buffer.getvalue().encode('utf-8')
+    with timing.span(os.fspath(output_path), 'write', bytes=len(data)) as span:
+        changed = not _same_content(output_path, data)
+        if changed:
+            _replace(output_path, data)
+        span.set(changed=changed)
+    record = {'sha256': hashlib.sha256(data).hexdigest(), 'size': len(data)}
+    update(category, name, output_path, path=artifacts_path, fingerprint=fingerprint, content=record)
+    return changed
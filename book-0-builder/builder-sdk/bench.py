@@ -0,0 +1,292 @@
+"""Benchmarks of the builder pipeline on synthetic fragment trees."""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from . import emitter
+from . import filters
+from . import fragments
+from . import renderer
+from . import yamlio
+from .composer import merge_all
+from .context import BuildContext
+
+DEFAULT_RESULTS_PATH = 'output/bench.json'
+DEFAULT_THRESHOLD = 0.25
+RESULTS_VERSION = 1
+
+# Stages in the order they run and are reported
+STAGES = (
+    'discover_fragments',
+    'build_context',
+    'render_scripts',
+    'render_cloud_init',
+    'merge_all',
+    'yaml_dump',
+    'sha512_hash',
+)
+
+# Passwords hashed per sha512_hash sample
+HASHES_PER_SAMPLE = 20
+
+
+def _payload_lines(index, kib):
+    """Return about kib KiB of script lines for fragment index."""
+    lines = []
+    size = 0
+    n = 0
+    while size < kib * 1024:
+        line = f'echo "bench {index:03d} line {n:05d}: configuring service component and checking state"'
+        lines.append(line)
+        size += len(line) + 1
+        n += 1
+    return lines
+
+
+def _nested(depth, value):
+    """Return {'level_1': {'level_2': ... {'value': value}}} depth levels deep."""
+    node = {'value': value}
+    for level in range(depth, 0, -1):
+        node = {f'level_{level}': node}
+    return node
+
+
+def generate_tree(root, fragments=200, payload_kib=16, depth=8, env_overrides=200):
+    """Write a synthetic fragment tree and config under root.
+
+    Creates root/book-2-cloud/bench-NNN/ fragments, each with a build.yaml,
+    a fragment.yaml.tpl embedding its script both as a write_files literal
+    block and as a base64 runcmd line, and a scripts/bench-NNN.sh.tpl of
+    about payload_kib KiB. Fragments read values from root/config/
+    bench.config.yaml, whose groups nest depth levels deep.
+
+    Args:
+        root: Directory to write into (templates are named relative to it)
+        fragments: Number of fragments
+        payload_kib: Approximate size of each script
+        depth: Nesting depth of each config group
+        env_overrides: Number of AUTOINSTALL_* overrides to return
+
+    Returns:
+        Dict of AUTOINSTALL_* environment overrides for the tree's config
+    """
+    root = Path(root)
+    groups = max(1, fragments // 10)
+    chain = '.'.join(f'level_{level}' for level in range(1, depth + 1))
+
+    config = {
+        f'group_{g}': {
+            'enabled': True,
+            'name': f'group-{g}',
+            'items': [f'item-{g}-{n}' for n in range(5)],
+            **_nested(depth, g),
+        }
+        for g in range(groups)
+    }
+    config_dir = root / 'config'
+    config_dir.mkdir(parents=True, exist_ok=True)
+    with open(config_dir / 'bench.config.yaml', 'w') as f:
+        yamlio.dump({'bench': config}, f, default_flow_style=False, sort_keys=False)
+    with open(config_dir / 'identity.config.yaml', 'w') as f:
+        yamlio.dump({'identity': {'username': 'bench', 'password': 'bench'}}, f,
+                    default_flow_style=False, sort_keys=False)
+
+    for i in range(fragments):
+        g = i % groups
+        name = f'bench-{i:03d}'
+        fragment_dir = root / 'book-2-cloud' / name
+        (fragment_dir / 'scripts').mkdir(parents=True, exist_ok=True)
+        with open(fragment_dir / 'build.yaml', 'w') as f:
+            yamlio.dump({'name': name, 'build_order': 100 + i, 'build_layer': 1 + i % 10}, f,
+                        default_flow_style=False, sort_keys=False)
+        script = [
+            '#!/bin/bash',
+            f'# Synthetic script for {name}',
+            f'NAME={{{{ bench.group_{g}.name | shell_quote }}}}',
+            f'ITEMS={{{{ bench.group_{g}["items"] | shell_array }}}}',
+            f'LEVEL={{{{ bench.group_{g}.{chain}.value }}}}',
+        ] + _payload_lines(i, payload_kib)
+        with open(fragment_dir / 'scripts' / f'{name}.sh.tpl', 'w') as f:
+            f.write('\n'.join(script) + '\n')
+        with open(fragment_dir / 'fragment.yaml.tpl', 'w') as f:
+            f.write(
+                f'bench:\n'
+                f'  {name}:\n'
+                f'    enabled: {{{{ bench.group_{g}.enabled | lower }}}}\n'
+                f'    group: {{{{ bench.group_{g}.name }}}}\n'
+                f'    level: {{{{ bench.group_{g}.{chain}.value }}}}\n'
+                f'packages:\n'
+                f'{{% for item in bench.group_{g}["items"] %}}\n'
+                f'  - {name}-{{{{ item }}}}\n'
+                f'{{% endfor %}}\n'
+                f'write_files:\n'
+                f'  - path: /usr/local/bin/{name}.sh\n'
+                f"    permissions: '0755'\n"
+                f'    content: |\n'
+                f'{{{{ scripts["{name}.sh"] | indent(6, first=True) }}}}\n'
+                f'runcmd:\n'
+                f'  - echo \'{{{{ scripts["{name}.sh"] | to_base64 }}}}\' > /var/lib/bench/{name}.sh.b64\n'
+                f'  - chown {{{{ identity.username }}}} /var/lib/bench/{name}.sh.b64\n'
+            )
+
+    # Half the overrides replace existing values, half add new ones
+    env = {}
+    for n in range(env_overrides):
+        g = n % groups
+        if n % 2:
+            env[f'AUTOINSTALL_BENCH_GROUP_{g}_{chain.replace(".", "_").upper()}_VALUE'] = str(n)
+        else:
+            env[f'AUTOINSTALL_BENCH_EXTRA_{n}_SETTING'] = f'value-{n}'
+    return env
+
+
+def _time(fn, repeat, setup=None):
+    """Time fn repeat times (after setup, untimed) and summarize."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {'min': min(samples), 'median': statistics.median(samples), 'repeat': repeat}
+
+
+def _hash_passwords():
+    """Return a sha512_hash workload with a fresh password per call."""
+    counter = iter(range(sys.maxsize))
+
+    def run():
+        for _ in range(HASHES_PER_SAMPLE):
+            filters.sha512_hash(f'bench-password-{next(counter)}')
+    return run
+
+
+def _run_stages(repeat):
+    """Time each stage in the current directory's synthetic tree."""
+    stages = {}
+    stages['discover_fragments'] = _time(
+        lambda: fragments.FragmentIndex(cache_path=None).records(), repeat,
+        setup=yamlio.clear_file_cache)
+    stages['build_context'] = _time(lambda: BuildContext('config'), repeat, setup=yamlio.clear_file_cache)
+
+    ctx = BuildContext('config')
+    # Compile every template once, so the render stages time rendering
+    renderer.render_cloud_init(ctx)
+    stages['render_scripts'] = _time(lambda: renderer.render_scripts(ctx), repeat)
+    stages['render_cloud_init'] = _time(lambda: renderer.render_cloud_init(ctx), repeat)
+
+    plan = renderer.BuildPlan(ctx)
+    trees = [plan.fragment(record) for record in renderer.select_fragments()]
+    stages['merge_all'] = _time(lambda: merge_all(trees), repeat)
+    merged = merge_all(trees)
+    stages['yaml_dump'] = _time(lambda: emitter.dump_cloud_config(merged), repeat)
+    stages['sha512_hash'] = _time(_hash_passwords(), repeat)
+    return stages
+
+
+def run_benchmarks(repeat=5, root=None, **params):
+    """Generate a synthetic tree and time each pipeline stage on it.
+
+    The tree is written to root (default: a temporary directory) and the
+    stages run with it as the working directory, its overrides in the
+    environment and the render cache disabled. Module state is reset
+    before and after, so the caller's renders are unaffected.
+
+    Args:
+        repeat: Samples per stage
+        root: Directory for the tree (default: temporary)
+        **params: fragments, payload_kib, depth and env_overrides, as for
+                  generate_tree
+
+    Returns:
+        Results dict with the parameters and, per stage, the min and
+        median seconds
+    """
+    with tempfile.TemporaryDirectory(prefix='builder-bench-') as tmp:
+        root = Path(root or tmp)
+        env = generate_tree(root, **params)
+        cwd = os.getcwd()
+        saved_env = {name: os.environ.get(name) for name in env}
+        saved_cache = renderer.get_render_cache()
+        renderer.reset_state()
+        os.chdir(root)
+        os.environ.update(env)
+        renderer.use_render_cache(False)
+        try:
+            stages = _run_stages(repeat)
+        finally:
+            os.chdir(cwd)
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            if saved_cache is None:
+                renderer.use_render_cache(False)
+            else:
+                renderer.use_render_cache(cache_dir=saved_cache.cache_dir)
+            renderer.reset_state()
+    return {
+        'version': RESULTS_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': dict(params, repeat=repeat),
+        'stages': stages,
+    }
+
+
+def save_results(results, path=DEFAULT_RESULTS_PATH):
+    """Write results as JSON."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+
+
+def load_results(path):
+    """Load results written by save_results."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return stages whose min time regressed by more than threshold.
+
+    Args:
+        results: Results from run_benchmarks
+        baseline: Earlier results to compare against
+        threshold: Allowed slowdown as a fraction (0.25 = 25% slower)
+
+    Returns:
+        List of (stage, baseline seconds, current seconds) tuples
+    """
+    regressions = []
+    for stage, current in results['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if before is None:
+            continue
+        if current['min'] > before['min'] * (1 + threshold):
+            regressions.append((stage, before['min'], current['min']))
+    return regressions
+
+
+def format_results(results, baseline=None):
+    """Return a table of stage timings, with the change against baseline."""
+    lines = [f"{'stage':<20} {'min ms':>10} {'median ms':>10}" + ('  change' if baseline else '')]
+    for stage in STAGES:
+        timing = results['stages'].get(stage)
+        if timing is None:
+            continue
+        line = f"{stage:<20} {timing['min'] * 1000:>10.2f} {timing['median'] * 1000:>10.2f}"
+        before = (baseline or {}).get('stages', {}).get(stage)
+        if before:
+            line += f"  {(timing['min'] / before['min'] - 1) * 100:+6.1f}%"
+        lines.append(line)
+    return '\n'.join(lines)
@@ -0,0 +1,117 @@
+"""Content-addressed on-disk cache of rendered template output."""
+
+import os
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = 'output/.cache/render'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class RenderCache:
+    """
+    Rendered text stored under cache_dir/<key[:2]>/<key>.
+
+    Keys are digests of everything a render depends on (see
+    renderer.render_text), so entries never need invalidating; stale ones
+    simply stop being looked up. Each hit touches its entry's mtime, and
+    when the cache grows past max_bytes the least recently used entries
+    are removed.
+
+    Writes are atomic (temp file + rename), so concurrent renders, e.g.
+    fragment pool workers or fleet hosts, may share a cache directory.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key):
+        """Return the cached text for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text
+
+    def put(self, key, text):
+        """Store text under key; failures only cost a miss next time."""
+        path = self._path(key)
+        data = text.encode('utf-8')
+        try:
+            replaced = os.stat(path).st_size
+        except OSError:
+            replaced = 0
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f'{key}.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._entries())
+        else:
+            self._size += len(data) - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """Return (mtime, path, size) for every cache entry."""
+        entries = []
+        try:
+            shards = list(os.scandir(self.cache_dir))
+        except OSError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+        return entries
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, _, entry_size in entries)
+        for _, path, entry_size in entries:
+            if size <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            self.evictions += 1
+        self._size = size
+
+    def stats(self):
+        """Return hit/miss/eviction counts and the on-disk size."""
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(size for _, _, size in entries),
+        }
@@ -0,0 +1,172 @@
+"""NoCloud CIDATA images: ISO 9660 with Joliet names, written in pure Python."""
+
+import os
+import re
+import struct
+import time
+
+SECTOR = 2048
+LABEL = 'CIDATA'
+
+# Sector layout: 16 system area sectors, then the volume descriptors
+_PRIMARY_SECTOR = 16
+_PATH_TABLES_SECTOR = 19  # primary L, primary M, Joliet L, Joliet M
+_PRIMARY_ROOT_SECTOR = 23
+_JOLIET_ROOT_SECTOR = 24
+_DATA_SECTOR = 25
+
+
+def _both16(value):
+    return struct.pack('<H', value) + struct.pack('>H', value)
+
+
+def _both32(value):
+    return struct.pack('<I', value) + struct.pack('>I', value)
+
+
+def _sectors(size):
+    return (size + SECTOR - 1) // SECTOR
+
+
+def _text(value, size, joliet):
+    """Pad a descriptor text field with spaces (UCS-2 for Joliet)."""
+    if joliet:
+        data = value.encode('utf-16-be')
+        return (data + ' '.encode('utf-16-be') * size)[:size]
+    return value.encode('ascii').ljust(size, b' ')[:size]
+
+
+def _volume_time(t):
+    """17-byte volume descriptor date and time (UTC)."""
+    tm = time.gmtime(t)
+    return time.strftime('%Y%m%d%H%M%S', tm).encode('ascii') + b'00' + b'\0'
+
+
+def _record_time(t):
+    """7-byte directory record date and time (UTC)."""
+    tm = time.gmtime(t)
+    return bytes([tm.tm_year - 1900, tm.tm_mon, tm.tm_mday, tm.tm_hour, tm.tm_min, tm.tm_sec, 0])
+
+
+def _directory_record(identifier, sector, size, t, directory=False):
+    pad = b'\0' if len(identifier) % 2 == 0 else b''
+    length = 33 + len(identifier) + len(pad)
+    return (bytes([length, 0]) + _both32(sector) + _both32(size) + _record_time(t)
+            + bytes([2 if directory else 0, 0, 0]) + _both16(1) + bytes([len(identifier)])
+            + identifier + pad)
+
+
+def _path_table(root_sector, big_endian):
+    """Path table holding only the root directory."""
+    fmt = '>IH' if big_endian else '<IH'
+    return bytes([1, 0]) + struct.pack(fmt, root_sector, 1) + b'\0\0'
+
+
+def _primary_name(name):
+    """ISO 9660 level 2 identifier for name, e.g. user-data -> USER_DATA.;1."""
+    stem, dot, ext = name.upper().rpartition('.')
+    if not dot:
+        stem, ext = ext, ''
+    stem = re.sub('[^A-Z0-9_]', '_', stem)[:30 - len(ext[:3])]
+    ext = re.sub('[^A-Z0-9_]', '_', ext)[:3]
+    return f'{stem}.{ext};1'.encode('ascii')
+
+
+def _joliet_name(name):
+    return name[:64].encode('utf-16-be')
+
+
+def _volume_descriptor(joliet, label, total_sectors, t):
+    root = _directory_record(b'\0', _JOLIET_ROOT_SECTOR if joliet else _PRIMARY_ROOT_SECTOR,
+                             SECTOR, t, directory=True)
+    path_table = _PATH_TABLES_SECTOR + (2 if joliet else 0)
+    descriptor = (
+        bytes([2 if joliet else 1]) + b'CD001' + bytes([1, 0])
+        + _text('', 32, joliet)
+        + _text(label if joliet else label.upper(), 32, joliet)
+        + bytes(8)
+        + _both32(total_sectors)
+        + (b'%/E'.ljust(32, b'\0') if joliet else bytes(32))
+        + _both16(1) + _both16(1) + _both16(SECTOR)
+        + _both32(10)
+        + struct.pack('<I', path_table) + bytes(4)
+        + struct.pack('>I', path_table + 1) + bytes(4)
+        + root
+        + _text('', 128, joliet) * 3
+        + _text('BUILDER', 128, joliet)
+        + _text('', 37, joliet) * 3
+        + _volume_time(t) * 2
+        + b'0' * 16 + b'\0'
+        + _volume_time(t)
+        + bytes([1, 0])
+    )
+    return descriptor.ljust(SECTOR, b'\0')
+
+
+def _root_directory(files, extents, joliet, t):
+    sector = _JOLIET_ROOT_SECTOR if joliet else _PRIMARY_ROOT_SECTOR
+    entries = [
+        _directory_record(b'\0', sector, SECTOR, t, directory=True),
+        _directory_record(b'\1', sector, SECTOR, t, directory=True),
+    ]
+    name = _joliet_name if joliet else _primary_name
+    for identifier, (filename, data) in sorted((name(item[0]), item) for item in files.items()):
+        entries.append(_directory_record(identifier, extents[filename], len(data), t))
+    data = b''.join(entries)
+    if len(data) > SECTOR:
+        raise ValueError('too many files for a single-sector root directory')
+    return data.ljust(SECTOR, b'\0')
+
+
+def image_size(files):
+    """Return the size in bytes of the image write_image writes for files."""
+    return (_DATA_SECTOR + sum(_sectors(len(data)) for data in files.values())) * SECTOR
+
+
+def write_image(stream, files, label=LABEL, timestamp=None):
+    """Write an ISO 9660 image with Joliet names holding files in its root.
+
+    The image is written front to back to stream (any binary file
+    object, e.g. sys.stdout.buffer): volume descriptors, path tables and
+    root directories first, then each file's data. Joliet names keep
+    the original names (user-data, meta-data), which Linux, and so
+    cloud-init's NoCloud datasource, reads in preference to the
+    uppercase ISO 9660 names.
+
+    Args:
+        stream: Binary file object to write to
+        files: {name: bytes} of files for the root directory
+        label: Volume label (NoCloud looks for CIDATA)
+        timestamp: File and volume times, in seconds since the epoch
+                   (default: SOURCE_DATE_EPOCH if set, else now)
+
+    Returns:
+        Number of bytes written
+    """
+    if timestamp is None:
+        timestamp = int(os.environ.get('SOURCE_DATE_EPOCH', time.time()))
+    primary_names = [_primary_name(name) for name in files]
+    if len(set(primary_names)) != len(primary_names):
+        raise ValueError(f'file names collide as ISO 9660 names: {sorted(files)}')
+
+    extents = {}
+    sector = _DATA_SECTOR
+    for name in sorted(files):
+        extents[name] = sector
+        sector += _sectors(len(files[name]))
+    total_sectors = sector
+
+    stream.write(bytes(_PRIMARY_SECTOR * SECTOR))
+    stream.write(_volume_descriptor(False, label, total_sectors, timestamp))
+    stream.write(_volume_descriptor(True, label, total_sectors, timestamp))
+    stream.write((b'\xffCD001\x01').ljust(SECTOR, b'\0'))
+    for root in (_PRIMARY_ROOT_SECTOR, _JOLIET_ROOT_SECTOR):
+        stream.write(_path_table(root, big_endian=False).ljust(SECTOR, b'\0'))
+        stream.write(_path_table(root, big_endian=True).ljust(SECTOR, b'\0'))
+    stream.write(_root_directory(files, extents, False, timestamp))
+    stream.write(_root_directory(files, extents, True, timestamp))
+    for name in sorted(files):
+        data = files[name]
+        stream.write(data)
+        stream.write(bytes(_sectors(len(data)) * SECTOR - len(data)))
+    return total_sectors * SECTOR
@@ -24,3 +24,53 @@ def deep_merge(base, override):
             result[key] = value
 
     return result
+
+
+def merge_all(trees, base=None):
+    """
+    Deep merge trees in order, with the same result as folding deep_merge
+    over them starting from base (default: empty dict).
+
+    All trees are merged into a single accumulator in place. Containers
+    taken from the inputs are shared until a later tree needs to modify
+    them, and are copied once at that point, so neither base nor the
+    trees are ever mutated. Lists grow with amortised O(1) appends
+    instead of being rebuilt on every merge.
+    """
+    # id -> container for containers this merge created and may mutate.
+    # Holding the objects keeps their ids from being reused by inputs.
+    owned = {}
+    result = {} if base is None else base
+    for tree in trees:
+        if not isinstance(result, dict) or not isinstance(tree, dict):
+            result = tree
+            continue
+        result = _owned(result, owned)
+        _merge_into(result, tree, owned)
+    return result
+
+
+def _owned(container, owned):
+    """Return container if this merge owns it, otherwise an owned copy."""
+    if id(container) in owned:
+        return container
+    copy = dict(container) if isinstance(container, dict) else list(container)
+    owned[id(copy)] = copy
+    return copy
+
+
+def _merge_into(target, override, owned):
+    """Merge override into the owned dict target in place."""
+    for key, value in override.items():
+        if key in target:
+            current = target[key]
+            if isinstance(current, dict) and isinstance(value, dict):
+                current = target[key] = _owned(current, owned)
+                _merge_into(current, value, owned)
+            elif isinstance(current, list) and isinstance(value, list):
+                current = target[key] = _owned(current, owned)
+                current.extend(value)
+            else:
+                target[key] = value
+        else:
+            target[key] = value
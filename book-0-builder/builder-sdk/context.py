@@ -4,11 +4,255 @@ import json
 import os
 import re
 from pathlib import Path
-import yaml
 
+from . import timing
+from . import yamlio
 from .composer import deep_merge
 
 
+class PathTrie:
+    """
+    Trie over the '_'-separated segments of normalized config paths.
+
+    Each node holds the candidates [(path_parts, path_str), ...] whose
+    normalized path ends there, so exact and longest-prefix lookups of an
+    env var name cost O(number of segments) regardless of config size.
+    """
+
+    __slots__ = ('children', 'candidates')
+
+    def __init__(self):
+        self.children = {}
+        self.candidates = None
+
+    def insert(self, normalized, candidate):
+        """Add a candidate under a normalized path."""
+        node = self
+        for segment in normalized.split('_'):
+            node = node.children.setdefault(segment, PathTrie())
+        if node.candidates is None:
+            node.candidates = []
+        node.candidates.append(candidate)
+
+    def exact(self, name):
+        """Return candidates for a normalized path equal to name, or None."""
+        node = self
+        for segment in name.split('_'):
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node.candidates
+
+    def longest_prefix(self, name):
+        """Return (candidates, remainder) for the longest normalized path
+        that is a proper '_'-delimited prefix of name, or (None, '')."""
+        segments = name.split('_')
+        node = self
+        best, best_depth = None, 0
+        for depth, segment in enumerate(segments[:-1], start=1):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.candidates:
+                best, best_depth = node.candidates, depth
+        if best is None:
+            return None, ''
+        return best, '_'.join(segments[best_depth:])
+
+
+def _tracked(value, path, reads):
+    """Wrap mappings and lists so reads below path are recorded."""
+    if isinstance(value, dict):
+        return TrackingDict(value, path, reads)
+    if isinstance(value, list):
+        return TrackingList(value, path, reads)
+    return value
+
+
+class TrackingDict(dict):
+    """
+    Config mapping that records the paths templates read from it.
+
+    Paths are tuples of keys and list indexes, e.g.
+    ('network', 'interfaces', 0, 'address'). Looking up a key records its
+    path when the value is a scalar or missing; nested mappings and lists
+    come back wrapped, so only the leaves actually read are recorded.
+    Anything that depends on the whole mapping (iterating, sizing,
+    comparing, membership of a nested value, dumping) records the
+    mapping's own path; membership of a key records the key's path.
+    """
+
+    __slots__ = ('_path', '_reads')
+
+    def __init__(self, data, path, reads):
+        super().__init__(data)
+        self._path = path
+        self._reads = reads
+
+    def __getitem__(self, key):
+        path = self._path + (key,)
+        try:
+            value = dict.__getitem__(self, key)
+        except KeyError:
+            self._reads.add(path)
+            raise
+        if not isinstance(value, (dict, list)):
+            self._reads.add(path)
+        return _tracked(value, path, self._reads)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        self._reads.add(self._path + (key,))
+        return dict.__contains__(self, key)
+
+    def _read_all(self):
+        self._reads.add(self._path)
+
+    def __iter__(self):
+        self._read_all()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._read_all()
+        return dict.__len__(self)
+
+    # Comparisons read the contents in C, below the tracked accessors
+    def __eq__(self, other):
+        self._read_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._read_all()
+        return dict.__ne__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._read_all()
+        return dict.__repr__(self)
+
+    def keys(self):
+        self._read_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._read_all()
+        return dict.values(self)
+
+    def items(self):
+        self._read_all()
+        return dict.items(self)
+
+
+class TrackingList(list):
+    """Config list that records the paths templates read from it.
+
+    Indexing with a non-negative int records the element path; anything
+    else records the list's own path. See TrackingDict.
+    """
+
+    __slots__ = ('_path', '_reads')
+
+    def __init__(self, data, path, reads):
+        super().__init__(data)
+        self._path = path
+        self._reads = reads
+
+    def __getitem__(self, index):
+        if not isinstance(index, int) or index < 0:
+            self._read_all()
+            return list.__getitem__(self, index)
+        path = self._path + (index,)
+        try:
+            value = list.__getitem__(self, index)
+        except IndexError:
+            self._reads.add(path)
+            raise
+        if not isinstance(value, (dict, list)):
+            self._reads.add(path)
+        return _tracked(value, path, self._reads)
+
+    def _read_all(self):
+        self._reads.add(self._path)
+
+    def __iter__(self):
+        self._read_all()
+        return list.__iter__(self)
+
+    def __reversed__(self):
+        self._read_all()
+        return list.__reversed__(self)
+
+    def __len__(self):
+        self._read_all()
+        return list.__len__(self)
+
+    def __contains__(self, value):
+        self._read_all()
+        return list.__contains__(self, value)
+
+    def __eq__(self, other):
+        self._read_all()
+        return list.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._read_all()
+        return list.__ne__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._read_all()
+        return list.__repr__(self)
+
+
+def read_whole(value):
+    """Record a tracked mapping or list as read in full, for consumers
+    (e.g. C-level encoders) that may bypass its accessors; return it."""
+    if isinstance(value, (TrackingDict, TrackingList)):
+        value._read_all()
+    return value
+
+
+def _represent_tracking_dict(dumper, data):
+    return dumper.represent_dict(data)
+
+
+def _represent_tracking_list(dumper, data):
+    return dumper.represent_list(data)
+
+
+yamlio.Dumper.add_representer(TrackingDict, _represent_tracking_dict)
+yamlio.Dumper.add_representer(TrackingList, _represent_tracking_list)
+
+
+# Returned by resolve_path for paths that do not exist
+MISSING = object()
+
+
+def resolve_path(data, path):
+    """Return the value at a recorded read path, or MISSING."""
+    value = data
+    for key in path:
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and isinstance(key, int) and 0 <= key < len(value):
+            value = value[key]
+        else:
+            return MISSING
+    return value
+
+
+def dotted_path(path):
+    """Format a read path as e.g. 'network.interfaces.0.address'."""
+    return '.'.join(str(key) for key in path)
+
+
 class BuildContext:
     """
     Loads all *.config.yaml files from src/config/ directory.
@@ -21,26 +265,37 @@ class BuildContext:
     Testing mode: When testing.config.yaml exists and has testing: true,
     nested config keys (like network:) override their main config counterparts.
 
+    Overlay: An optional dict keyed like the config files (e.g. a per-host
+    {'network': {'hostname': 'web1'}}) is deep merged over the loaded
+    configs before testing overrides are applied.
+
     Environment variables override config values after loading.
     """
 
-    def __init__(self, configs_dir='src/config', env_prefix='AUTOINSTALL_'):
+    def __init__(self, configs_dir='src/config', env_prefix='AUTOINSTALL_', overlay=None):
         self._data = {}
-        self._paths = {}  # Maps normalized env name -> (path, original_path_str)
+        self._sources = {}  # Top-level key -> files its value was loaded from
+        self._paths = PathTrie()  # Normalized env name segments -> [(path, original_path_str)]
+        self._configs_path = Path(configs_dir)
 
         # Load all config files
-        configs_path = Path(configs_dir)
+        configs_path = self._configs_path
         if configs_path.exists():
             for filepath in configs_path.glob('*.config.yaml'):
                 key = filepath.name.replace('.config.yaml', '')
-                with open(filepath) as f:
-                    content = yaml.safe_load(f)
-                    # Auto-unwrap only if single key matches filename
-                    if isinstance(content, dict) and len(content) == 1:
-                        only_key = next(iter(content.keys()))
-                        if only_key == key:
-                            content = content[only_key]
-                    self._data[key] = content
+                with timing.span(filepath.as_posix(), 'config'):
+                    content = yamlio.load_file(filepath)
+                # Auto-unwrap only if single key matches filename
+                if isinstance(content, dict) and len(content) == 1:
+                    only_key = next(iter(content.keys()))
+                    if only_key == key:
+                        content = content[only_key]
+                self._data[key] = content
+                self._sources[key] = [filepath.as_posix()]
+
+        # Apply per-host overlay (if given)
+        if overlay:
+            self._data = deep_merge(self._data, overlay)
 
         # Apply testing config overrides (if testing: true)
         self._apply_testing_overrides()
@@ -52,7 +307,8 @@ class BuildContext:
         self._index_paths(self._data, [])
 
         # Apply environment variable overrides
-        self._apply_env_overrides(env_prefix)
+        with timing.span(env_prefix, 'overrides'):
+            self._apply_env_overrides(env_prefix)
 
     def _apply_testing_overrides(self):
         """Apply nested config overrides from testing.config.yaml when testing: true."""
@@ -75,6 +331,9 @@ class BuildContext:
             elif isinstance(value, dict):
                 # New config section from testing
                 self._data[key] = value
+            else:
+                continue
+            self._add_sources(key, self._sources.get('testing', []))
 
     def _apply_credential_fallbacks(self):
         """Load OAuth credentials from host files as fallback for AI CLI configs.
@@ -149,6 +408,7 @@ class BuildContext:
             if 'auth' not in self._data['claude_code']:
                 self._data['claude_code']['auth'] = {}
             self._data['claude_code']['auth']['oauth'] = oauth_config
+            self._add_sources('claude_code', [creds_file.as_posix(), state_file.as_posix()])
 
         except (json.JSONDecodeError, KeyError, IOError):
             # Silently skip if credential files are malformed
@@ -202,6 +462,7 @@ class BuildContext:
             if 'auth' not in self._data['copilot_cli']:
                 self._data['copilot_cli']['auth'] = {}
             self._data['copilot_cli']['auth']['oauth'] = oauth_config
+            self._add_sources('copilot_cli', [config_file.as_posix()])
 
         except (json.JSONDecodeError, KeyError, IOError, StopIteration):
             # Silently skip if credential files are malformed
@@ -265,6 +526,7 @@ class BuildContext:
             if 'opencode' not in self._data:
                 self._data['opencode'] = {}
             self._data['opencode']['auth'] = auth
+            self._add_sources('opencode', self._sources.get('claude_code', []))
 
     def _derive_opencode_providers(self):
         """Set OpenCode default model from Claude Code or Copilot CLI config.
@@ -301,6 +563,7 @@ class BuildContext:
             if 'opencode' not in self._data:
                 self._data['opencode'] = {}
             self._data['opencode']['model'] = opencode_model
+            self._add_sources('opencode', self._sources.get('claude_code', []))
             return
 
         # Fallback: Set default model from Copilot CLI config (github-copilot provider)
@@ -315,6 +578,35 @@ class BuildContext:
             if 'opencode' not in self._data:
                 self._data['opencode'] = {}
             self._data['opencode']['model'] = opencode_model
+            self._add_sources('opencode', self._sources.get('copilot_cli', []))
+
+    def _add_sources(self, key, paths):
+        """Record files that contributed to a top-level key."""
+        sources = self._sources.setdefault(key, [])
+        sources.extend(path for path in paths if path not in sources)
+
+    def config_sources(self, keys=None):
+        """Return the files the given top-level keys (default: all) depend
+        on, sorted.
+
+        Covers the files each key was loaded from, testing.config.yaml
+        if it exists (its overrides can change any key) and the config
+        directory, whose mtime changes when a *.config.yaml is added or
+        removed. Files that do not exist are left out: make would remake
+        a missing prerequisite, and everything after it, on every run.
+        Overlays and environment overrides have no file and are not
+        included.
+        """
+        if keys is None:
+            keys = self._sources
+        sources = set()
+        for key in keys:
+            sources.update(self._sources.get(key, []))
+        if keys:
+            sources.update(self._sources.get('testing', []))
+            if self._configs_path.is_dir():
+                sources.add(self._configs_path.as_posix())
+        return sorted(sources)
 
     def _index_paths(self, obj, path):
         """Recursively index all paths in the config tree."""
@@ -325,9 +617,7 @@ class BuildContext:
             # Scalar or list - index this path
             path_str = '.'.join(path)
             normalized = self._normalize_path(path_str)
-            if normalized not in self._paths:
-                self._paths[normalized] = []
-            self._paths[normalized].append((path, path_str))
+            self._paths.insert(normalized, (path, path_str))
 
     def _normalize_path(self, path_str):
         """Normalize a config path to env var format [A-Z_]+."""
@@ -351,8 +641,8 @@ class BuildContext:
         remainder underscores become dots (new nesting levels).
         """
         # Exact match
-        if env_name in self._paths:
-            candidates = self._paths[env_name]
+        candidates = self._paths.exact(env_name)
+        if candidates:
             if len(candidates) == 1:
                 return (*candidates[0], False)
             # Tiebreak by score
@@ -360,17 +650,9 @@ class BuildContext:
             return (*best, False)
 
         # Partial match - find longest matching prefix
-        best_match = None
-        best_len = 0
-        best_remainder = ''
-        for normalized, candidates in self._paths.items():
-            if env_name.startswith(normalized + '_'):
-                if len(normalized) > best_len:
-                    best_len = len(normalized)
-                    best_remainder = env_name[len(normalized) + 1:]  # +1 for the _
-                    best_match = max(candidates, key=lambda c: self._path_score(c[1]))
-
-        if best_match:
+        candidates, best_remainder = self._paths.longest_prefix(env_name)
+        if candidates:
+            best_match = max(candidates, key=lambda c: self._path_score(c[1]))
             # Extend path with max segmentation (each _ becomes new level)
             path_parts, path_str = best_match
             new_segments = [s.lower() for s in best_remainder.split('_')]
@@ -438,6 +720,19 @@ class BuildContext:
         """Get a top-level config key with optional default."""
         return self._data.get(key, default)
 
-    def to_dict(self):
-        """Export as dict for Jinja2 context (namespaced)"""
-        return dict(self._data)
+    def to_dict(self, reads=None):
+        """Export as dict for Jinja2 context (namespaced)
+
+        Args:
+            reads: Optional set to record the config paths templates read
+                into; values are wrapped in TrackingDict/TrackingList.
+                Top-level scalars are recorded up front.
+        """
+        if reads is None:
+            return dict(self._data)
+        data = {}
+        for key, value in self._data.items():
+            if not isinstance(value, (dict, list)):
+                reads.add((key,))
+            data[key] = _tracked(value, (key,), reads)
+        return data
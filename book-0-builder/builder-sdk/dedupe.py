@@ -0,0 +1,116 @@
+"""Deduplication of repeated values in output documents via YAML anchors."""
+
+import hashlib
+
+from . import yamlio
+
+DEFAULT_MIN_SIZE = 256
+
+
+class DedupeError(Exception):
+    """Raised when a deduplicated document does not parse back to its input."""
+
+
+def share_repeats(tree, min_size=DEFAULT_MIN_SIZE):
+    """Return a copy of tree in which equal large values are one object.
+
+    Strings of at least min_size characters, and dicts and lists whose
+    keys and strings add up to at least min_size, are identified by a
+    digest built bottom-up; every repeat is replaced by the first
+    occurrence. The input is not modified.
+
+    Returns:
+        (shared tree, {'repeats': count, 'bytes': approximate bytes the
+        repeats would have taken})
+    """
+    seen = {}
+    stats = {'repeats': 0, 'bytes': 0}
+
+    def visit(node):
+        kind = type(node)
+        if kind is str:
+            new, size = node, len(node)
+            digest = hashlib.sha1(b's' + node.encode('utf-8', 'surrogatepass')).digest()
+        elif kind is dict:
+            h = hashlib.sha1(b'd')
+            new, size = {}, 0
+            for key, value in node.items():
+                child, child_digest, child_size = visit(value)
+                new[key] = child
+                key_text = f'{type(key).__name__}:{key!r}'
+                h.update(hashlib.sha1(key_text.encode('utf-8', 'surrogatepass')).digest() + child_digest)
+                size += len(key_text) + child_size
+            digest = h.digest()
+        elif kind is list:
+            h = hashlib.sha1(b'l')
+            new, size = [], 0
+            for value in node:
+                child, child_digest, child_size = visit(value)
+                new.append(child)
+                h.update(child_digest)
+                size += child_size
+            digest = h.digest()
+        else:
+            text = f'{kind.__name__}:{node!r}'
+            return node, hashlib.sha1(text.encode('utf-8', 'surrogatepass')).digest(), len(text)
+
+        if size >= min_size:
+            first = seen.get(digest)
+            if first is not None:
+                stats['repeats'] += 1
+                stats['bytes'] += size
+                return first, digest, size
+            seen[digest] = new
+        return new, digest, size
+
+    return visit(tree)[0], stats
+
+
+class _AliasingDumper(yamlio.Dumper):
+    """yamlio.Dumper that also anchors strings of at least min_size."""
+
+    min_size = DEFAULT_MIN_SIZE
+
+    def ignore_aliases(self, data):
+        if type(data) is str:
+            return len(data) < self.min_size
+        return super().ignore_aliases(data)
+
+
+def dump(tree, min_size=DEFAULT_MIN_SIZE, header='', verify=True):
+    """Dump tree with each repeated large value written once.
+
+    The first occurrence gets an anchor (&id001) and every repeat is an
+    alias (*id001), which YAML loaders resolve to the same value. Output
+    uses the cloud-config layout (block style, insertion order, width
+    1000).
+
+    Args:
+        tree: Document to dump
+        min_size: Smallest value, in characters, worth sharing
+        header: Text written before the document (e.g. '#cloud-config\\n')
+        verify: Parse the output and raise DedupeError unless it equals tree
+
+    Returns:
+        (text, stats) with stats as for share_repeats
+    """
+    shared, stats = share_repeats(tree, min_size)
+    dumper = type('Dumper', (_AliasingDumper,), {'min_size': min_size})
+    text = header + yamlio.dump(shared, default_flow_style=False, sort_keys=False, width=1000,
+                                Dumper=dumper)
+    if verify and yamlio.safe_load(text) != tree:
+        raise DedupeError('deduplicated document does not parse back to the original')
+    return text, stats
+
+
+def dedupe_text(text, min_size=DEFAULT_MIN_SIZE):
+    """Re-emit a rendered YAML document with repeated values deduplicated.
+
+    A leading comment line such as '#cloud-config' is kept; other
+    comments and formatting are not.
+
+    Returns:
+        (text, stats) as for dump
+    """
+    header = text.split('\n', 1)[0] + '\n' if text.startswith('#') else ''
+    return dump(yamlio.safe_load(text), min_size, header=header)
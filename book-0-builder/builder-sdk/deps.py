@@ -0,0 +1,104 @@
+"""GNU make dependency files for rendered artifacts."""
+
+from pathlib import Path
+import sys
+from jinja2 import TemplateNotFound
+
+from .fragments import get_index
+from .renderer import BuildPlan, template_dependencies
+
+DEFAULT_DEPS_DIR = 'output/.deps'
+
+
+def _make_escape(path):
+    """Escape a path for use in a make rule."""
+    return path.replace('$', '$$').replace('#', '\\#').replace(' ', '\\ ')
+
+
+def format_rule(target, prerequisites):
+    """Format a make rule, plus an empty rule per prerequisite.
+
+    The empty rules (as gcc -MP writes) keep make from failing when a
+    prerequisite is deleted or renamed; the target is rebuilt instead.
+    """
+    lines = [_make_escape(target) + ':' + ''.join(
+        ' \\\n  ' + _make_escape(p) for p in prerequisites)]
+    lines.extend(f'\n{_make_escape(p)}:' for p in prerequisites)
+    return '\n'.join(lines) + '\n'
+
+
+def artifact_prerequisites(plan, templates, build_yamls):
+    """Return the files an artifact rendered from templates depends on.
+
+    Covers the templates and everything they include or import, the
+    given build.yaml files, the existing fragment base directories
+    (adding a fragment changes their mtime) and the config sources of
+    the top-level keys the templates read (see
+    BuildContext.config_sources). Paths that do not exist are left out,
+    as make would remake the target on every run.
+    """
+    files = set(build_yamls)
+    files.update(base_dir for base_dir in get_index().base_dirs if Path(base_dir).is_dir())
+    for template_path in templates:
+        files.update(template_dependencies(template_path))
+    files.update(plan.ctx.config_sources(plan.config_keys(templates)))
+    return sorted(files)
+
+
+def dependency_rules(ctx, output_dir, include=None, exclude=None, layer=None, for_iso=False):
+    """Return {depfile name: make rules} for the artifacts of render all.
+
+    Targets are named as render all writes them under output_dir. An
+    artifact whose templates cannot be loaded is reported on stderr and
+    left out, so make falls back to its wildcard prerequisites for it.
+    """
+    plan = BuildPlan(ctx)
+    output_dir = Path(output_dir)
+    records = get_index().records()
+    all_build_yamls = [record['build_yaml'] for record in records]
+
+    rules = {}
+    script_rules = []
+    for record in records:
+        for filename, template_path in sorted(record['scripts'].items()):
+            target = (output_dir / 'scripts' / filename).as_posix()
+            script_rules.append(format_rule(
+                target, artifact_prerequisites(plan, [template_path], [record['build_yaml']])))
+    rules['scripts.d'] = '\n'.join(script_rules)
+
+    artifacts = [
+        ('cloud-init.d', 'cloud-init.yaml',
+         lambda: plan.cloud_init_templates(include, exclude, layer, for_iso)),
+        ('user-data.d', 'user-data', plan.autoinstall_templates),
+    ]
+    for depfile, filename, templates in artifacts:
+        try:
+            prerequisites = artifact_prerequisites(plan, templates(), all_build_yamls)
+        except TemplateNotFound as e:
+            print(f'Warning: skipping {depfile}: template not found: {e.name}', file=sys.stderr)
+            continue
+        rules[depfile] = format_rule((output_dir / filename).as_posix(), prerequisites)
+    return rules
+
+
+def write_dependency_files(ctx, output_dir, deps_dir=DEFAULT_DEPS_DIR, **selection):
+    """Write a make .d file per artifact into deps_dir.
+
+    Args:
+        ctx: BuildContext the artifacts are rendered with
+        output_dir: Directory render all writes into (names the targets)
+        deps_dir: Directory for the .d files
+        **selection: include, exclude, layer and for_iso, as for render
+
+    Returns:
+        List of written .d paths
+    """
+    deps_dir = Path(deps_dir)
+    deps_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for depfile, rules in dependency_rules(ctx, output_dir, **selection).items():
+        path = deps_dir / depfile
+        with open(path, 'w') as f:
+            f.write(rules)
+        written.append(path.as_posix())
+    return written
@@ -0,0 +1,246 @@
+"""Fast YAML emitter for merged cloud-config trees.
+
+Writes the output of
+
+    yamlio.dump(data, default_flow_style=False, sort_keys=False, width=1000)
+
+directly for the shapes cloud-config uses: nested dicts and lists of
+strings, ints, floats, bools and None, with multiline strings as literal
+blocks (see yamlio.str_representer) and long single-line strings folded
+at spaces past the width, as the YAML emitters do. Anything it cannot
+reproduce exactly (non-ASCII or control characters, strings needing
+double quotes or block indentation/keep indicators, repeated objects
+that would get anchors, other types) makes it fall back to yamlio.dump
+for the whole document, so output is always identical to the PyYAML path.
+"""
+
+import yaml
+
+from . import yamlio
+
+WIDTH = 1000
+
+# Keys longer than this are written as complex keys ('? key') by PyYAML
+MAX_SIMPLE_KEY = 128
+
+# Deeper nesting falls back, so keys (which never fold) stay within WIDTH
+MAX_INDENT = WIDTH // 2
+
+_resolver = yaml.resolver.Resolver()
+_STR_TAG = 'tag:yaml.org,2002:str'
+
+# Characters that start a non-plain scalar when in first position
+_LEADING_INDICATORS = frozenset('#,[]{}&*!|>\'"%@`')
+
+
+class _Unsupported(Exception):
+    """Raised when the fast path cannot reproduce PyYAML's output."""
+
+
+def _printable(text):
+    """True if text is printable ASCII (the only characters the fast path
+    writes unescaped)."""
+    return text.isascii() and text.isprintable()
+
+
+def _plain_allowed(text):
+    """True if PyYAML would write single-line text as a plain scalar in
+    block context."""
+    if not text or text[0] == ' ' or text[-1] == ' ':
+        return False
+    first = text[0]
+    if first in _LEADING_INDICATORS:
+        return False
+    if first in '?:-' and (len(text) == 1 or text[1] == ' '):
+        return False
+    if text.startswith('---') or text.startswith('...'):
+        return False
+    if ': ' in text or text.endswith(':') or ' #' in text:
+        return False
+    return _resolver.resolve(yaml.ScalarNode, text, (True, False)) == _STR_TAG
+
+
+def _fold(text, column, indent, quoted):
+    """Break text at single spaces once the line is past WIDTH.
+
+    Args:
+        text: Scalar as written (quotes included if quoted)
+        column: Column the scalar starts at
+        indent: Indentation of continuation lines
+        quoted: Whether text is single-quoted (the spaces just inside the
+                quotes never fold)
+    """
+    if column + len(text) <= WIDTH:
+        return text
+    parts = []
+    start = 0
+    i = text.find(' ')
+    while i != -1:
+        if (column + i - start > WIDTH and text[i - 1] != ' ' and i + 1 < len(text)
+                and text[i + 1] != ' ' and not (quoted and i in (1, len(text) - 2))):
+            parts.append(text[start:i])
+            parts.append('\n' + ' ' * indent)
+            start = i + 1
+            column = indent
+        i = text.find(' ', i + 1)
+    parts.append(text[start:])
+    return ''.join(parts)
+
+
+def _single_line(text, column, indent, fold=True):
+    """Return a single-line str scalar as plain or single-quoted text."""
+    if not _printable(text):
+        raise _Unsupported(text)
+    # str_representer forces single quotes for numeric-looking strings
+    numeric = text.isdigit() or (len(text) > 1 and text[0] == '0' and text[1:].isdigit())
+    if not numeric and _plain_allowed(text):
+        written, quoted = text, False
+    else:
+        written, quoted = "'" + text.replace("'", "''") + "'", True
+    if not fold:
+        return written
+    return _fold(written, column, indent, quoted)
+
+
+def _literal(text, indent):
+    """Return a multiline str as a literal block indented to indent."""
+    if (not all(_printable(line) for line in text.split('\n'))
+            or ' \n' in text or text.endswith(' ')
+            or text[0] in ' \n' or text.endswith('\n\n')):
+        raise _Unsupported(text)
+    hints = '' if text.endswith('\n') else '-'
+    body = text[:-1] if text.endswith('\n') else text
+    prefix = ' ' * indent
+    lines = [prefix + line if line else '' for line in body.split('\n')]
+    return '|' + hints + '\n' + '\n'.join(lines)
+
+
+def _float(value):
+    """Format a float as yaml's representer does."""
+    if value != value:
+        return '.nan'
+    if value == float('inf'):
+        return '.inf'
+    if value == -float('inf'):
+        return '-.inf'
+    text = repr(value).lower()
+    if '.' not in text and 'e' in text:
+        text = text.replace('e', '.0e', 1)
+    return text
+
+
+def _scalar(value, column, indent):
+    """Return the text of a scalar value starting at column, with content
+    (literal block lines, folded lines) indented to indent."""
+    kind = type(value)
+    if kind is str:
+        if '\n' in value:
+            return _literal(value, indent)
+        return _single_line(value, column, indent)
+    if value is None:
+        return 'null'
+    if kind is bool:
+        return 'true' if value else 'false'
+    if kind is int:
+        return str(value)
+    if kind is float:
+        return _float(value)
+    raise _Unsupported(value)
+
+
+def _key(key, indent):
+    """Return the text of a mapping key starting at column indent."""
+    if indent > MAX_INDENT:
+        raise _Unsupported(key)
+    if type(key) is int:
+        return str(key)
+    if type(key) is not str or not key or '\n' in key or len(key) >= MAX_SIMPLE_KEY:
+        raise _Unsupported(key)
+    return _single_line(key, indent, indent, fold=False)
+
+
+class _Writer:
+    """Collects output for one document, tracking visited collections."""
+
+    def __init__(self):
+        self.out = []
+        self.seen = set()
+
+    def visit(self, collection):
+        # PyYAML anchors collections that appear more than once
+        if id(collection) in self.seen:
+            raise _Unsupported(collection)
+        self.seen.add(id(collection))
+
+    def value(self, value, column, indent):
+        """Write ' value' after a key or '-' ending at column, ending the
+        line, or return True if value is a non-empty collection."""
+        kind = type(value)
+        if kind is dict or kind is list:
+            self.visit(value)
+            if not value:
+                self.out.append(' {}\n' if kind is dict else ' []\n')
+                return False
+            return True
+        self.out.append(' ' + _scalar(value, column + 1, indent) + '\n')
+        return False
+
+    def mapping(self, mapping, indent, inline=False):
+        """Write a non-empty mapping whose keys start at column indent.
+
+        With inline, the first key continues the current line (after '- ').
+        """
+        out = self.out
+        for key, value in mapping.items():
+            key_text = _key(key, indent)
+            if inline:
+                inline = False
+            else:
+                out.append(' ' * indent)
+            out.append(key_text + ':')
+            if self.value(value, indent + len(key_text) + 1, indent + 2):
+                out.append('\n')
+                if type(value) is dict:
+                    self.mapping(value, indent + 2)
+                else:
+                    # Sequences in mappings are not indented
+                    self.sequence(value, indent)
+
+    def sequence(self, sequence, indent, inline=False):
+        """Write a non-empty sequence whose dashes start at column indent."""
+        out = self.out
+        for item in sequence:
+            if inline:
+                inline = False
+            else:
+                out.append(' ' * indent)
+            out.append('-')
+            if self.value(item, indent + 1, indent + 2):
+                out.append(' ')
+                if type(item) is dict:
+                    self.mapping(item, indent + 2, inline=True)
+                else:
+                    self.sequence(item, indent + 2, inline=True)
+
+
+def dump_cloud_config(data, stream=None):
+    """Dump a cloud-config tree as yamlio.dump(data, default_flow_style=False,
+    sort_keys=False, width=1000) would.
+
+    Args:
+        data: Merged cloud-config dict
+        stream: File to write to; if None, the text is returned
+    """
+    try:
+        if type(data) is not dict or not data:
+            raise _Unsupported(data)
+        writer = _Writer()
+        writer.visit(data)
+        writer.mapping(data, 0)
+        text = ''.join(writer.out)
+    except _Unsupported:
+        return yamlio.dump(data, stream, default_flow_style=False, sort_keys=False, width=WIDTH)
+    if stream is None:
+        return text
+    stream.write(text)
+    return None
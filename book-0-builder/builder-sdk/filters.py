@@ -1,9 +1,18 @@
 """Custom Jinja2 filters for template rendering."""
 
+import functools
+import gzip
 import hashlib
+import hmac
 import base64
 import os
-import yaml
+
+from . import yamlio
+
+DEFAULT_ROUNDS = 5000
+MIN_ROUNDS = 1000
+MAX_ROUNDS = 999999999
+SALT_SECRET_ENV = 'BUILDER_SALT_SECRET'
 
 
 def to_base64(value):
@@ -11,6 +20,16 @@ def to_base64(value):
     return base64.b64encode(value.encode('utf-8')).decode('ascii')
 
 
+def gz_b64(value):
+    """Gzip and base64-encode a string (write_files 'encoding: gz+b64').
+
+    The gzip header's mtime is fixed at 0, so equal input always gives
+    equal output.
+    """
+    data = gzip.compress(value.encode('utf-8'), compresslevel=9, mtime=0)
+    return base64.b64encode(data).decode('ascii')
+
+
 def shell_quote(value):
     """Escape for shell single quotes."""
     return "'" + str(value).replace("'", "'\\''") + "'"
@@ -21,19 +40,53 @@ def shell_array(items):
     return '(' + ' '.join(shell_quote(i) for i in items) + ')'
 
 
-def sha512_hash(password):
-    """Generate SHA-512 password hash for /etc/shadow (cross-platform)."""
-    # Generate 16-byte random salt
-    salt_bytes = os.urandom(16)
-    # Use base64 encoding (./0-9A-Za-z) for crypt-compatible salt
-    salt = base64.b64encode(salt_bytes, altchars=b'./').decode('ascii')[:16]
-    # SHA-512 crypt uses 5000 rounds by default
-    rounds = 5000
+# Build secret for deterministic salts (None: use SALT_SECRET_ENV)
+_salt_secret = None
+
+
+def set_salt_secret(secret):
+    """Derive sha512_hash salts from a build secret instead of os.urandom.
+
+    Passing None falls back to the SALT_SECRET_ENV environment variable,
+    and to random salts if that is unset too.
+    """
+    global _salt_secret
+    _salt_secret = secret
+
+
+def _get_salt_secret():
+    if _salt_secret is not None:
+        return _salt_secret
+    return os.environ.get(SALT_SECRET_ENV) or None
+
+
+def sha512_hash(password, rounds=DEFAULT_ROUNDS, key=''):
+    """Generate SHA-512 password hash for /etc/shadow (cross-platform).
+
+    Args:
+        password: Plain-text password
+        rounds: SHA-512-crypt rounds, clamped to glibc's 1000..999999999
+        key: Config path of the password, e.g. 'identity.password'. With
+             a build secret set, the salt is HMAC(secret, key), so the
+             hash is the same on every build.
+    """
+    secret = _get_salt_secret()
+    if secret is None:
+        # Generate 16-byte random salt
+        salt_bytes = os.urandom(16)
+        # Use base64 encoding (./0-9A-Za-z) for crypt-compatible salt
+        salt = base64.b64encode(salt_bytes, altchars=b'./').decode('ascii')[:16]
+    else:
+        digest = hmac.new(secret.encode('utf-8'), key.encode('utf-8'), hashlib.sha256).digest()
+        # 12 bytes encode to exactly 16 salt characters
+        salt = base64.b64encode(digest[:12], altchars=b'./').decode('ascii')
+    rounds = min(max(int(rounds), MIN_ROUNDS), MAX_ROUNDS)
     # Compute SHA-512 hash using the crypt algorithm
     hash_result = _sha512_crypt(password, salt, rounds)
     return f'$6$rounds={rounds}${salt}${hash_result}'
 
 
+@functools.lru_cache(maxsize=256)
 def _sha512_crypt(password, salt, rounds):
     """Implement SHA-512 crypt algorithm (glibc compatible)."""
     password = password.encode('utf-8')
@@ -91,23 +144,28 @@ def _sha512_crypt(password, salt, rounds):
         i -= 64
     s += ds[:i]
 
-    # Main loop
-    c = a
-    for i in range(rounds):
-        ctx = hashlib.sha512()
-        if i & 1:
-            ctx.update(p)
-        else:
-            ctx.update(c)
-        if i % 3:
-            ctx.update(s)
-        if i % 7:
-            ctx.update(p)
+    # Main loop: round i hashes c and a fixed mix of p and s that depends
+    # only on i % 42. Odd rounds put c last, so their prefix is hashed once
+    # up front and copied; even rounds put c first and append a suffix.
+    sha512 = hashlib.sha512
+    steps = []
+    for i in range(42):
+        middle = (s if i % 3 else b'') + (p if i % 7 else b'')
         if i & 1:
-            ctx.update(c)
+            steps.append((sha512(p + middle).copy, None))
         else:
-            ctx.update(p)
-        c = ctx.digest()
+            steps.append((None, middle + p))
+    full, remainder = divmod(rounds, 42)
+    c = a
+    for run in [steps] * full + [steps[:remainder]]:
+        for copy, suffix in run:
+            if suffix is None:
+                ctx = copy()
+                ctx.update(c)
+            else:
+                ctx = sha512(c)
+                ctx.update(suffix)
+            c = ctx.digest()
 
     # Encode result in base64-like format
     b64chars = './0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
@@ -147,4 +205,21 @@ def cidr_only(cidr_notation):
 
 def to_yaml(value):
     """Convert dict/list to YAML string."""
-    return yaml.dump(value, default_flow_style=False, allow_unicode=True).rstrip()
+    return yamlio.dump(value, default_flow_style=False, allow_unicode=True).rstrip()
+
+
+def nondeterministic_filters():
+    """Names of filters whose output can differ between calls with the
+    same arguments; renders using them are never cached."""
+    if _get_salt_secret() is not None:
+        return set()
+    return {'sha512_hash'}
+
+
+def config_digest():
+    """Digest of filter settings that change output (the salt secret),
+    for cache keys and fingerprints; None when there are none."""
+    secret = _get_salt_secret()
+    if secret is None:
+        return None
+    return hmac.new(secret.encode('utf-8'), b'config_digest', hashlib.sha256).hexdigest()
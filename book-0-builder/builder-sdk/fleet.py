@@ -0,0 +1,138 @@
+"""Batch rendering of artifacts for a fleet of similar hosts."""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import yamlio
+from .context import BuildContext
+from .fragments import get_index
+from .renderer import (
+    BuildPlan,
+    referenced_scripts,
+    render_all,
+    select_fragments,
+    template_variables,
+)
+
+
+def load_overlays(hosts_dir):
+    """Load per-host overlays from <host>.yaml files, keyed by host name.
+
+    Each file is keyed like the config files, e.g.:
+
+        network:
+          hostname: web1
+    """
+    overlays = {}
+    for path in sorted(Path(hosts_dir).glob('*.yaml')):
+        overlays[path.stem] = yamlio.load_file(path) or {}
+    return overlays
+
+
+def changed_keys(base_ctx, host_ctxs):
+    """Return top-level config keys whose value differs for any host."""
+    keys = set()
+    base = base_ctx.to_dict()
+    for ctx in host_ctxs:
+        data = ctx.to_dict()
+        for key in base.keys() | data.keys():
+            if data.get(key) != base.get(key):
+                keys.add(key)
+    return keys
+
+
+def shared_results(base_ctx, keys, records):
+    """Render the host-independent scripts and fragments once.
+
+    A template is host-independent when neither it nor the templates it
+    pulls in read any of the changed top-level keys. A fragment also
+    needs every script it references to be host-independent.
+
+    Returns:
+        BuildPlan node results to seed each host's plan with
+    """
+    plan = BuildPlan(base_ctx)
+
+    def independent(template_path):
+        return not (template_variables(template_path) & keys)
+
+    script_templates = {}
+    for record in get_index().records():
+        script_templates.update(record['scripts'])
+    shared_scripts = {name for name, template_path in script_templates.items() if independent(template_path)}
+
+    for name in shared_scripts:
+        plan.script(name)
+    for record in records:
+        if not independent(record['template']):
+            continue
+        names = referenced_scripts(record['template'])
+        if names is None:
+            names = set(script_templates)
+        if (names & set(script_templates)) <= shared_scripts:
+            plan.fragment(record)
+
+    return {
+        key: value for key, value in plan.results().items()
+        if isinstance(key, tuple) and key[0] in ('script', 'fragment')
+    }
+
+
+def _render_host(host, ctx, output_dir, shared, options, plan_options):
+    """Render one host's artifacts into output_dir/<host>/."""
+    host_dir = Path(output_dir) / host
+    render_all(
+        ctx,
+        host_dir,
+        plan=BuildPlan(ctx, shared=shared, **plan_options),
+        artifacts_path=(host_dir / 'artifacts.yaml').as_posix(),
+        **options
+    )
+    return host
+
+
+def render_fleet(configs_dir, hosts_dir, output_dir, include=None, exclude=None, layer=None,
+                 for_iso=False, jobs=None, incremental=False, pack_threshold=None, dedupe_min_size=None):
+    """Render scripts, cloud-init.yaml and user-data for every host.
+
+    Each host's config is the base config in configs_dir with its overlay
+    from hosts_dir merged over it. Artifacts go to output_dir/<host>/,
+    with a per-host artifacts.yaml.
+
+    Fragments and scripts that render identically for every host are
+    rendered once and shared. Hosts are rendered in a process pool of
+    jobs workers; each worker keeps its Jinja2 environment and fragment
+    index across the hosts it renders. With incremental=True, host
+    artifacts whose input fingerprints are unchanged are skipped.
+    pack_threshold and dedupe_min_size apply to every host, as for
+    BuildPlan.
+
+    Returns:
+        List of rendered host names
+    """
+    overlays = load_overlays(hosts_dir)
+    if not overlays:
+        return []
+
+    base_ctx = BuildContext(configs_dir)
+    host_ctxs = {host: BuildContext(configs_dir, overlay=overlay) for host, overlay in overlays.items()}
+    keys = changed_keys(base_ctx, host_ctxs.values())
+    records = select_fragments(include, exclude, layer, for_iso)
+    records += [r for r in select_fragments(for_iso=True) if r not in records]
+    shared = shared_results(base_ctx, keys, records)
+
+    options = {'include': include, 'exclude': exclude, 'layer': layer, 'for_iso': for_iso}
+    plan_options = {'incremental': incremental, 'pack_threshold': pack_threshold,
+                    'dedupe_min_size': dedupe_min_size}
+    if not jobs or jobs < 2 or len(host_ctxs) < 2:
+        return [
+            _render_host(host, ctx, output_dir, shared, options, plan_options)
+            for host, ctx in host_ctxs.items()
+        ]
+
+    with ProcessPoolExecutor(min(jobs, len(host_ctxs))) as pool:
+        futures = [
+            pool.submit(_render_host, host, ctx, output_dir, shared, options, plan_options)
+            for host, ctx in host_ctxs.items()
+        ]
+        return [future.result() for future in futures]
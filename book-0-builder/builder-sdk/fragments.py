@@ -0,0 +1,177 @@
+"""Fragment discovery backed by a persistent, mtime-validated index."""
+
+import json
+import os
+from pathlib import Path
+
+from . import timing
+from . import yamlio
+
+DEFAULT_BASE_DIRS = ('book-1-foundation', 'book-2-cloud')
+DEFAULT_CACHE_PATH = 'output/.cache/fragments.json'
+INDEX_VERSION = 1
+
+
+class FragmentIndex:
+    """
+    Index of fragments discovered from build.yaml files.
+
+    A scan walks each base directory once, parses every build.yaml and
+    records, per fragment, its metadata, directory, fragment template and
+    script templates. The mtime of every directory visited and every
+    build.yaml read is recorded alongside.
+
+    Lookups validate the index with a single stat pass over those entries.
+    Adding or removing a file changes its directory's mtime, and editing a
+    build.yaml changes the file's mtime, so either triggers a rescan.
+
+    The index is persisted to cache_path so separate CLI invocations share
+    it. Template and script paths are relative to the working directory,
+    matching the names renderer passes to the Jinja2 loader.
+    """
+
+    def __init__(self, base_dirs=None, cache_path=DEFAULT_CACHE_PATH):
+        self.base_dirs = list(base_dirs or DEFAULT_BASE_DIRS)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._stamps = {}
+        self._records = None
+
+    def _stamp(self, path):
+        """Return the mtime of path in nanoseconds, or None if missing."""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """Return True if any recorded directory or file changed."""
+        if self._records is None:
+            return True
+        for path, mtime in self._stamps.items():
+            if self._stamp(path) != mtime:
+                return True
+        return False
+
+    def _scan(self):
+        """Walk base directories and rebuild the index from build.yaml files."""
+        stamps = {}
+        records = []
+        for base_dir in self.base_dirs:
+            stamps[base_dir] = self._stamp(base_dir)
+            # os.walk visits directories in the same pre-order as rglob
+            for dirpath, dirnames, filenames in os.walk(base_dir):
+                stamps[dirpath] = self._stamp(dirpath)
+                if 'build.yaml' not in filenames:
+                    continue
+                build_yaml = Path(dirpath) / 'build.yaml'
+                stamps[build_yaml.as_posix()] = self._stamp(build_yaml)
+                records.append(self._record(build_yaml))
+        self._stamps = stamps
+        self._records = sorted(records, key=lambda r: r['meta'].get('build_order', 999))
+
+    def _record(self, build_yaml):
+        """Build the index record for a single fragment."""
+        meta = yamlio.load_file(build_yaml)
+        fragment_dir = build_yaml.parent
+        tpl_path = fragment_dir / 'fragment.yaml.tpl'
+        scripts = {}
+        scripts_dir = fragment_dir / 'scripts'
+        if scripts_dir.exists():
+            for script_tpl in scripts_dir.glob('*.sh.tpl'):
+                filename = script_tpl.name.removesuffix('.tpl')
+                scripts[filename] = script_tpl.as_posix()
+        return {
+            'name': meta['name'],
+            'meta': meta,
+            'path': fragment_dir.as_posix(),
+            'build_yaml': build_yaml.as_posix(),
+            'template': tpl_path.as_posix() if tpl_path.exists() else None,
+            'scripts': scripts,
+        }
+
+    def _load(self):
+        """Load a persisted index, ignoring missing or mismatched caches."""
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (ValueError, OSError):
+            return
+        if not isinstance(data, dict):
+            return
+        if data.get('version') != INDEX_VERSION or data.get('base_dirs') != self.base_dirs:
+            return
+        stamps, records = data.get('stamps'), data.get('fragments')
+        if not isinstance(stamps, dict) or not isinstance(records, list):
+            return
+        self._stamps = stamps
+        self._records = records
+
+    def _save(self):
+        """Persist the index; failures only cost a rescan next time."""
+        if self.cache_path is None:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'base_dirs': self.base_dirs,
+            'stamps': self._stamps,
+            'fragments': self._records,
+        }
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except (TypeError, ValueError, OSError):
+            pass
+
+    def records(self):
+        """Return fragment records sorted by build_order, rescanning if stale."""
+        if self._records is None:
+            with timing.span('load', 'discover'):
+                self._load()
+        if self.is_stale():
+            with timing.span('scan', 'discover') as span:
+                self._scan()
+                self._save()
+                span.set(count=len(self._records))
+        return self._records
+
+    def get(self, name):
+        """Return the record for a fragment name, or None."""
+        for record in self.records():
+            if record['name'] == name:
+                return record
+        return None
+
+    def discover(self):
+        """Return fragment metadata dicts in the discover_fragments() format.
+
+        Each dict is a copy of build.yaml with '_path' set to the fragment
+        directory, so callers may modify it freely.
+        """
+        fragments = []
+        for record in self.records():
+            meta = dict(record['meta'])
+            meta['_path'] = Path(record['path'])
+            fragments.append(meta)
+        return fragments
+
+
+# Shared indexes, keyed by base directories
+_indexes = {}
+
+
+def get_index(base_dirs=None):
+    """Get or create the shared FragmentIndex for base_dirs."""
+    key = tuple(base_dirs or DEFAULT_BASE_DIRS)
+    if key not in _indexes:
+        _indexes[key] = FragmentIndex(key)
+    return _indexes[key]
+
+
+def clear_indexes():
+    """Drop the shared indexes, e.g. after changing working directory."""
+    _indexes.clear()
@@ -0,0 +1,90 @@
+"""Compression of large write_files payloads in merged cloud-config."""
+
+from . import filters
+
+DEFAULT_THRESHOLD = 1024
+PACKED_ENCODING = 'gz+b64'
+
+# write_files encodings whose content is the file text as-is
+_PLAIN_ENCODINGS = (None, 'text/plain')
+
+
+def _pack_entry(entry, threshold):
+    """Return a gzip+base64 copy of a write_files entry, or entry itself
+    if it is not plain text of at least threshold bytes or would not
+    shrink."""
+    if not isinstance(entry, dict) or entry.get('encoding') not in _PLAIN_ENCODINGS:
+        return entry
+    content = entry.get('content')
+    if not isinstance(content, str):
+        return entry
+    size = len(content.encode('utf-8'))
+    if size < threshold:
+        return entry
+    packed = filters.gz_b64(content)
+    if len(packed) >= size:
+        return entry
+    entry = dict(entry)
+    entry['content'] = packed
+    entry['encoding'] = PACKED_ENCODING
+    return entry
+
+
+def pack_write_files(tree, threshold=DEFAULT_THRESHOLD, owners=None):
+    """Gzip+base64 encode large write_files contents of a merged tree.
+
+    Entries with plain text content of at least threshold bytes are
+    replaced by copies with the content packed and 'encoding: gz+b64',
+    when that is smaller. The tree and its entries are not modified;
+    a new top-level dict and write_files list are returned instead.
+
+    Args:
+        tree: Merged cloud-config dict
+        threshold: Minimum content size in bytes to pack
+        owners: Optional {id(entry): fragment name} naming the fragment
+                each original entry came from
+
+    Returns:
+        (packed tree, report), where report lists a dict per packed entry
+        with 'fragment', 'path', 'size' and 'packed_size'
+    """
+    entries = tree.get('write_files') if isinstance(tree, dict) else None
+    if not isinstance(entries, list):
+        return tree, []
+    owners = owners or {}
+    packed_entries = []
+    report = []
+    for entry in entries:
+        packed = _pack_entry(entry, threshold)
+        if packed is not entry:
+            report.append({
+                'fragment': owners.get(id(entry)),
+                'path': entry.get('path'),
+                'size': len(entry['content'].encode('utf-8')),
+                'packed_size': len(packed['content']),
+            })
+        packed_entries.append(packed)
+    if not report:
+        return tree, report
+    tree = dict(tree)
+    tree['write_files'] = packed_entries
+    return tree, report
+
+
+def format_report(report, title='cloud-init'):
+    """Return per-fragment bytes saved by packing, as a table."""
+    if not report:
+        return f'{title}: no write_files packed'
+    fragments = {}
+    for item in report:
+        name = item['fragment'] or '(unknown)'
+        count, size, packed_size = fragments.get(name, (0, 0, 0))
+        fragments[name] = (count + 1, size + item['size'], packed_size + item['packed_size'])
+    lines = [f"{title}: {'fragment':<20} {'files':>5} {'bytes':>9} {'packed':>9} {'saved':>9}"]
+    indent = ' ' * (len(title) + 2)
+    for name, (count, size, packed_size) in sorted(fragments.items(), key=lambda i: i[1][2] - i[1][1]):
+        lines.append(f'{indent}{name:<20} {count:>5} {size:>9} {packed_size:>9} {size - packed_size:>9}')
+    size = sum(item['size'] for item in report)
+    packed_size = sum(item['packed_size'] for item in report)
+    lines.append(f"{indent}{'total':<20} {len(report):>5} {size:>9} {packed_size:>9} {size - packed_size:>9}")
+    return '\n'.join(lines)
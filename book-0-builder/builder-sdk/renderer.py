@@ -1,58 +1,111 @@
 """Template rendering functions for deployment artifacts."""
 
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
 from pathlib import Path
+import sys
 import yaml
-from jinja2 import Environment, FileSystemLoader
+import jinja2
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    ModuleLoader,
+    nodes,
+    TemplateNotFound,
+)
+from jinja2 import meta as jinja_meta
 
 from . import artifacts
+from . import dedupe
+from . import emitter
 from . import filters
-from .composer import deep_merge
+from . import packing
+from . import timing
+from . import yamlio
+from .cache import DEFAULT_CACHE_DIR, RenderCache
+from .composer import merge_all
+from .context import MISSING, dotted_path, read_whole, resolve_path
+from .fragments import DEFAULT_BASE_DIRS, clear_indexes, get_index
 
+BUILD_LAYERS_PATH = 'book-0-builder/config/build_layers.yaml'
+BYTECODE_CACHE_DIR = 'output/.cache/jinja'
+TEMPLATE_BUNDLE_PATH = 'output/.cache/templates.zip'
+AUTOINSTALL_TEMPLATE = 'book-1-foundation/base/autoinstall.yaml.tpl'
+CONFIG_READS_PATH = 'output/.cache/config_reads.json'
+TEMPLATE_INFO_PATH = 'output/.cache/template_info.json'
+TEMPLATE_INFO_VERSION = 2
+# Context names BuildPlan passes to templates besides the config
+EXTRA_CONTEXT_NAMES = frozenset({'scripts', 'cloud_init'})
 
-# Custom YAML representer for multiline strings using literal block scalars
-def str_representer(dumper, data):
-    """Use literal block scalar (|) for multiline strings.
 
-    Also forces quoting for numeric-looking strings (like permissions '644')
-    to ensure cloud-init schema validation passes.
+def discover_fragments(base_dirs=None):
+    """Discover fragments by finding build.yaml files.
+
+    Backed by the shared FragmentIndex, so repeated calls cost a stat pass
+    rather than a tree walk and YAML parse.
     """
-    if '\n' in data:
-        # Use literal block style for multiline
-        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
-    # Force single quotes for strings that look like numbers (e.g., '0644', '0755')
-    # This ensures cloud-init doesn't interpret them as integers
-    # Matches: pure digits, or leading 0 followed by digits (octal-like permissions)
-    if data.isdigit() or (len(data) > 1 and data[0] == '0' and data[1:].isdigit()):
-        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style="'")
-    return dumper.represent_scalar('tag:yaml.org,2002:str', data)
+    return get_index(base_dirs).discover()
 
 
-# Register the custom representer
-yaml.add_representer(str, str_representer)
+class _BundleLoader(ModuleLoader):
+    """ModuleLoader that leaves templates in stale to the next loader."""
 
+    def __init__(self, path, stale=()):
+        super().__init__(path)
+        self.stale = frozenset(stale)
 
-def discover_fragments(base_dirs=None):
-    """Discover fragments by finding build.yaml files."""
-    if base_dirs is None:
-        base_dirs = ['book-1-foundation', 'book-2-cloud']
-
-    fragments = []
-    for base_dir in base_dirs:
-        for build_yaml in Path(base_dir).rglob('build.yaml'):
-            with open(build_yaml) as f:
-                meta = yaml.safe_load(f)
-            meta['_path'] = build_yaml.parent
-            fragments.append(meta)
-    return sorted(fragments, key=lambda f: f.get('build_order', 999))
-
-
-def create_environment(template_dirs=None):
-    """Create Jinja2 environment with custom filters."""
+    def load(self, environment, name, globals=None):
+        if name in self.stale:
+            raise TemplateNotFound(name)
+        return super().load(environment, name, globals)
+
+
+def _whole_value_tojson(tojson):
+    """Wrap Jinja2's tojson so a tracked config value it encodes counts
+    as read in full (the json encoder may bypass the tracked accessors)."""
+    @jinja2.pass_eval_context
+    def wrapper(eval_ctx, value, indent=None):
+        return tojson(eval_ctx, read_whole(value), indent)
+    return wrapper
+
+
+def create_environment(template_dirs=None, bytecode_cache_dir=None, bundle_path=None, stale_templates=()):
+    """Create Jinja2 environment with custom filters.
+
+    Templates are named by their path from the repository root
+    (e.g. 'book-2-cloud/users/fragment.yaml.tpl'), so the default
+    search path is the working directory.
+
+    Args:
+        template_dirs: Template search path (default: working directory)
+        bytecode_cache_dir: Directory for the on-disk bytecode cache
+                            (default: no cache)
+        bundle_path: Precompiled template bundle from compile_templates().
+                     Bundled templates are loaded without reloading;
+                     anything else falls back to the search path.
+        stale_templates: Names to load from the search path even though
+                         the bundle has them (sources changed since)
+    """
     if template_dirs is None:
-        template_dirs = ['book-1-foundation', 'book-2-cloud']
+        template_dirs = ['.']
+    loader = FileSystemLoader(template_dirs)
+    bytecode_cache = None
+    if bytecode_cache_dir is not None:
+        Path(bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(bytecode_cache_dir))
+    if bundle_path is not None:
+        # zipimport caches archive listings by path; an absolute path keeps
+        # bundles in different working directories apart
+        loader = ChoiceLoader([_BundleLoader(os.path.abspath(bundle_path), stale_templates), loader])
     env = Environment(
-        loader=FileSystemLoader(template_dirs),
+        loader=loader,
         keep_trailing_newline=True,
+        bytecode_cache=bytecode_cache,
+        auto_reload=bundle_path is None,
     )
 
     # Register custom filters
@@ -63,43 +116,496 @@ def create_environment(template_dirs=None):
     env.filters['cidr_only'] = filters.cidr_only
     env.filters['to_yaml'] = filters.to_yaml
     env.filters['to_base64'] = filters.to_base64
+    env.filters['gz_b64'] = filters.gz_b64
+    env.filters['tojson'] = _whole_value_tojson(env.filters['tojson'])
 
     return env
 
 
+def _bundle_stamp_path(bundle_path):
+    """Return the path of the source stamp file for a template bundle."""
+    return Path(bundle_path).with_suffix('.json')
+
+
+def _template_stamp(template_path):
+    """Return (mtime_ns, size) for a template file."""
+    st = os.stat(template_path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def compile_templates(bundle_path=TEMPLATE_BUNDLE_PATH, base_dirs=None):
+    """Precompile every template under base_dirs into a zip bundle.
+
+    A stamp file next to the bundle records each source's mtime and size,
+    so get_environment() only uses the bundle while the sources match.
+
+    Returns:
+        List of compiled template names
+    """
+    base_dirs = list(base_dirs or DEFAULT_BASE_DIRS)
+    env = create_environment()
+    prefixes = tuple(base_dir.rstrip('/') + '/' for base_dir in base_dirs)
+    names = env.list_templates(filter_func=lambda name: name.startswith(prefixes) and name.endswith('.tpl'))
+
+    Path(bundle_path).parent.mkdir(parents=True, exist_ok=True)
+    env.compile_templates(
+        str(bundle_path),
+        filter_func=lambda name: name in names,
+        zip='deflated',
+        ignore_errors=False,
+    )
+    stamps = {name: _template_stamp(name) for name in names}
+    with open(_bundle_stamp_path(bundle_path), 'w') as f:
+        json.dump(stamps, f)
+    return names
+
+
+def _stale_templates(bundle_path):
+    """Return the bundled templates whose sources changed since compiling.
+
+    Returns None if the bundle or its stamp file is missing or unreadable.
+    """
+    stamp_path = _bundle_stamp_path(bundle_path)
+    if not Path(bundle_path).exists() or not stamp_path.exists():
+        return None
+    try:
+        with open(stamp_path) as f:
+            stamps = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+    stale = set()
+    for name, stamp in stamps.items():
+        try:
+            if _template_stamp(name) != stamp:
+                stale.add(name)
+        except OSError:
+            stale.add(name)
+    return stale
+
+
 # Global Jinja2 environment
 _env = None
 
 
 def get_environment():
-    """Get or create the global Jinja2 environment."""
+    """Get or create the global Jinja2 environment.
+
+    Uses the on-disk bytecode cache, and the precompiled template bundle
+    when one exists. Bundled templates whose sources changed since it was
+    compiled are loaded from source instead.
+    """
     global _env
     if _env is None:
-        _env = create_environment()
+        bundle_path = None
+        stale = ()
+        if Path(TEMPLATE_BUNDLE_PATH).exists():
+            stale = _stale_templates(TEMPLATE_BUNDLE_PATH)
+            if stale is None:
+                print("Warning: template bundle has no readable stamps, run 'builder compile' to refresh it",
+                      file=sys.stderr)
+                stale = ()
+            else:
+                bundle_path = TEMPLATE_BUNDLE_PATH
+                if stale:
+                    print(f"Warning: {len(stale)} template(s) changed since the bundle was compiled and "
+                          "are loaded from source, run 'builder compile' to refresh it", file=sys.stderr)
+        try:
+            _env = create_environment(bytecode_cache_dir=BYTECODE_CACHE_DIR, bundle_path=bundle_path,
+                                      stale_templates=stale)
+        except OSError:
+            # Read-only tree: render without the bytecode cache
+            _env = create_environment(bundle_path=bundle_path, stale_templates=stale)
     return _env
 
 
+def reset_environment(env=None):
+    """Replace the global Jinja2 environment with env, or drop it so the
+    next get_environment() creates a fresh one."""
+    global _env
+    _env = env
+
+
+def reset_state():
+    """Drop renderer state tied to the working directory: the Jinja2
+    environment, template analyses, recorded config reads, fragment
+    indexes and parsed YAML files.
+
+    Render cache and read tracking settings are kept.
+    """
+    global _template_infos, _config_reads
+    reset_environment()
+    _template_infos = None
+    _config_reads = None
+    clear_indexes()
+    yamlio.clear_file_cache()
+
+
+def get_template_source(template_path):
+    """Return the source of a template from the template search path."""
+    env = get_environment()
+    loader = env.loader
+    if isinstance(loader, ChoiceLoader):
+        # Bundled templates carry no source; the search path is last
+        loader = loader.loaders[-1]
+    source, _, _ = loader.get_source(env, template_path)
+    return source
+
+
 def render_text(ctx, template_path, **extra_context):
-    """Render a template, return as string."""
+    """Render a template, return as string.
+
+    Output is served from the render cache when the template, everything
+    it includes, the top-level config values it names, extra_context and
+    the builder sources are unchanged. Templates using non-deterministic
+    filters are always rendered.
+
+    While config read tracking is enabled, the cache is bypassed and the
+    config paths the template reads are recorded for it.
+    """
+    with timing.span(template_path, 'render') as span:
+        rendered, cached = _render_text(ctx, template_path, extra_context)
+        span.set(bytes=len(rendered), cached=cached)
+    return rendered
+
+
+def _render_text(ctx, template_path, extra_context):
+    """Render a template for render_text, returning (text, cache hit)."""
     env = get_environment()
-    template = env.get_template(template_path)
-    return template.render(**ctx.to_dict(), **extra_context)
+    if _tracking:
+        reads = set()
+        data = ctx.to_dict()
+        rendered = env.get_template(template_path).render(**ctx.to_dict(reads=reads), **extra_context)
+        # Lookups of names the config lacks never reach it; record them as
+        # reads too, so the record is invalidated once such a key appears
+        reads.update((name,) for name in template_variables(template_path)
+                     if name not in data and name not in extra_context)
+        _record_reads(template_path, data, reads)
+        return rendered, False
 
+    cache = get_render_cache()
+    key = _render_key(ctx, template_path, extra_context) if cache is not None else None
+    if key is not None:
+        rendered = cache.get(key)
+        if rendered is not None:
+            return rendered, True
+    rendered = env.get_template(template_path).render(**ctx.to_dict(), **extra_context)
+    if key is not None:
+        cache.put(key, rendered)
+    return rendered, False
 
-def render_scripts(ctx):
-    """Render all script templates from discovered fragments."""
-    scripts = {}
-    for fragment in discover_fragments():
-        scripts_dir = fragment['_path'] / 'scripts'
-        if not scripts_dir.exists():
+
+# Global render cache (created on first use unless disabled)
+_render_cache = None
+_render_cache_enabled = True
+
+
+def use_render_cache(enabled=True, cache_dir=DEFAULT_CACHE_DIR):
+    """Enable (in cache_dir) or disable the render cache."""
+    global _render_cache, _render_cache_enabled
+    _render_cache_enabled = enabled
+    _render_cache = RenderCache(cache_dir) if enabled else None
+
+
+def get_render_cache():
+    """Get or create the global render cache, or None if disabled."""
+    global _render_cache
+    if _render_cache is None and _render_cache_enabled:
+        _render_cache = RenderCache()
+    return _render_cache
+
+
+def _render_key(ctx, template_path, extra_context):
+    """Cache key for a render, or None if its output is not reproducible
+    or depends on templates chosen at render time."""
+    if template_filters(template_path) & filters.nondeterministic_filters():
+        return None
+    if has_dynamic_refs(template_path):
+        return None
+    data = ctx.to_dict()
+    # Whole top-level values, not recorded reads: a stale or incomplete
+    # record must never serve output rendered from other config
+    variables = sorted(template_variables(template_path))
+    config = [[name, name in data, data.get(name)] for name in variables]
+    inputs = [
+        jinja2.__version__,
+        _builder_digest(),
+        filters.config_digest(),
+        template_path,
+        _template_digest(template_path),
+        config,
+        extra_context,
+    ]
+    encoded = json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+# Per-file template analysis, persisted and revalidated by stamp
+_template_infos = None
+
+
+def _load_template_infos():
+    """Return analyses by template name, loading them on first use."""
+    global _template_infos
+    if _template_infos is None:
+        _template_infos = {}
+        try:
+            with open(TEMPLATE_INFO_PATH) as f:
+                data = json.load(f)
+            if data.get('version') == TEMPLATE_INFO_VERSION:
+                _template_infos = data['templates']
+        except (json.JSONDecodeError, OSError):
+            pass
+    return _template_infos
+
+
+def _save_template_infos():
+    """Persist template analyses; failures only cost a re-parse next time."""
+    try:
+        path = Path(TEMPLATE_INFO_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': TEMPLATE_INFO_VERSION, 'templates': _template_infos}, f)
+        os.replace(tmp_path, path)
+    except (TypeError, ValueError, OSError):
+        pass
+
+
+def _scripts_read(ast):
+    """Return the script names an AST reads as scripts["name"], or None
+    if it uses 'scripts' any other way (dynamic keys, iteration,
+    attribute access)."""
+    subscripts = [
+        getitem for getitem in ast.find_all(nodes.Getitem)
+        if isinstance(getitem.node, nodes.Name) and getitem.node.name == 'scripts'
+    ]
+    loads = [name for name in ast.find_all(nodes.Name) if name.name == 'scripts' and name.ctx == 'load']
+    if len(loads) != len(subscripts):
+        return None
+    if not all(isinstance(getitem.arg, nodes.Const) for getitem in subscripts):
+        return None
+    return sorted({getitem.arg.value for getitem in subscripts})
+
+
+def _template_info(name):
+    """Analyze a single template file.
+
+    Parsing dominates the cost of fingerprinting and cache lookups, so
+    analyses are persisted to TEMPLATE_INFO_PATH and reused while the
+    file's mtime and size are unchanged.
+
+    Returns:
+        Dict with the source 'digest', the templates it references
+        ('refs', constant names only), whether any reference is computed
+        at render time ('dynamic'), whether it pulls in others at all
+        ('pulls_in'), the top-level 'variables' and 'filters' it uses,
+        and the 'scripts' it reads (None if undeterminable)
+    """
+    infos = _load_template_infos()
+    try:
+        stamp = _template_stamp(name)
+    except OSError:
+        stamp = None
+    info = infos.get(name)
+    if info is not None and stamp is not None and info['stamp'] == stamp:
+        return info
+    source = get_template_source(name)
+    ast = get_environment().parse(source)
+    pulls_in = any(True for _ in ast.find_all((nodes.Include, nodes.Import, nodes.FromImport, nodes.Extends)))
+    refs = list(jinja_meta.find_referenced_templates(ast))
+    info = {
+        'stamp': stamp,
+        'digest': hashlib.sha256(source.encode('utf-8')).hexdigest(),
+        'refs': [ref for ref in refs if ref is not None],
+        'dynamic': None in refs,
+        'pulls_in': pulls_in,
+        'variables': sorted(jinja_meta.find_undeclared_variables(ast)),
+        'filters': sorted({node.name for node in ast.find_all(nodes.Filter)}),
+        'scripts': _scripts_read(ast),
+    }
+    if stamp is not None:
+        infos[name] = info
+        _save_template_infos()
+    return info
+
+
+def referenced_scripts(template_path):
+    """Return the script names a template reads as scripts["name"].
+
+    Inspects the template AST. Returns None when the template uses
+    'scripts' any other way (dynamic keys, iteration, attribute access)
+    or pulls in other templates, meaning every script may be needed.
+    """
+    info = _template_info(template_path)
+    if info['pulls_in'] or info['scripts'] is None:
+        return None
+    return set(info['scripts'])
+
+
+def template_dependencies(template_path):
+    """Return template_path and every template it includes, imports or
+    extends, recursively. References computed at render time are not
+    followed (see has_dynamic_refs)."""
+    found = []
+    pending = [template_path]
+    while pending:
+        name = pending.pop()
+        if name in found:
             continue
-        for tpl_path in scripts_dir.glob('*.sh.tpl'):
-            filename = tpl_path.name.removesuffix('.tpl')
-            template_path = tpl_path.as_posix()
-            rendered = render_text(ctx, template_path)
-            scripts[filename] = rendered
+        found.append(name)
+        pending.extend(_template_info(name)['refs'])
+    return found
+
+
+def has_dynamic_refs(template_path):
+    """True if template_path or a template it pulls in includes, imports
+    or extends a template whose name is computed at render time."""
+    return any(_template_info(name)['dynamic'] for name in template_dependencies(template_path))
+
+
+def template_variables(template_path):
+    """Return the top-level context variables a template reads, including
+    those read by the templates it pulls in."""
+    variables = set()
+    for name in template_dependencies(template_path):
+        variables.update(_template_info(name)['variables'])
+    return variables
+
+
+def template_filters(template_path):
+    """Return the filters a template uses, including those used by the
+    templates it pulls in."""
+    names = set()
+    for name in template_dependencies(template_path):
+        names.update(_template_info(name)['filters'])
+    return names
+
+
+def _template_digest(template_path):
+    """Digest of the sources of a template and everything it includes."""
+    digest = hashlib.sha256()
+    for name in sorted(template_dependencies(template_path)):
+        digest.update(f'{name}\0{_template_info(name)["digest"]}\0'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Digest of the builder sources, computed on first use
+_builder_digest_value = None
 
-    return scripts
+
+def _builder_digest():
+    """Return a digest of the builder package sources (filters included),
+    so code changes invalidate fingerprints."""
+    global _builder_digest_value
+    if _builder_digest_value is None:
+        digest = hashlib.sha256()
+        for path in sorted(Path(__file__).parent.glob('*.py')):
+            digest.update(path.read_bytes())
+        _builder_digest_value = digest.hexdigest()
+    return _builder_digest_value
+
+
+# Config read tracking: off unless enabled; recorded reads load on first use
+_tracking = False
+_config_reads = None
+
+
+def track_config_reads(enabled=True):
+    """Enable or disable recording the config paths templates read.
+
+    Recorded reads refine BuildPlan fingerprints: a template whose reads
+    are still valid is fingerprinted on the values at those paths rather
+    than on the whole top-level config keys it names, so editing one
+    value only invalidates the templates that read it.
+    """
+    global _tracking
+    _tracking = enabled
+
+
+def _sorted_paths(paths):
+    """Sort read paths, whose keys may mix strings and list indexes."""
+    return sorted(paths, key=lambda path: json.dumps(list(path), default=str))
+
+
+def _reads_digest(data, paths):
+    """Digest of the config values at paths, telling missing from null."""
+    values = []
+    for path in paths:
+        value = resolve_path(data, path)
+        values.append([list(path), value is MISSING, None if value is MISSING else value])
+    encoded = json.dumps(values, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _load_config_reads():
+    """Return recorded reads by template, loading them on first use."""
+    global _config_reads
+    if _config_reads is None:
+        _config_reads = {}
+        try:
+            with open(CONFIG_READS_PATH) as f:
+                _config_reads = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            pass
+    return _config_reads
+
+
+def _record_reads(template_path, data, reads):
+    """Record the paths a template read, with digests of the template
+    sources and of the values read, so later runs can check the record
+    still describes what a render would read."""
+    paths = _sorted_paths(reads)
+    _load_config_reads()[template_path] = {
+        'template': _template_digest(template_path),
+        'values': _reads_digest(data, paths),
+        'paths': [list(path) for path in paths],
+    }
+
+
+def save_config_reads():
+    """Persist recorded reads; failures only cost coarser fingerprints."""
+    if _config_reads is None:
+        return
+    try:
+        path = Path(CONFIG_READS_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(_config_reads, f, sort_keys=True)
+        os.replace(tmp_path, path)
+    except (TypeError, ValueError, OSError):
+        pass
+
+
+def recorded_reads(template_path, data):
+    """Return the config paths a template reads, or None if unknown.
+
+    A record is valid while the template sources and the values at the
+    recorded paths are unchanged: rendering is deterministic, so the
+    template then reads exactly the same paths again.
+    """
+    record = _load_config_reads().get(template_path)
+    if record is None:
+        return None
+    paths = [tuple(path) for path in record['paths']]
+    if record['template'] != _template_digest(template_path):
+        return None
+    if record['values'] != _reads_digest(data, paths):
+        return None
+    return paths
+
+
+def config_dependencies():
+    """Return recorded config reads as {template: [dotted paths]}."""
+    return {
+        template_path: [dotted_path(path) for path in record['paths']]
+        for template_path, record in sorted(_load_config_reads().items())
+    }
+
+
+def render_scripts(ctx):
+    """Render all script templates from discovered fragments."""
+    return BuildPlan(ctx).scripts()
 
 
 def render_script(ctx, input_path, output_path):
@@ -111,7 +617,7 @@ def render_script(ctx, input_path, output_path):
 
 def get_available_fragments():
     """Return list of available fragment names from discovered build.yaml files."""
-    return [f['name'] for f in discover_fragments()]
+    return [record['name'] for record in get_index().records()]
 
 
 class FragmentValidationError(Exception):
@@ -132,29 +638,23 @@ class FragmentValidationError(Exception):
         return '\n'.join(f"  {i+1:3d}: {line}" for i, line in enumerate(lines))
 
 
-def render_cloud_init(ctx, include=None, exclude=None, layer=None, for_iso=False):
-    """Render and merge cloud-init fragments, return as dict.
+def select_fragments(include=None, exclude=None, layer=None, for_iso=False):
+    """Return index records of fragments selected for a cloud-init build.
 
     Args:
-        ctx: Build context
         include: List of fragment names to include (default: all)
         exclude: List of fragment names to exclude (default: none)
         layer: Maximum build_layer to include (default: all)
         for_iso: If True, always include iso_required fragments
 
-    Fragment names are matched against the 'name' field in build.yaml.
-
-    Raises:
-        FragmentValidationError: If a fragment produces invalid YAML
+    Only fragments with a fragment.yaml.tpl are returned, in build_order.
     """
-    scripts = render_scripts(ctx)
-    merged = {}
+    selected = []
+    for record in get_index().records():
+        fragment_name = record['name']
+        meta = record['meta']
 
-    for fragment in discover_fragments():
-        fragment_name = fragment['name']
-        tpl_path = fragment['_path'] / 'fragment.yaml.tpl'
-
-        if not tpl_path.exists():
+        if record['template'] is None:
             continue
 
         # Filter by include list (if specified)
@@ -166,11 +666,11 @@ def render_cloud_init(ctx, include=None, exclude=None, layer=None, for_iso=False
             continue
 
         # Always include iso_required fragments for ISO builds
-        if for_iso and fragment.get('iso_required', False):
+        if for_iso and meta.get('iso_required', False):
             pass  # Don't filter this fragment
         elif layer is not None:
             # Filter by layer (if specified)
-            frag_layer = fragment.get('build_layer', 999)
+            frag_layer = meta.get('build_layer', 999)
             # build_layer can be int or list of ints
             if isinstance(frag_layer, list):
                 if not any(l <= layer for l in frag_layer):
@@ -178,22 +678,415 @@ def render_cloud_init(ctx, include=None, exclude=None, layer=None, for_iso=False
             elif frag_layer > layer:
                 continue
 
-        template_path = tpl_path.as_posix()
-        rendered = render_text(ctx, template_path, scripts=scripts)
+        selected.append(record)
+    return selected
 
-        # Validate YAML with helpful error message
-        try:
-            fragment = yaml.safe_load(rendered)
-        except yaml.YAMLError as e:
-            raise FragmentValidationError(fragment_name, e, rendered) from e
 
-        if fragment:
-            merged = deep_merge(merged, fragment)
+class BuildPlan:
+    """
+    Render-once build graph for a single BuildContext.
+
+    Each artifact is a node whose result is computed on first request and
+    shared by every later request:
+
+        script(filename)   one rendered script template
+        fragment(name)     parsed fragment.yaml.tpl (depends on the
+                           scripts it references)
+        cloud_init(...)    merged tree for a fragment selection
+        packed_cloud_init(...)
+                           cloud_init with large write_files packed
+                           (see pack_threshold)
+        autoinstall        user-data text (depends on scripts,
+                           packed_cloud_init)
+
+    Rendering several artifacts from one plan renders each script and
+    fragment template exactly once. Scripts are only rendered when a
+    selected template references them (see referenced_scripts).
+
+    With jobs > 1, fragments a cloud_init selection needs are rendered and
+    parsed in a process pool. Merging still happens in build_order in this
+    process, so the result is identical to the serial path.
+
+    shared seeds node results computed elsewhere (see results()), e.g.
+    fragments that render identically for every host in a fleet.
+
+    Each artifact also has an input fingerprint (*_fingerprint methods)
+    computed without rendering. With incremental=True, the *_to_file
+    functions skip artifacts whose fingerprint matches the manifest.
+
+    With pack_threshold set, written cloud-init trees (and the one
+    embedded in user-data) have write_files contents of at least that
+    many bytes gzip+base64 encoded (see packing.pack_write_files).
+
+    With dedupe_min_size set, the *_to_file functions write repeated
+    values of at least that many characters once, as YAML anchors and
+    aliases (see dedupe.dump).
+    """
+
+    def __init__(self, ctx, jobs=None, shared=None, incremental=False, pack_threshold=None,
+                 dedupe_min_size=None):
+        self.ctx = ctx
+        self.jobs = jobs
+        self.incremental = incremental
+        self.pack_threshold = pack_threshold
+        self.dedupe_min_size = dedupe_min_size
+        self._results = dict(shared or {})
+        self._pack_artifacts = {}  # packed_cloud_init node key -> artifact names
+
+    def _node(self, key, compute):
+        """Return the result for key, computing it on first request."""
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    def results(self):
+        """Return a copy of the computed node results, keyed by node."""
+        return dict(self._results)
+
+    def _script_templates(self):
+        """Map of script filename to template path across all fragments."""
+        def compute():
+            templates = {}
+            for record in get_index().records():
+                templates.update(record['scripts'])
+            return templates
+        return self._node('script_templates', compute)
+
+    def script_names(self):
+        """Filenames of all scripts, without rendering them."""
+        return list(self._script_templates())
+
+    def script(self, filename):
+        """Rendered script template for a script filename."""
+        def compute():
+            return render_text(self.ctx, self._script_templates()[filename])
+        return self._node(('script', filename), compute)
+
+    def scripts(self, names=None):
+        """Rendered script templates by filename.
+
+        Args:
+            names: Script filenames to render (default: all). Names with
+                   no matching template are skipped.
+        """
+        templates = self._script_templates()
+        if names is None:
+            names = templates
+        return {name: self.script(name) for name in templates if name in names}
+
+    def _script_refs(self, template_path):
+        """Script names a template references (all if undeterminable)."""
+        names = self._node(('script_refs', template_path), lambda: referenced_scripts(template_path))
+        templates = self._script_templates()
+        return [name for name in templates if names is None or name in names]
+
+    def scripts_for(self, template_path):
+        """Rendered scripts a template references (all if undeterminable)."""
+        return self.scripts(self._script_refs(template_path))
+
+    def _templates_for(self, template_paths):
+        """template_paths plus the script templates each references."""
+        script_templates = self._script_templates()
+        templates = []
+        for template_path in template_paths:
+            templates.append(template_path)
+            templates.extend(script_templates[name] for name in self._script_refs(template_path))
+        return templates
+
+    def fingerprint(self, templates, extra=None):
+        """Fingerprint of every input rendering templates reads.
+
+        Covers the sources of templates and everything they include, the
+        build.yaml metadata of all fragments (selection depends on it),
+        which top-level variables the templates name are set, the config
+        values the templates read (whole top-level values for templates
+        without valid recorded reads), extra (e.g. selection options),
+        the builder sources and filter settings.
+        """
+        data = self.ctx.to_dict()
+        sources = set()
+        variables = set()
+        unrecorded = set()
+        reads = set()
+        for template_path in templates:
+            sources.update(self._node(('template_deps', template_path),
+                                      lambda: template_dependencies(template_path)))
+            names = self._node(('template_vars', template_path),
+                               lambda: template_variables(template_path))
+            variables |= names
+            paths = self._node(('template_reads', template_path),
+                               lambda: recorded_reads(template_path, data))
+            if paths is not None:
+                reads.update(paths)
+            else:
+                unrecorded |= names
+        inputs = {
+            'builder': _builder_digest(),
+            'filters': filters.config_digest(),
+            'templates': {
+                name: _template_info(name)['digest']
+                for name in sorted(sources)
+            },
+            'fragments': [record['meta'] for record in get_index().records()],
+            'present': sorted(name for name in variables if name in data),
+            'config': {name: data.get(name) for name in sorted(unrecorded)},
+            'reads': _reads_digest(data, _sorted_paths(reads)),
+            'extra': extra,
+        }
+        encoded = json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def script_fingerprint(self, filename):
+        """Input fingerprint of one script."""
+        return self.fingerprint([self._script_templates()[filename]], extra=['script', filename])
+
+    def cloud_init_templates(self, include=None, exclude=None, layer=None, for_iso=False):
+        """Templates rendered for a cloud_init selection, scripts included."""
+        records = select_fragments(include, exclude, layer, for_iso)
+        return self._templates_for(record['template'] for record in records)
+
+    def autoinstall_templates(self):
+        """Templates rendered for the autoinstall document, scripts included."""
+        records = select_fragments(for_iso=True)
+        return self._templates_for([AUTOINSTALL_TEMPLATE] + [record['template'] for record in records])
+
+    def config_keys(self, templates):
+        """Top-level config keys templates read, from their recorded reads
+        where valid, else the variables they name.
+
+        Keys the config does not set are included (adding them changes
+        the output); extra context names and Jinja2 globals are not.
+        """
+        data = self.ctx.to_dict()
+        keys = set()
+        for template_path in templates:
+            paths = self._node(('template_reads', template_path),
+                               lambda: recorded_reads(template_path, data))
+            if paths is not None:
+                keys.update(path[0] for path in paths)
+            else:
+                keys |= self._node(('template_vars', template_path),
+                                   lambda: template_variables(template_path))
+        return keys - EXTRA_CONTEXT_NAMES - get_environment().globals.keys()
+
+    def cloud_init_fingerprint(self, include=None, exclude=None, layer=None, for_iso=False):
+        """Input fingerprint of a cloud_init selection."""
+        return self.fingerprint(
+            self.cloud_init_templates(include, exclude, layer, for_iso),
+            extra=['cloud_init', include, exclude, layer, for_iso, self.pack_threshold,
+                   self.dedupe_min_size],
+        )
+
+    def autoinstall_fingerprint(self):
+        """Input fingerprint of the autoinstall document."""
+        return self.fingerprint(self.autoinstall_templates(),
+                                extra=['autoinstall', self.pack_threshold, self.dedupe_min_size])
+
+    def fragment(self, record):
+        """Parsed fragment tree for an index record.
+
+        Raises:
+            FragmentValidationError: If the fragment produces invalid YAML
+        """
+        def compute():
+            scripts = self.scripts_for(record['template'])
+            with timing.span(record['name'], 'fragment') as span:
+                rendered = render_text(self.ctx, record['template'], scripts=scripts)
+                span.set(bytes=len(rendered))
+                # Validate YAML with helpful error message
+                try:
+                    with timing.span(record['name'], 'parse', bytes=len(rendered)):
+                        return yamlio.safe_load(rendered)
+                except yaml.YAMLError as e:
+                    raise FragmentValidationError(record['name'], e, rendered) from e
+        return self._node(('fragment', record['name']), compute)
+
+    def prefetch_fragments(self, records):
+        """Render and parse fragments in a process pool (jobs > 1).
+
+        Results are stored as fragment nodes. Errors are raised in
+        build_order, naming the fragment that failed, as the serial path
+        would.
+        """
+        pending = [r for r in records if ('fragment', r['name']) not in self._results]
+        if not self.jobs or self.jobs < 2 or len(pending) < 2 or _tracking:
+            # Reads are only recorded in this process
+            return
+        scripts = {}
+        for record in pending:
+            scripts.update(self.scripts_for(record['template']))
+        workers = min(self.jobs, len(pending))
+        with timing.span('prefetch', 'pool', count=len(pending), workers=workers), \
+                ProcessPoolExecutor(workers, initializer=_init_fragment_worker,
+                                    initargs=(self.ctx, scripts)) as pool:
+            futures = [
+                (record, pool.submit(_render_fragment_worker, record['template']))
+                for record in pending
+            ]
+            for record, future in futures:
+                fragment, error, rendered = future.result()
+                if error is not None:
+                    raise FragmentValidationError(record['name'], error, rendered) from error
+                self._results[('fragment', record['name'])] = fragment
+
+    def cloud_init(self, include=None, exclude=None, layer=None, for_iso=False):
+        """Merged cloud-init tree for a fragment selection."""
+        def compute():
+            records = select_fragments(include, exclude, layer, for_iso)
+            self.prefetch_fragments(records)
+            fragments = [self.fragment(record) for record in records]
+            with timing.span('cloud_init', 'merge', count=len(fragments)):
+                return merge_all(fragment for fragment in fragments if fragment)
+        key = (
+            'cloud_init',
+            tuple(include) if include is not None else None,
+            tuple(exclude) if exclude is not None else None,
+            layer,
+            for_iso,
+        )
+        return self._node(key, compute)
+
+    def _packed(self, include=None, exclude=None, layer=None, for_iso=False, artifact=None):
+        """(packed tree, pack report) for a cloud_init selection, noting
+        artifact as one it is written to."""
+        def compute():
+            tree = self.cloud_init(include, exclude, layer, for_iso)
+            owners = {}
+            for record in select_fragments(include, exclude, layer, for_iso):
+                fragment = self.fragment(record)
+                entries = fragment.get('write_files') if isinstance(fragment, dict) else None
+                for entry in entries if isinstance(entries, list) else ():
+                    owners[id(entry)] = record['name']
+            with timing.span('write_files', 'pack'):
+                return packing.pack_write_files(tree, self.pack_threshold, owners)
+        key = (
+            'packed_cloud_init',
+            tuple(include) if include is not None else None,
+            tuple(exclude) if exclude is not None else None,
+            layer,
+            for_iso,
+        )
+        if artifact is not None:
+            names = self._pack_artifacts.setdefault(key, [])
+            if artifact not in names:
+                names.append(artifact)
+        return self._node(key, compute)
+
+    def packed_cloud_init(self, include=None, exclude=None, layer=None, for_iso=False,
+                          artifact='cloud-init'):
+        """cloud_init tree as written: with large write_files packed when
+        pack_threshold is set, else the merged tree itself.
+
+        artifact names what the tree is written to, for pack_reports.
+        """
+        if self.pack_threshold is None:
+            return self.cloud_init(include, exclude, layer, for_iso)
+        return self._packed(include, exclude, layer, for_iso, artifact)[0]
+
+    def pack_reports(self):
+        """Return [(artifact, report)] for each cloud_init selection packed
+        so far, labelled with the artifacts it was written to."""
+        return [
+            (', '.join(names), self._results[key][1])
+            for key, names in self._pack_artifacts.items()
+        ]
+
+    def cloud_init_layers(self, layers, include=None, exclude=None, for_iso=False):
+        """Yield (layer, merged tree) for each layer, in one merge pass.
+
+        Layer N's tree equals cloud_init(layer=N, ...). Each fragment is
+        rendered and merged into a shared accumulator once. The
+        accumulator holds the longest build_order prefix common to this
+        layer and every later one; only fragments past that prefix (e.g.
+        a build_order 999 fragment from an early layer) are merged
+        separately, copy-on-write, for each layer.
+        """
+        sequences = [select_fragments(include, exclude, layer, for_iso) for layer in layers]
+        if not sequences:
+            return
+        self.prefetch_fragments(sequences[-1])
+
+        # committed[i]: longest prefix shared by sequences[i:]
+        committed = [None] * len(sequences)
+        shared = sequences[-1]
+        for i in range(len(sequences) - 1, -1, -1):
+            length = 0
+            for a, b in zip(sequences[i], shared):
+                if a['name'] != b['name']:
+                    break
+                length += 1
+            shared = committed[i] = sequences[i][:length]
+
+        def trees(records):
+            fragments = (self.fragment(record) for record in records)
+            return (fragment for fragment in fragments if fragment)
 
-    return merged
+        accumulated, merged_count = {}, 0
+        for layer, sequence, prefix in zip(layers, sequences, committed):
+            accumulated = merge_all(trees(prefix[merged_count:]), base=accumulated)
+            merged_count = len(prefix)
+            yield layer, merge_all(trees(sequence[len(prefix):]), base=accumulated)
 
+    def autoinstall(self):
+        """Rendered autoinstall user-data text."""
+        def compute():
+            return render_text(
+                self.ctx,
+                AUTOINSTALL_TEMPLATE,
+                scripts=self.scripts_for(AUTOINSTALL_TEMPLATE),
+                # Autoinstall is always for ISO, so include iso_required fragments
+                cloud_init=self.packed_cloud_init(for_iso=True, artifact='user-data'),
+            )
+        return self._node('autoinstall', compute)
 
-def render_cloud_init_to_file(ctx, output_path, include=None, exclude=None, layer=None, for_iso=False):
+
+# Per-process state for fragment pool workers
+_worker_ctx = None
+_worker_scripts = None
+
+
+def _init_fragment_worker(ctx, scripts):
+    """Initialize a fragment pool worker with the shared render inputs."""
+    global _worker_ctx, _worker_scripts
+    _worker_ctx = ctx
+    _worker_scripts = scripts
+
+
+def _render_fragment_worker(template_path):
+    """Render and parse one fragment in a pool worker.
+
+    Returns (fragment, error, rendered). YAML errors are returned rather
+    than raised so the parent can attach the fragment name.
+    """
+    rendered = render_text(_worker_ctx, template_path, scripts=_worker_scripts)
+    try:
+        return yamlio.safe_load(rendered), None, rendered
+    except yaml.YAMLError as e:
+        return None, e, rendered
+
+
+def render_cloud_init(ctx, include=None, exclude=None, layer=None, for_iso=False, plan=None):
+    """Render and merge cloud-init fragments, return as dict.
+
+    Args:
+        ctx: Build context
+        include: List of fragment names to include (default: all)
+        exclude: List of fragment names to exclude (default: none)
+        layer: Maximum build_layer to include (default: all)
+        for_iso: If True, always include iso_required fragments
+        plan: BuildPlan to share results with (default: a new plan)
+
+    Fragment names are matched against the 'name' field in build.yaml.
+
+    Raises:
+        FragmentValidationError: If a fragment produces invalid YAML
+    """
+    plan = plan or BuildPlan(ctx)
+    return plan.cloud_init(include=include, exclude=exclude, layer=layer, for_iso=for_iso)
+
+
+def render_cloud_init_to_file(ctx, output_path, include=None, exclude=None, layer=None, for_iso=False,
+                              plan=None, artifacts_path=artifacts.DEFAULT_PATH):
     """Render cloud-init to output file.
 
     Args:
@@ -203,30 +1096,171 @@ def render_cloud_init_to_file(ctx, output_path, include=None, exclude=None, laye
         exclude: List of fragment names to exclude (default: none)
         layer: Maximum build_layer to include (default: all)
         for_iso: If True, always include iso_required fragments
+        plan: BuildPlan to share results with (default: a new plan)
+        artifacts_path: Manifest to record the artifact in
+
+    Returns:
+        False if skipped because the inputs are unchanged, else True
     """
-    merged = render_cloud_init(ctx, include=include, exclude=exclude, layer=layer, for_iso=for_iso)
+    plan = plan or BuildPlan(ctx)
+    fingerprint = plan.cloud_init_fingerprint(include=include, exclude=exclude, layer=layer, for_iso=for_iso)
+    if plan.incremental and artifacts.is_current(None, 'cloud_init', output_path, fingerprint, artifacts_path):
+        return False
+    merged = plan.packed_cloud_init(include=include, exclude=exclude, layer=layer, for_iso=for_iso,
+                                    artifact=Path(output_path).name)
+    _write_cloud_init(merged, None, 'cloud_init', output_path, artifacts_path, fingerprint,
+                      plan.dedupe_min_size)
+    return True
+
+
+def _write_cloud_init(merged, category, name, output_path, artifacts_path, fingerprint=None,
+                      dedupe_min_size=None):
+    """Write a merged cloud-init tree as a #cloud-config document,
+    deduplicating repeated values of at least dedupe_min_size if set."""
+    def writer(f):
+        with timing.span(output_path, 'dump'):
+            if dedupe_min_size is None:
+                emitter.dump_cloud_config(merged, f)
+            else:
+                f.write(dedupe.dump(merged, dedupe_min_size)[0])
+
     artifacts.write(
-        None, 'cloud_init', output_path,
+        category, name, output_path,
         content='#cloud-config\n',
-        writer=lambda f: yaml.dump(merged, f, default_flow_style=False, sort_keys=False, width=1000)
+        writer=writer,
+        artifacts_path=artifacts_path,
+        fingerprint=fingerprint,
     )
 
 
-def render_autoinstall(ctx):
+def load_build_layers(path=BUILD_LAYERS_PATH):
+    """Return the layer numbers defined in build_layers.yaml, in order."""
+    return sorted((yamlio.load_file(path) or {}).get('layers', {}))
+
+
+def render_cloud_init_layers_to_files(ctx, output_path, layers=None, include=None, exclude=None,
+                                      for_iso=False, plan=None, artifacts_path=artifacts.DEFAULT_PATH):
+    """Render cloud-init for every layer in a single pass.
+
+    Layer N is written next to output_path with a '.layer-NN' infix
+    (output/cloud-init.yaml -> output/cloud-init.layer-03.yaml) and
+    matches what 'render cloud-init --layer N' produces.
+
+    Args:
+        layers: Layer numbers (default: those in build_layers.yaml)
+
+    Returns:
+        List of written paths (layers with unchanged inputs are skipped
+        when the plan is incremental)
+    """
+    plan = plan or BuildPlan(ctx)
+    if layers is None:
+        layers = load_build_layers()
+    output_path = Path(output_path)
+    stale = {}
+    for layer in layers:
+        layer_path = output_path.with_name(f'{output_path.stem}.layer-{layer:02d}{output_path.suffix}')
+        fingerprint = plan.cloud_init_fingerprint(include=include, exclude=exclude, layer=layer, for_iso=for_iso)
+        if plan.incremental and artifacts.is_current('cloud_init_layers', layer, layer_path.as_posix(),
+                                                     fingerprint, artifacts_path):
+            continue
+        stale[layer] = (layer_path.as_posix(), fingerprint)
+    if not stale:
+        return []
+
+    written = []
+    with artifacts.transaction(artifacts_path):
+        for layer, merged in plan.cloud_init_layers(layers, include=include, exclude=exclude, for_iso=for_iso):
+            if layer not in stale:
+                continue
+            layer_path, fingerprint = stale[layer]
+            if plan.pack_threshold is not None:
+                merged, _ = packing.pack_write_files(merged, plan.pack_threshold)
+            _write_cloud_init(merged, 'cloud_init_layers', layer, layer_path, artifacts_path, fingerprint,
+                              plan.dedupe_min_size)
+            written.append(layer_path)
+    return written
+
+
+def render_autoinstall(ctx, plan=None):
     """Render autoinstall user-data, return as string."""
-    scripts = render_scripts(ctx)
-    # Autoinstall is always for ISO, so include iso_required fragments
-    cloud_init = render_cloud_init(ctx, for_iso=True)
-
-    return render_text(
-        ctx,
-        'book-1-foundation/base/autoinstall.yaml.tpl',
-        scripts=scripts,
-        cloud_init=cloud_init,
-    )
+    plan = plan or BuildPlan(ctx)
+    return plan.autoinstall()
 
 
-def render_autoinstall_to_file(ctx, output_path):
-    """Render autoinstall to output file."""
-    result = render_autoinstall(ctx)
-    artifacts.write(None, 'autoinstall', output_path, content=result)
+def render_autoinstall_to_file(ctx, output_path, plan=None, artifacts_path=artifacts.DEFAULT_PATH):
+    """Render autoinstall to output file.
+
+    Returns:
+        False if skipped because the inputs are unchanged, else True
+    """
+    plan = plan or BuildPlan(ctx)
+    fingerprint = plan.autoinstall_fingerprint()
+    if plan.incremental and artifacts.is_current(None, 'autoinstall', output_path, fingerprint, artifacts_path):
+        return False
+    result = render_autoinstall(ctx, plan=plan)
+    if plan.dedupe_min_size is not None:
+        with timing.span(output_path, 'dedupe'):
+            result = dedupe.dedupe_text(result, plan.dedupe_min_size)[0]
+    artifacts.write(None, 'autoinstall', output_path, content=result, artifacts_path=artifacts_path,
+                    fingerprint=fingerprint)
+    return True
+
+
+def render_scripts_to_dir(ctx, output_dir, plan=None, artifacts_path=artifacts.DEFAULT_PATH):
+    """Render all script templates into output_dir.
+
+    Returns:
+        List of written paths (scripts with unchanged inputs are skipped
+        when the plan is incremental)
+    """
+    plan = plan or BuildPlan(ctx)
+    written = []
+    with artifacts.transaction(artifacts_path):
+        for filename in plan.script_names():
+            output_path = (Path(output_dir) / filename).as_posix()
+            fingerprint = plan.script_fingerprint(filename)
+            if plan.incremental and artifacts.is_current('scripts', filename, output_path, fingerprint,
+                                                         artifacts_path):
+                continue
+            artifacts.write('scripts', filename, output_path, content=plan.script(filename),
+                            artifacts_path=artifacts_path, fingerprint=fingerprint)
+            written.append(output_path)
+    return written
+
+
+def render_all(ctx, output_dir, include=None, exclude=None, layer=None, for_iso=False, plan=None,
+               artifacts_path=artifacts.DEFAULT_PATH):
+    """Render scripts, cloud-init.yaml and user-data into output_dir.
+
+    All three artifacts share one BuildPlan, so every template is
+    rendered once, and one manifest transaction, so artifacts.yaml is
+    written once. Fragment selection applies to cloud-init.yaml only;
+    user-data always embeds the full ISO selection.
+
+    Returns:
+        {output path: True if written, False if skipped as up to date}
+    """
+    plan = plan or BuildPlan(ctx)
+    output_dir = Path(output_dir)
+    cloud_init_path = (output_dir / 'cloud-init.yaml').as_posix()
+    user_data_path = (output_dir / 'user-data').as_posix()
+    with artifacts.transaction(artifacts_path):
+        written = render_scripts_to_dir(ctx, output_dir / 'scripts', plan=plan, artifacts_path=artifacts_path)
+        results = {
+            path: path in written
+            for path in ((output_dir / 'scripts' / name).as_posix() for name in plan.script_names())
+        }
+        results[cloud_init_path] = render_cloud_init_to_file(
+            ctx,
+            cloud_init_path,
+            include=include,
+            exclude=exclude,
+            layer=layer,
+            for_iso=for_iso,
+            plan=plan,
+            artifacts_path=artifacts_path,
+        )
+        results[user_data_path] = render_autoinstall_to_file(ctx, user_data_path, plan=plan,
+                                                             artifacts_path=artifacts_path)
+    return results
@@ -0,0 +1,222 @@
+"""NoCloud seed server: user-data, meta-data and vendor-data over HTTP."""
+
+import hashlib
+import os
+import sys
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from . import emitter
+from . import renderer
+from . import yamlio
+from .context import BuildContext
+
+# Loopback only: documents carry password hashes and other credentials
+DEFAULT_BIND = '127.0.0.1'
+DEFAULT_PORT = 8000
+DOCUMENTS = ('user-data', 'meta-data', 'vendor-data')
+VENDOR_DATA = b'#cloud-config\n{}\n'
+
+
+def _stamp(paths):
+    """Return (path, mtime_ns, size) for each existing path."""
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamps.append((str(path), st.st_mtime_ns, st.st_size))
+    return tuple(stamps)
+
+
+def etag_matches(header, etag):
+    """Return True if an If-None-Match header value matches etag.
+
+    Weak comparison, as RFC 9110 requires for If-None-Match.
+    """
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    return etag in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+class SeedServer:
+    """
+    Renders NoCloud seed documents on demand and caches them in memory.
+
+    user-data is the autoinstall document (render_autoinstall), or with
+    document='cloud-init' the merged cloud-config for the fragment
+    selection (render_cloud_init). meta-data carries an instance-id
+    derived from the user-data input fingerprint, so cloud-init treats
+    a changed document as a new instance. vendor-data is empty.
+
+    Each host has its own BuildContext: the base config in config_dir
+    with hosts_dir/<host>.yaml merged over it (as for render fleet); host
+    None is the base config alone. Contexts are rebuilt when a config or
+    overlay file changes. Rendered documents are kept per host and
+    reused while their input fingerprint is unchanged.
+
+    Fingerprinting and rendering share global renderer state, so they
+    run under one lock; requests are otherwise handled concurrently,
+    and a cache hit only costs the fingerprint.
+    """
+
+    def __init__(self, config_dir='src/config', hosts_dir=None, clients=None, document='autoinstall',
+                 include=None, exclude=None, layer=None, for_iso=False):
+        self.config_dir = Path(config_dir)
+        self.hosts_dir = Path(hosts_dir) if hosts_dir else None
+        self.clients = dict(clients or {})
+        self.document = document
+        self.selection = dict(include=include, exclude=exclude, layer=layer, for_iso=for_iso)
+        self._contexts = {}
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def hosts(self):
+        """Return the host names with an overlay in hosts_dir."""
+        if self.hosts_dir is None:
+            return []
+        return sorted(path.stem for path in self.hosts_dir.glob('*.yaml'))
+
+    def host_for(self, path_host, client_ip):
+        """Select the host for a request.
+
+        Returns:
+            path_host if given, else the host mapped to client_ip, else
+            None (base config). Raises KeyError for an unknown path_host.
+        """
+        if path_host is not None:
+            if path_host not in self.hosts():
+                raise KeyError(path_host)
+            return path_host
+        return self.clients.get(client_ip)
+
+    def _overlay_path(self, host):
+        return self.hosts_dir / f'{host}.yaml' if host is not None else None
+
+    def context(self, host):
+        """Return the BuildContext for host, rebuilt if its files changed."""
+        overlay_path = self._overlay_path(host)
+        paths = sorted(self.config_dir.glob('*.config.yaml'))
+        if overlay_path is not None:
+            paths.append(overlay_path)
+        stamp = _stamp(paths)
+        cached = self._contexts.get(host)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        overlay = (yamlio.load_file(overlay_path) or {}) if overlay_path is not None else None
+        ctx = BuildContext(self.config_dir.as_posix(), overlay=overlay)
+        self._contexts[host] = (stamp, ctx)
+        return ctx
+
+    def _user_data(self, plan):
+        """Return (fingerprint, render function) for the user-data document."""
+        if self.document == 'cloud-init':
+            def render():
+                return '#cloud-config\n' + emitter.dump_cloud_config(plan.cloud_init(**self.selection))
+            return plan.cloud_init_fingerprint(**self.selection), render
+        return plan.autoinstall_fingerprint(), lambda: renderer.render_autoinstall(plan.ctx, plan=plan)
+
+    @staticmethod
+    def _etag(body):
+        return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    def documents(self, host):
+        """Return {name: body bytes} of every seed document of host."""
+        return {name: self.get(host, name)[0] for name in DOCUMENTS}
+
+    def get(self, host, name):
+        """Return (body bytes, ETag) for a seed document of host."""
+        if name == 'vendor-data':
+            return VENDOR_DATA, self._etag(VENDOR_DATA)
+        with self._lock:
+            plan = renderer.BuildPlan(self.context(host))
+            fingerprint, render = self._user_data(plan)
+            key = (host, name)
+            cached = self._documents.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1], cached[2]
+            if name == 'user-data':
+                text = render()
+            else:
+                text = f'instance-id: iid-{fingerprint[:16]}\n'
+                if host is not None:
+                    text += f'local-hostname: {host}\n'
+            body = text.encode('utf-8')
+            etag = self._etag(body)
+            self._documents[key] = (fingerprint, body, etag)
+            return body, etag
+
+
+class SeedRequestHandler(BaseHTTPRequestHandler):
+    """Serves /[<host>/]{user-data,meta-data,vendor-data} from server.seed."""
+
+    server_version = 'builder-seed'
+
+    def _resolve(self):
+        """Return (host, document name) for the request path, or None."""
+        parts = [part for part in self.path.split('?', 1)[0].split('/') if part]
+        if not parts or parts[-1] not in DOCUMENTS or len(parts) > 2:
+            return None
+        path_host = parts[0] if len(parts) == 2 else None
+        try:
+            return self.server.seed.host_for(path_host, self.client_address[0]), parts[-1]
+        except KeyError:
+            return None
+
+    def _respond(self, head):
+        resolved = self._resolve()
+        if resolved is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        host, name = resolved
+        try:
+            body, etag = self.server.seed.get(host, name)
+        except Exception as e:
+            # The details stay on the console; they may quote config values
+            self.log_error('render %s for %s failed: %s: %s', name, host or 'base', type(e).__name__, e)
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+        if etag_matches(self.headers.get('If-None-Match', ''), etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+
+def serve(seed, host=DEFAULT_BIND, port=DEFAULT_PORT):
+    """Serve seed documents until interrupted.
+
+    Point a VM at it with the kernel argument
+    ds=nocloud;s=http://<address>:<port>/ (or .../<host>/ for a host's
+    overlay). Listens on loopback unless host says otherwise; bind to an
+    address VMs can reach only on a network trusted with the documents.
+    """
+    server = ThreadingHTTPServer((host, port), SeedRequestHandler)
+    server.daemon_threads = True
+    server.seed = seed
+    address, port = server.server_address[:2]
+    print(f'Serving NoCloud seed on http://{address}:{port}/', file=sys.stderr, flush=True)
+    for name in seed.hosts():
+        print(f'  {name}: http://{address}:{port}/{name}/', file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
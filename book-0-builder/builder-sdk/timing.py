@@ -0,0 +1,166 @@
+"""Timing spans for builder runs (--timings and --trace)."""
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+
+class _NullSpan:
+    """Span returned while recording is disabled; does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed region, recorded when it exits."""
+
+    __slots__ = ('recorder', 'name', 'category', 'args', 'start')
+
+    def __init__(self, recorder, name, category, args):
+        self.recorder = recorder
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.recorder.events.append(
+            (self.name, self.category, self.start, end - self.start, threading.get_ident(), self.args))
+        return False
+
+    def set(self, **args):
+        """Attach arguments (e.g. bytes=...) to the span."""
+        self.args.update(args)
+
+
+class Recorder:
+    """
+    Spans recorded in this process.
+
+    Each event is (name, category, start_ns, duration_ns, thread id, args).
+    Process pool workers record into their own copy, which is discarded,
+    so only work done in the main process shows up.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.events = []
+
+    def summary(self):
+        """Return per-category totals as {category: (count, ns, bytes)}."""
+        totals = {}
+        for _, category, _, duration, _, args in self.events:
+            count, ns, size = totals.get(category, (0, 0, 0))
+            totals[category] = (count + 1, ns + duration, size + args.get('bytes', 0))
+        return totals
+
+    def fragments(self):
+        """Return {fragment: (ns, rendered bytes, parse ns)} per fragment."""
+        parse = {}
+        for name, category, _, duration, _, _ in self.events:
+            if category == 'parse':
+                parse[name] = parse.get(name, 0) + duration
+        result = {}
+        for name, category, _, duration, _, args in self.events:
+            if category == 'fragment':
+                result[name] = (duration, args.get('bytes', 0), parse.get(name, 0))
+        return result
+
+    def format_timings(self):
+        """Return the per-stage and per-fragment tables for --timings."""
+        lines = [f"{'stage':<12} {'count':>6} {'total ms':>10} {'bytes':>12}"]
+        for category, (count, ns, size) in sorted(self.summary().items(), key=lambda item: -item[1][1]):
+            if category == 'fragment':
+                continue
+            lines.append(f'{category:<12} {count:>6} {ns / 1e6:>10.2f} {size:>12}')
+        fragments = self.fragments()
+        if fragments:
+            lines.append('')
+            lines.append(f"{'fragment':<24} {'total ms':>10} {'parse ms':>10} {'bytes':>12}")
+            for name, (ns, size, parse_ns) in sorted(fragments.items(), key=lambda item: -item[1][0]):
+                lines.append(f'{name:<24} {ns / 1e6:>10.2f} {parse_ns / 1e6:>10.2f} {size:>12}')
+        return '\n'.join(lines)
+
+    def trace_events(self):
+        """Return the spans as Chrome trace-event ('X' complete) events."""
+        pid = os.getpid()
+        return [
+            {
+                'name': str(name),
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - self.origin) / 1000,
+                'dur': duration / 1000,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            }
+            for name, category, start, duration, tid, args in self.events
+        ]
+
+    def write_trace(self, path):
+        """Write a trace file loadable in chrome://tracing or Perfetto."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f, default=str)
+
+
+# Global recorder (None: spans are disabled)
+_recorder = None
+
+
+def enable():
+    """Start recording spans in this process and return the recorder."""
+    global _recorder
+    if _recorder is None:
+        _recorder = Recorder()
+    return _recorder
+
+
+def get_recorder():
+    """Return the active recorder, or None if spans are disabled."""
+    return _recorder
+
+
+def span(name, category, **args):
+    """Return a context manager timing a region as name in category.
+
+    While recording is disabled this returns a shared no-op span, so
+    instrumented code pays one global lookup and call.
+
+    Example:
+        with timing.span(template_path, 'render') as s:
+            rendered = template.render(...)
+            s.set(bytes=len(rendered))
+    """
+    if _recorder is None:
+        return _NULL_SPAN
+    return Span(_recorder, name, category, args)
+
+
+def report(timings=False, trace_path=None):
+    """Print the timing tables to stderr and/or write a trace file."""
+    if _recorder is None:
+        return
+    if timings:
+        print(_recorder.format_timings(), file=sys.stderr)
+    if trace_path:
+        _recorder.write_trace(trace_path)
+        print(f'Trace: {trace_path}', file=sys.stderr)
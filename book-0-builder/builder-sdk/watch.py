@@ -0,0 +1,339 @@
+"""Watch mode: rebuild artifacts in a long-lived process as sources change."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+from . import artifacts
+from . import renderer
+from .context import BuildContext
+
+DEFAULT_POLL_INTERVAL = 0.5
+# Quiet period that ends a batch of changes (editors write in several steps)
+DEBOUNCE = 0.05
+# Directories never watched
+SKIP_DIRS = {'.git', '__pycache__', 'output', 'node_modules'}
+BUILDER_DIR = 'book-0-builder/builder-sdk'
+
+# inotify(7) event bits
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT = struct.Struct('iIII')
+
+
+def _walk_dirs(root):
+    """Yield root and every directory below it, skipping SKIP_DIRS."""
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+        yield dirpath
+
+
+class InotifyWatcher:
+    """
+    Recursive watch of directory trees with Linux inotify, via ctypes.
+
+    A watch is added for every directory under roots; directories created
+    later are added as their creation is seen. Raises OSError where
+    inotify is unavailable (not Linux, or the watch limit is reached).
+    """
+
+    def __init__(self, roots):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise OSError(f'inotify unavailable: {e}')
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f'inotify_init1: {os.strerror(errno)}')
+        self.roots = [str(root) for root in roots]
+        self._dirs = {}
+        try:
+            for root in self.roots:
+                self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, path):
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f'inotify_add_watch {path}: {os.strerror(errno)}')
+        self._dirs[wd] = path
+
+    def _watch_tree(self, root):
+        for path in _walk_dirs(root):
+            self._watch(path)
+
+    def _read(self, changed):
+        """Read pending events into changed; return False on queue overflow."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return True
+        offset = 0
+        complete = True
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                complete = False
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._dirs[wd]
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                if os.path.basename(path) in SKIP_DIRS:
+                    continue
+                # Files may land in a new directory before its watch exists
+                try:
+                    self._watch_tree(path)
+                except OSError:
+                    pass
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+                    changed.update(os.path.join(dirpath, f) for f in filenames)
+            changed.add(path)
+        return complete
+
+    def changes(self, timeout=None):
+        """Block until files change; return the set of changed paths.
+
+        Returns an empty set if timeout (seconds) passes first. After the
+        first event, events are collected until DEBOUNCE seconds pass
+        without one. If the kernel queue overflowed, the roots are
+        returned, meaning "anything may have changed".
+        """
+        changed = set()
+        complete = True
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        while ready:
+            complete = self._read(changed) and complete
+            ready, _, _ = select.select([self.fd], [], [], DEBOUNCE)
+        if not complete:
+            changed.update(self.roots)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """Watch of directory trees by comparing (mtime, size) snapshots."""
+
+    def __init__(self, roots, interval=DEFAULT_POLL_INTERVAL):
+        self.roots = [str(root) for root in roots]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS]
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def changes(self, timeout=None):
+        """Block until files change; return the set of changed paths.
+
+        Returns an empty set if timeout (seconds) passes first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return set()
+            time.sleep(delay)
+            snapshot = self._scan()
+            changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(roots, poll_interval=None):
+    """Return an InotifyWatcher for roots, or a PollingWatcher.
+
+    Polls every poll_interval seconds if given, or when inotify is
+    unavailable (reported on stderr).
+    """
+    if poll_interval is None:
+        try:
+            return InotifyWatcher(roots)
+        except OSError as e:
+            print(f'Warning: {e}; polling every {DEFAULT_POLL_INTERVAL}s instead', file=sys.stderr)
+            poll_interval = DEFAULT_POLL_INTERVAL
+    return PollingWatcher(roots, poll_interval)
+
+
+def default_roots(config_dir):
+    """Return the book directories in the working directory and config_dir."""
+    roots = sorted(path.as_posix() for path in Path('.').glob('book-*') if path.is_dir())
+    if Path(config_dir).is_dir():
+        roots.append(Path(config_dir).as_posix())
+    return roots
+
+
+def _is_relevant(path):
+    """Return False for editor swap, backup and temporary files."""
+    name = os.path.basename(path)
+    return not (name.startswith('.#') or name.endswith(('~', '.swp', '.swx', '.tmp'))
+                or name == '4913')
+
+
+def _under(path, directory):
+    path = os.path.abspath(path)
+    directory = os.path.abspath(directory)
+    return path == directory or path.startswith(directory + os.sep)
+
+
+class WatchSession:
+    """
+    Warm renderer state for repeated builds of the "render all" artifacts.
+
+    The Jinja2 environment (compiled templates, reloaded when their
+    source changes), the fragment index and the BuildContext stay in
+    memory between builds; the context is rebuilt only when a file in
+    config_dir changes. Each build uses a fresh incremental BuildPlan, so
+    only artifacts whose input fingerprints changed are rendered and
+    written.
+    """
+
+    def __init__(self, config_dir, output_dir, include=None, exclude=None, layer=None, for_iso=False,
+                 jobs=None, pack_threshold=None, dedupe_min_size=None,
+                 artifacts_path=artifacts.DEFAULT_PATH):
+        self.config_dir = config_dir
+        self.output_dir = Path(output_dir)
+        self.selection = dict(include=include, exclude=exclude, layer=layer, for_iso=for_iso)
+        self.plan_options = dict(jobs=jobs, pack_threshold=pack_threshold, dedupe_min_size=dedupe_min_size)
+        self.artifacts_path = artifacts_path
+        # The precompiled bundle is never reloaded, so render from sources
+        env = renderer.create_environment(bytecode_cache_dir=renderer.BYTECODE_CACHE_DIR)
+        renderer.reset_environment(env)
+        self.ctx = BuildContext(config_dir)
+
+    def build(self, changed=()):
+        """Render the artifacts affected by changed paths.
+
+        Returns:
+            (written paths, [(artifact, exception)] for failed artifacts)
+        """
+        if any(_under(path, self.config_dir) for path in changed):
+            self.ctx = BuildContext(self.config_dir)
+        plan = renderer.BuildPlan(self.ctx, incremental=True, **self.plan_options)
+        written = []
+        errors = []
+        steps = [
+            ('scripts', lambda: renderer.render_scripts_to_dir(
+                self.ctx, self.output_dir / 'scripts', plan=plan, artifacts_path=self.artifacts_path)),
+            ('cloud-init.yaml', lambda: renderer.render_cloud_init_to_file(
+                self.ctx, (self.output_dir / 'cloud-init.yaml').as_posix(), plan=plan,
+                artifacts_path=self.artifacts_path, **self.selection)),
+            ('user-data', lambda: renderer.render_autoinstall_to_file(
+                self.ctx, (self.output_dir / 'user-data').as_posix(), plan=plan,
+                artifacts_path=self.artifacts_path)),
+        ]
+        with artifacts.transaction(self.artifacts_path):
+            for name, step in steps:
+                try:
+                    result = step()
+                except Exception as e:
+                    errors.append((name, e))
+                    continue
+                if isinstance(result, list):
+                    written.extend(result)
+                elif result:
+                    written.append((self.output_dir / name).as_posix())
+        return written, errors
+
+
+def _describe(paths, limit=3):
+    paths = sorted(paths)
+    text = ', '.join(paths[:limit])
+    if len(paths) > limit:
+        text += f' (+{len(paths) - limit} more)'
+    return text
+
+
+def _log(message, file=sys.stdout):
+    print(f"[{time.strftime('%H:%M:%S')}] {message}", file=file, flush=True)
+
+
+def _report(session, changed, label):
+    start = time.perf_counter()
+    written, errors = session.build(changed)
+    elapsed = (time.perf_counter() - start) * 1000
+    if written:
+        _log(f'{label}: rebuilt {_describe(written)} in {elapsed:.1f} ms')
+    else:
+        _log(f'{label}: no artifacts affected ({elapsed:.1f} ms)')
+    for name, error in errors:
+        _log(f'Error: {name}: {type(error).__name__}: {error}', file=sys.stderr)
+
+
+def watch(session, roots, poll_interval=None):
+    """Build once, then rebuild whenever files under roots change.
+
+    Runs until interrupted; each rebuild is logged with its latency,
+    measured from when the changes were seen.
+    """
+    watcher = open_watcher(roots, poll_interval)
+    kind = 'inotify' if isinstance(watcher, InotifyWatcher) else f'polling every {watcher.interval}s'
+    _log(f"Watching {', '.join(roots)} ({kind})")
+    try:
+        _report(session, (), 'Initial build')
+        while True:
+            changed = {path for path in watcher.changes() if _is_relevant(path)}
+            if not changed:
+                continue
+            if any(_under(path, BUILDER_DIR) and path.endswith('.py') for path in changed):
+                _log('Warning: builder sources changed; restart watch to use them', file=sys.stderr)
+            _report(session, changed, _describe(changed))
+    finally:
+        watcher.close()
@@ -0,0 +1,79 @@
+"""YAML loading and dumping shared by the builder.
+
+Uses PyYAML's libyaml-backed CSafeLoader and CDumper when available,
+falling back to the pure-Python SafeLoader and Dumper otherwise.
+"""
+
+import copy
+import os
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+    from yaml import CDumper as _BaseDumper
+except ImportError:
+    from yaml import SafeLoader
+    from yaml import Dumper as _BaseDumper
+
+
+# Custom YAML representer for multiline strings using literal block scalars
+def str_representer(dumper, data):
+    """Use literal block scalar (|) for multiline strings.
+
+    Also forces quoting for numeric-looking strings (like permissions '644')
+    to ensure cloud-init schema validation passes.
+    """
+    if '\n' in data:
+        # Use literal block style for multiline
+        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+    # Force single quotes for strings that look like numbers (e.g., '0644', '0755')
+    # This ensures cloud-init doesn't interpret them as integers
+    # Matches: pure digits, or leading 0 followed by digits (octal-like permissions)
+    if data.isdigit() or (len(data) > 1 and data[0] == '0' and data[1:].isdigit()):
+        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style="'")
+    return dumper.represent_scalar('tag:yaml.org,2002:str', data)
+
+
+class Dumper(_BaseDumper):
+    """Dumper for builder output, with str_representer registered."""
+
+
+Dumper.add_representer(str, str_representer)
+
+
+def safe_load(stream):
+    """Parse a YAML document from a string or file."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None, **kwargs):
+    """Dump data with the builder Dumper, unless another Dumper is given
+    (see yaml.dump for options)."""
+    kwargs.setdefault('Dumper', Dumper)
+    return yaml.dump(data, stream, **kwargs)
+
+
+# Parsed files, keyed by path, with the (mtime_ns, size) they were parsed at
+_files = {}
+
+
+def clear_file_cache():
+    """Forget parsed files, so the next load_file parses them again."""
+    _files.clear()
+
+
+def load_file(path):
+    """Parse a YAML file, reusing the result while its mtime and size are
+    unchanged.
+
+    Returns a deep copy, so callers may modify the result freely.
+    """
+    key = os.fspath(path)
+    st = os.stat(key)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _files.get(key)
+    if cached is None or cached[0] != stamp:
+        with open(key) as f:
+            cached = (stamp, safe_load(f))
+        _files[key] = cached
+    return copy.deepcopy(cached[1])
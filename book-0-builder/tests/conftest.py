@@ -0,0 +1,117 @@
+"""Shared fixtures; makes book-0-builder/builder-sdk importable as 'builder'."""
+
+import importlib.util
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SDK_DIR = REPO_ROOT / 'book-0-builder' / 'builder-sdk'
+
+if 'builder' not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        'builder', SDK_DIR / '__init__.py', submodule_search_locations=[str(SDK_DIR)])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['builder'] = module
+    spec.loader.exec_module(module)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty working directory with fresh renderer state."""
+    from builder import renderer
+
+    def reset():
+        renderer.reset_state()
+        renderer.track_config_reads(False)
+        renderer.use_render_cache()
+
+    monkeypatch.chdir(tmp_path)
+    reset()
+    yield tmp_path
+    reset()
+
+
+@pytest.fixture
+def repo_tree(workdir):
+    """workdir holding copies of the fragment books, and the example
+    configs as config/*.config.yaml."""
+    for book in ('book-1-foundation', 'book-2-cloud'):
+        shutil.copytree(REPO_ROOT / book, workdir / book)
+    config_dir = workdir / 'config'
+    config_dir.mkdir()
+    for example in REPO_ROOT.glob('book-*/**/*.config.yaml.example'):
+        shutil.copy(example, config_dir / example.name.removesuffix('.example'))
+    return workdir
+
+
+@pytest.fixture
+def render_tree(repo_tree, monkeypatch):
+    """repo_tree that renders end to end: the base fragment (which embeds
+    cloud_init) is dropped for a minimal user-data template, build layers
+    are copied in, hashes are salted and the render cache is off."""
+    from builder import renderer
+    monkeypatch.setenv('BUILDER_SALT_SECRET', 'test')
+    (repo_tree / 'book-1-foundation' / 'base' / 'build.yaml').unlink()
+    (repo_tree / renderer.AUTOINSTALL_TEMPLATE).write_text(
+        'autoinstall:\n  user-data:\n    {{ cloud_init | to_yaml | indent(4) }}\n')
+    (repo_tree / renderer.BUILD_LAYERS_PATH).parent.mkdir(parents=True)
+    shutil.copy(REPO_ROOT / renderer.BUILD_LAYERS_PATH, repo_tree / renderer.BUILD_LAYERS_PATH)
+    renderer.use_render_cache(False)
+    return repo_tree
+
+
+def output_files(directory):
+    """{relative path: bytes} of the files under directory, without the
+    artifacts.yaml manifest and its lock."""
+    return {
+        path.relative_to(directory).as_posix(): path.read_bytes()
+        for path in sorted(Path(directory).rglob('*'))
+        if path.is_file() and not path.name.startswith('artifacts.yaml')
+    }
+
+
+class FragmentTree:
+    """Writes fragments, templates and config files under a working
+    directory; paths are relative to it."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def write(self, path, text):
+        """Write text to root/path, creating directories; return the path."""
+        path = self.root / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        return path
+
+    def config(self, key, text):
+        """Write config/<key>.config.yaml."""
+        return self.write(f'config/{key}.config.yaml', text)
+
+    def fragment(self, name='demo', template='hostname: {{ network.hostname }}\n', scripts=None,
+                 build_order=1, build_layer=1, **meta):
+        """Write book-2-cloud/<name>/ with a build.yaml, fragment.yaml.tpl
+        and scripts/<file>.tpl per scripts entry; return the template path."""
+        from builder import yamlio
+        meta = {'name': name, 'build_order': build_order, 'build_layer': build_layer, **meta}
+        self.write(f'book-2-cloud/{name}/build.yaml', yamlio.dump(meta, sort_keys=False))
+        for filename, text in (scripts or {}).items():
+            self.write(f'book-2-cloud/{name}/scripts/{filename}.tpl', text)
+        return self.write(f'book-2-cloud/{name}/fragment.yaml.tpl', template)
+
+    def context(self):
+        """BuildContext for config/."""
+        from builder.context import BuildContext
+        return BuildContext('config')
+
+
+@pytest.fixture
+def fragment_tree(workdir):
+    """FragmentTree in workdir, with config/network.config.yaml setting
+    network.hostname to 'host' and no fragments yet."""
+    tree = FragmentTree(workdir)
+    tree.config('network', 'network:\n  hostname: host\n')
+    return tree
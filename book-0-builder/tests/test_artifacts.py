@@ -0,0 +1,174 @@
+"""Artifact writes skip unchanged files, replace others atomically, and
+is_current checks the file still holds what was written; manifest
+transactions keep every writer's entries."""
+
+import multiprocessing
+import os
+
+import pytest
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from builder import artifacts, renderer
+
+MANIFEST = 'out/artifacts.yaml'
+
+
+def _write(content, path='out/a.sh', fingerprint='f1', **kwargs):
+    return artifacts.write('scripts', 'a.sh', path, content=content, artifacts_path=MANIFEST,
+                           fingerprint=fingerprint, **kwargs)
+
+
+def _current(fingerprint='f1', path='out/a.sh'):
+    return artifacts.is_current('scripts', 'a.sh', path, fingerprint, MANIFEST)
+
+
+def test_unchanged_write_is_skipped(workdir):
+    assert _write('echo one\n')
+    os.utime('out/a.sh', (1000000000, 1000000000))
+    assert not _write('echo one\n')
+    assert os.stat('out/a.sh').st_mtime == 1000000000
+    assert artifacts.load(MANIFEST)['content']['scripts:a.sh']['size'] == len('echo one\n')
+
+
+def test_changed_write_replaces_file(workdir):
+    _write('echo one\n')
+    os.chmod('out/a.sh', 0o755)
+    inode = os.stat('out/a.sh').st_ino
+    assert _write('echo two\n')
+    with open('out/a.sh') as f:
+        assert f.read() == 'echo two\n'
+    assert os.stat('out/a.sh').st_ino != inode
+    assert os.stat('out/a.sh').st_mode & 0o777 == 0o755
+    assert sorted(os.listdir('out')) == ['a.sh', 'artifacts.yaml', 'artifacts.yaml.lock']
+
+
+def test_failed_write_leaves_file(workdir):
+    _write('echo one\n')
+
+    def writer(f):
+        raise RuntimeError('render failed')
+
+    with pytest.raises(RuntimeError):
+        _write('echo two\n', writer=writer)
+    with open('out/a.sh') as f:
+        assert f.read() == 'echo one\n'
+    assert not [name for name in os.listdir('out') if name.endswith('.tmp')]
+
+
+def test_is_current(workdir):
+    assert not _current()
+    _write('echo one\n')
+    assert _current()
+    assert not _current(fingerprint='f2')
+    assert not _current(path='out/b.sh')
+
+
+@pytest.mark.parametrize('edit', ['echo One\n', 'echo one\necho two\n', ''])
+def test_edited_file_is_not_current(workdir, edit):
+    _write('echo one\n')
+    with open('out/a.sh', 'w') as f:
+        f.write(edit)
+    assert not _current()
+
+
+def test_missing_file_is_not_current(workdir):
+    _write('echo one\n')
+    os.remove('out/a.sh')
+    assert not _current()
+
+
+def test_entry_without_content_record_is_not_current(workdir):
+    _write('echo one\n')
+    manifest = artifacts.load(MANIFEST)
+    del manifest['content']
+    artifacts.save(manifest, MANIFEST)
+    assert not _current()
+
+
+def test_incremental_render_restores_edited_output(fragment_tree):
+    fragment_tree.fragment(scripts={'setup.sh': 'hostname {{ network.hostname }}\n'})
+    ctx = fragment_tree.context()
+
+    def render():
+        plan = renderer.BuildPlan(ctx, incremental=True)
+        return renderer.render_scripts_to_dir(ctx, 'out/scripts', plan=plan, artifacts_path=MANIFEST)
+
+    assert render() == ['out/scripts/setup.sh']
+    assert render() == []
+    with open('out/scripts/setup.sh', 'w') as f:
+        f.write('hostname HOST\n')
+    assert render() == ['out/scripts/setup.sh']
+    with open('out/scripts/setup.sh') as f:
+        assert f.read() == 'hostname host\n'
+
+
+def _record(prefix, count, barrier):
+    barrier.wait()
+    for n in range(count):
+        with artifacts.transaction(MANIFEST):
+            artifacts.update('scripts', f'{prefix}{n}', f'out/{prefix}{n}', path=MANIFEST)
+            artifacts.update(None, f'{prefix}_last', n, path=MANIFEST)
+
+
+@pytest.mark.skipif(fcntl is None, reason='manifest locking needs fcntl')
+def test_concurrent_transactions_keep_both_writers(workdir):
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(2)
+    workers = [context.Process(target=_record, args=(prefix, 25, barrier)) for prefix in ('a', 'b')]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+    manifest = artifacts.load(MANIFEST)
+    assert manifest['scripts'] == {
+        f'{prefix}{n}': f'out/{prefix}{n}' for prefix in ('a', 'b') for n in range(25)}
+    assert manifest['a_last'] == manifest['b_last'] == 24
+
+
+def _lock_is_free():
+    with open(f'{MANIFEST}.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        return True
+
+
+@pytest.mark.skipif(fcntl is None, reason='manifest locking needs fcntl')
+def test_exception_in_transaction(workdir):
+    artifacts.update('scripts', 'old.sh', 'out/old.sh', path=MANIFEST)
+    with pytest.raises(RuntimeError):
+        with artifacts.transaction(MANIFEST):
+            artifacts.update('scripts', 'new.sh', 'out/new.sh', path=MANIFEST)
+            raise RuntimeError('render failed')
+    assert _lock_is_free()
+    # Entries recorded before the exception are committed over the old ones
+    assert artifacts.load(MANIFEST)['scripts'] == {'old.sh': 'out/old.sh', 'new.sh': 'out/new.sh'}
+    assert not artifacts._transactions
+
+
+@pytest.mark.skipif(fcntl is None, reason='manifest locking needs fcntl')
+def test_failed_commit_keeps_previous_manifest(workdir, monkeypatch):
+    artifacts.update('scripts', 'old.sh', 'out/old.sh', path=MANIFEST)
+    with open(MANIFEST) as f:
+        previous = f.read()
+
+    def dump(data, stream, **kwargs):
+        stream.write('scripts:\n')
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(artifacts.yamlio, 'dump', dump)
+    with pytest.raises(OSError):
+        with artifacts.transaction(MANIFEST):
+            artifacts.update('scripts', 'new.sh', 'out/new.sh', path=MANIFEST)
+    assert _lock_is_free()
+    with open(MANIFEST) as f:
+        assert f.read() == previous
+    assert sorted(os.listdir('out')) == ['artifacts.yaml', 'artifacts.yaml.lock']
+    assert not artifacts._transactions
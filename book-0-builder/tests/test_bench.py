@@ -0,0 +1,68 @@
+"""Pipeline benchmark against the committed baseline (bench_baseline.json).
+
+Runs offline on a small synthetic tree. Set BUILDER_BENCH_UPDATE=1 to
+rewrite the baseline from this machine, or BUILDER_BENCH_THRESHOLD to
+change the allowed slowdown (a fraction, default 1.0 = twice as slow).
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from builder import bench, renderer
+
+BASELINE_PATH = Path(__file__).parent / 'bench_baseline.json'
+PARAMS = dict(fragments=50, payload_kib=8, depth=6, env_overrides=50)
+REPEAT = 7
+DEFAULT_THRESHOLD = 1.0
+
+
+@pytest.fixture(scope='module')
+def results():
+    cwd = os.getcwd()
+    results = bench.run_benchmarks(repeat=REPEAT, **PARAMS)
+    assert os.getcwd() == cwd
+    return results
+
+
+@pytest.mark.bench
+def test_against_baseline(results):
+    if os.environ.get('BUILDER_BENCH_UPDATE'):
+        bench.save_results(results, BASELINE_PATH)
+    baseline = bench.load_results(BASELINE_PATH)
+    assert baseline['params'] == results['params']
+    threshold = float(os.environ.get('BUILDER_BENCH_THRESHOLD', DEFAULT_THRESHOLD))
+    regressions = bench.compare(results, baseline, threshold)
+    assert not regressions, '\n' + bench.format_results(results, baseline)
+
+
+@pytest.mark.bench
+def test_every_stage_is_timed(results):
+    assert list(results['stages']) == list(bench.STAGES)
+    for timing in results['stages'].values():
+        assert 0 < timing['min'] <= timing['median']
+        assert timing['repeat'] == REPEAT
+
+
+@pytest.mark.bench
+def test_state_is_restored(results):
+    assert not any(name.startswith('AUTOINSTALL_BENCH_') for name in os.environ)
+    assert renderer.get_render_cache() is not None
+
+
+def _results(**stages):
+    return {'stages': {stage: {'min': seconds, 'median': seconds} for stage, seconds in stages.items()}}
+
+
+def test_compare():
+    baseline = _results(merge_all=0.010, yaml_dump=0.020, sha512_hash=0.100)
+    current = _results(merge_all=0.012, yaml_dump=0.030, render_scripts=0.5)
+    assert bench.compare(current, baseline, threshold=0.25) == [('yaml_dump', 0.020, 0.030)]
+    assert bench.compare(current, baseline, threshold=0.6) == []
+
+
+def test_format_results():
+    text = bench.format_results(_results(merge_all=0.002), _results(merge_all=0.001))
+    assert 'merge_all' in text
+    assert '+100.0%' in text
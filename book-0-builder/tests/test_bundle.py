@@ -0,0 +1,46 @@
+"""Precompiled template bundle and bytecode cache must render as the
+template sources do."""
+
+import os
+
+import pytest
+from jinja2 import ChoiceLoader, TemplateNotFound
+
+from builder import renderer
+from builder.context import BuildContext
+from conftest import output_files
+
+
+def _render_all(root, name):
+    renderer.reset_state()
+    ctx = BuildContext('config')
+    renderer.render_all(ctx, root / name, artifacts_path=(root / name / 'artifacts.yaml').as_posix())
+    return output_files(root / name)
+
+
+def test_bundle_matches_sources(render_tree):
+    expected = _render_all(render_tree, 'source')
+    assert renderer.compile_templates()
+    assert _render_all(render_tree, 'bundle') == expected
+    assert isinstance(renderer.get_environment().loader, ChoiceLoader)
+
+
+def test_bytecode_cache_matches_sources(render_tree):
+    expected = _render_all(render_tree, 'first')
+    assert os.listdir(renderer.BYTECODE_CACHE_DIR)
+    assert _render_all(render_tree, 'second') == expected
+
+
+def test_edited_template_loads_from_source(fragment_tree, capsys):
+    first = fragment_tree.fragment('first', template='first: {{ network.hostname }}\n')
+    second = fragment_tree.fragment('second', template='second: {{ network.hostname }}\n', build_order=2)
+    renderer.compile_templates()
+    fragment_tree.fragment('first', template='first: {{ network.hostname }}.lan\n')
+
+    renderer.reset_state()
+    bundle = renderer.get_environment().loader.loaders[0]
+    assert '1 template(s) changed' in capsys.readouterr().err
+    with pytest.raises(TemplateNotFound):
+        bundle.load(renderer.get_environment(), first.relative_to(fragment_tree.root).as_posix())
+    assert bundle.load(renderer.get_environment(), second.relative_to(fragment_tree.root).as_posix())
+    assert renderer.BuildPlan(fragment_tree.context()).cloud_init() == {'first': 'host.lan', 'second': 'host'}
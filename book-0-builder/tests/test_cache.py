@@ -0,0 +1,124 @@
+"""Render cache: keying, invalidation and LRU eviction."""
+
+import os
+
+import pytest
+
+from builder import renderer
+from builder.cache import RenderCache
+
+TEMPLATE = """\
+{% if testing is defined and testing %}
+mode: testing
+{% endif %}
+hostname: {{ network.hostname }}
+"""
+
+
+@pytest.fixture
+def tree(fragment_tree):
+    fragment_tree.write('demo.tpl', TEMPLATE)
+    renderer.use_render_cache(cache_dir=fragment_tree.root / 'cache')
+    return fragment_tree
+
+
+def _key(tree, template='demo.tpl', **extra_context):
+    return renderer._render_key(tree.context(), template, extra_context)
+
+
+def test_key_is_stable(tree):
+    assert _key(tree) == _key(tree)
+
+
+def test_key_covers_values_and_presence(tree):
+    before = _key(tree)
+    tree.config('network', 'network:\n  hostname: host\n  domain: home\n')
+    changed = _key(tree)
+    assert changed != before
+    tree.config('testing', 'testing: false\n')
+    assert _key(tree) != changed
+
+
+def test_key_covers_extra_context(tree):
+    assert _key(tree, scripts={'a.sh': 'x'}) != _key(tree, scripts={'a.sh': 'y'})
+
+
+def test_key_ignores_recorded_reads(tree):
+    # A record claiming fewer reads must not let other config share output
+    ctx = tree.context()
+    renderer._record_reads('demo.tpl', ctx.to_dict(), {('network', 'hostname')})
+    assert 'mode: testing' not in renderer.render_text(ctx, 'demo.tpl')
+
+    tree.config('testing', 'testing: true\n')
+    assert 'mode: testing' in renderer.render_text(tree.context(), 'demo.tpl')
+
+
+def test_nondeterministic_templates_are_not_cached(tree):
+    tree.write('hash.tpl', "{{ 'pw' | sha512_hash }}\n")
+    assert _key(tree, 'hash.tpl') is None
+
+
+def test_dynamic_includes_are_not_cached(tree):
+    tree.write('parts/host.tpl', 'part: one\n')
+    tree.write('dynamic.tpl', "{% include 'parts/' ~ network.hostname ~ '.tpl' %}")
+    tree.write('outer.tpl', "{% include 'dynamic.tpl' %}")
+    assert _key(tree, 'dynamic.tpl') is None
+    assert _key(tree, 'outer.tpl') is None
+
+    ctx = tree.context()
+    assert renderer.render_text(ctx, 'outer.tpl') == 'part: one\n'
+    tree.write('parts/host.tpl', 'part: two\n')
+    assert renderer.render_text(ctx, 'outer.tpl') == 'part: two\n'
+    assert renderer.get_render_cache().stats()['entries'] == 0
+
+
+def test_template_change_invalidates(tree):
+    ctx = tree.context()
+    assert renderer.render_text(ctx, 'demo.tpl') == '\nhostname: host\n'
+    assert renderer.get_render_cache().get(_key(tree)) == '\nhostname: host\n'
+
+    tree.write('demo.tpl', 'name: {{ network.hostname }}\n')
+    assert renderer.render_text(ctx, 'demo.tpl') == 'name: host\n'
+
+
+def test_hit_and_miss_counts(tree):
+    ctx = tree.context()
+    renderer.render_text(ctx, 'demo.tpl')
+    renderer.render_text(ctx, 'demo.tpl')
+    stats = renderer.get_render_cache().stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_put_overwrite_keeps_size(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=1000)
+    cache.put('aa01', 'x' * 100)
+    cache.put('aa02', 'y' * 100)
+    for _ in range(20):
+        cache.put('aa01', 'x' * 100)
+    assert cache._size == cache.stats()['bytes'] == 200
+    assert cache.stats()['evictions'] == 0
+    assert cache.get('aa02') == 'y' * 100
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = RenderCache(tmp_path, max_bytes=250)
+    for i, key in enumerate(['aa01', 'aa02']):
+        cache.put(key, str(i) * 100)
+        os.utime(cache._path(key), ns=(i * 10**9, i * 10**9))
+    # A hit makes the older entry the most recently used
+    assert cache.get('aa01') == '0' * 100
+
+    cache.put('aa03', '3' * 100)
+    assert cache.get('aa02') is None
+    assert cache.get('aa01') == '0' * 100
+    assert cache.get('aa03') == '3' * 100
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= 250
+
+
+def test_evict_to_smaller_limit(tmp_path):
+    cache = RenderCache(tmp_path)
+    for i in range(5):
+        cache.put(f'aa0{i}', 'z' * 100)
+    cache.evict(max_bytes=250)
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,112 @@
+"""CIDATA images: volume descriptors and directory extents as an ISO 9660
+reader sees them."""
+
+import io
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from builder import cidata
+
+SECTOR = cidata.SECTOR
+FILES = {
+    'user-data': b'#cloud-config\n' + b''.join(b'# line %d\n' % n for n in range(400)),
+    'meta-data': b'instance-id: demo\n',
+    'vendor-data': b'',
+}
+
+
+def _image(files=FILES, **kwargs):
+    stream = io.BytesIO()
+    size = cidata.write_image(stream, files, timestamp=1700000000, **kwargs)
+    image = stream.getvalue()
+    assert size == len(image) == cidata.image_size(files)
+    return image
+
+
+def _sector(image, number):
+    return image[number * SECTOR:(number + 1) * SECTOR]
+
+
+def _both32(data, offset):
+    little, = struct.unpack_from('<I', data, offset)
+    big, = struct.unpack_from('>I', data, offset + 4)
+    assert little == big
+    return little
+
+
+def _directory(image, descriptor):
+    """Return {identifier: (extent, size)} for the root directory the
+    descriptor's root record points at."""
+    root = descriptor[156:156 + 34]
+    extent, size = _both32(root, 2), _both32(root, 10)
+    data = image[extent * SECTOR:extent * SECTOR + size]
+    entries, offset = {}, 0
+    while offset < len(data) and data[offset]:
+        length = data[offset]
+        record = data[offset:offset + length]
+        identifier = record[33:33 + record[32]]
+        entries[identifier] = (_both32(record, 2), _both32(record, 10))
+        offset += length
+    return entries
+
+
+def test_volume_descriptors():
+    image = _image()
+    primary, joliet, terminator = (_sector(image, n) for n in (16, 17, 18))
+    assert image[:16 * SECTOR] == bytes(16 * SECTOR)
+    assert primary[:7] == b'\x01CD001\x01'
+    assert joliet[:7] == b'\x02CD001\x01'
+    assert terminator[:7] == b'\xffCD001\x01'
+    assert joliet[88:91] == b'%/E'
+    for descriptor in (primary, joliet):
+        assert _both32(descriptor, 80) * SECTOR == len(image)
+
+
+def test_volume_id():
+    image = _image()
+    assert _sector(image, 16)[40:72] == b'CIDATA'.ljust(32)
+    assert _sector(image, 17)[40:72].decode('utf-16-be').rstrip() == 'CIDATA'
+
+
+@pytest.mark.parametrize('joliet', [False, True])
+def test_extents_point_at_file_data(joliet):
+    image = _image()
+    entries = _directory(image, _sector(image, 17 if joliet else 16))
+    assert set(entries) - {b'\0', b'\1'} == {
+        cidata._joliet_name(name) if joliet else cidata._primary_name(name) for name in FILES}
+    for name, data in FILES.items():
+        identifier = cidata._joliet_name(name) if joliet else cidata._primary_name(name)
+        extent, size = entries[identifier]
+        assert size == len(data)
+        assert image[extent * SECTOR:extent * SECTOR + size] == data
+    # user-data spans several sectors and is followed by zero padding
+    extent, size = entries[cidata._joliet_name('user-data') if joliet else b'USER_DATA.;1']
+    assert size > SECTOR
+    end = (extent + -(-size // SECTOR)) * SECTOR
+    assert image[extent * SECTOR + size:end] == bytes(end - extent * SECTOR - size)
+
+
+def test_empty_image():
+    image = _image({})
+    assert len(image) == cidata._DATA_SECTOR * SECTOR
+    assert set(_directory(image, _sector(image, 16))) == {b'\0', b'\1'}
+
+
+def test_reproducible():
+    assert _image() == _image(dict(reversed(list(FILES.items()))))
+
+
+def test_colliding_names():
+    with pytest.raises(ValueError):
+        _image({'user-data': b'a', 'user_data': b'b'})
+
+
+@pytest.mark.skipif(shutil.which('bsdtar') is None, reason='needs bsdtar')
+def test_bsdtar_extracts_files(tmp_path):
+    (tmp_path / 'cidata.iso').write_bytes(_image())
+    subprocess.run(['bsdtar', '-xf', 'cidata.iso'], cwd=tmp_path, check=True)
+    for name, data in FILES.items():
+        assert (tmp_path / name).read_bytes() == data
@@ -0,0 +1,44 @@
+"""CLI start-up: optional subcommand modules load only when used."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SDK_DIR
+
+LAZY_MODULES = ['builder.bench', 'builder.cidata', 'builder.serve', 'builder.watch']
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Run python with the builder package importable, in tmp_path."""
+    (tmp_path / 'builder').symlink_to(SDK_DIR, target_is_directory=True)
+    env = dict(os.environ, PYTHONPATH=str(tmp_path), COLUMNS='200')
+
+    def run(*args):
+        return subprocess.run([sys.executable, *args], cwd=tmp_path, env=env, capture_output=True,
+                              text=True, check=True).stdout
+    return run
+
+
+def test_subcommand_modules_are_not_imported(run):
+    loaded = run('-c', 'import sys, builder.__main__; '
+                       f'print(sorted(set(sys.modules) & set({LAZY_MODULES!r})))')
+    assert loaded.strip() == '[]'
+
+
+@pytest.mark.parametrize('command', ['render', 'deps', 'bench', 'watch', 'serve', 'seed', 'artifacts'])
+def test_help(run, command):
+    assert 'usage:' in run('-m', 'builder', command, '-h')
+
+
+def test_defaults_match_modules(run):
+    from builder import bench, serve, watch
+    assert f'default: {bench.DEFAULT_RESULTS_PATH}' in run('-m', 'builder', 'bench', '-h')
+    assert f'default: {bench.DEFAULT_THRESHOLD}' in run('-m', 'builder', 'bench', '-h')
+    assert f'default: {watch.DEFAULT_POLL_INTERVAL}' in run('-m', 'builder', 'watch', '-h')
+    serve_help = run('-m', 'builder', 'serve', '-h')
+    assert f'default: {serve.DEFAULT_BIND}' in serve_help
+    assert f'default: {serve.DEFAULT_PORT}' in serve_help
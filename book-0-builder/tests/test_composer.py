@@ -0,0 +1,55 @@
+"""merge_all against folding deep_merge."""
+
+import copy
+import functools
+import random
+
+from builder.composer import deep_merge, merge_all
+
+
+def _tree(rng, depth=3):
+    """A random fragment-like tree with overlapping keys."""
+    tree = {}
+    for _ in range(rng.randint(0, 4)):
+        key = rng.choice(['packages', 'runcmd', 'users', 'a', 'b', 'c'])
+        kind = rng.random()
+        if depth and kind < 0.4:
+            tree[key] = _tree(rng, depth - 1)
+        elif kind < 0.7:
+            tree[key] = [rng.choice(['x', 'y', {'k': 1}, [1, 2]]) for _ in range(rng.randint(0, 3))]
+        else:
+            tree[key] = rng.choice([None, 0, 'text', True, 1.5])
+    return tree
+
+
+def test_merge_all_matches_folding_deep_merge():
+    rng = random.Random(0)
+    for _ in range(500):
+        trees = [_tree(rng) for _ in range(rng.randint(0, 6))]
+        base = _tree(rng) if rng.random() < 0.5 else None
+        expected = functools.reduce(deep_merge, trees, {} if base is None else base)
+        assert merge_all(trees, base) == expected
+
+
+def test_merge_all_leaves_inputs_unmodified():
+    rng = random.Random(1)
+    for _ in range(500):
+        trees = [_tree(rng) for _ in range(rng.randint(1, 6))]
+        base = _tree(rng)
+        snapshot = copy.deepcopy((trees, base))
+        merge_all(trees, base)
+        assert (trees, base) == snapshot
+
+
+def test_merge_all_copies_shared_lists_before_extending():
+    shared = ['a']
+    first = {'packages': shared}
+    second = {'packages': ['b']}
+    result = merge_all([first, second])
+    assert result == {'packages': ['a', 'b']}
+    assert shared == ['a']
+    assert result['packages'] is not shared
+
+
+def test_merge_all_non_dict_tree_replaces_result():
+    assert merge_all([{'a': 1}, ['x'], {'b': 2}]) == functools.reduce(deep_merge, [{'a': 1}, ['x'], {'b': 2}], {})
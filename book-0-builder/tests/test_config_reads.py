@@ -0,0 +1,112 @@
+"""Config read tracking: recorded reads must cover keys the config lacks."""
+
+import pytest
+
+from builder import renderer
+from builder.context import TrackingDict
+
+TEMPLATE = """\
+{% if testing is defined and testing %}
+mode: testing
+{% else %}
+mode: production
+{% endif %}
+hostname: {{ network.hostname }}
+"""
+
+
+def _track(ctx, template):
+    renderer.track_config_reads()
+    try:
+        rendered = renderer.render_text(ctx, template)
+    finally:
+        renderer.track_config_reads(False)
+    renderer.save_config_reads()
+    return rendered
+
+
+def test_missing_top_level_name_is_recorded(fragment_tree):
+    fragment_tree.write('demo.tpl', TEMPLATE)
+    ctx = fragment_tree.context()
+
+    assert 'mode: production' in _track(ctx, 'demo.tpl')
+    paths = renderer.recorded_reads('demo.tpl', ctx.to_dict())
+    assert ('testing',) in paths
+    assert ('network', 'hostname') in paths
+
+
+def test_config_key_appears_later(fragment_tree):
+    fragment_tree.write('demo.tpl', TEMPLATE)
+    _track(fragment_tree.context(), 'demo.tpl')
+
+    fragment_tree.config('testing', 'testing: true\n')
+    ctx = fragment_tree.context()
+    assert renderer.recorded_reads('demo.tpl', ctx.to_dict()) is None
+    assert 'mode: testing' in renderer.render_text(ctx, 'demo.tpl')
+
+
+def test_extra_context_names_are_not_config_reads(fragment_tree):
+    fragment_tree.write('demo.tpl', '{{ scripts | length }} {{ network.hostname }}\n')
+    ctx = fragment_tree.context()
+
+    renderer.track_config_reads()
+    try:
+        renderer.render_text(ctx, 'demo.tpl', scripts={})
+    finally:
+        renderer.track_config_reads(False)
+    assert renderer.recorded_reads('demo.tpl', ctx.to_dict()) == [('network', 'hostname')]
+
+
+def test_fingerprint_changes_when_config_key_appears(fragment_tree):
+    fragment_tree.write('demo.tpl', TEMPLATE)
+    ctx = fragment_tree.context()
+    _track(ctx, 'demo.tpl')
+    before = renderer.BuildPlan(ctx).fingerprint(['demo.tpl'])
+    assert renderer.BuildPlan(ctx).fingerprint(['demo.tpl']) == before
+
+    fragment_tree.config('testing', 'testing: false\n')
+    assert renderer.BuildPlan(fragment_tree.context()).fingerprint(['demo.tpl']) != before
+
+
+def test_fingerprint_covers_presence_without_recorded_read(fragment_tree):
+    # A record that misses the name (e.g. written by an older builder)
+    fragment_tree.write('demo.tpl', TEMPLATE)
+    ctx = fragment_tree.context()
+    _track(ctx, 'demo.tpl')
+    record = renderer._load_config_reads()['demo.tpl']
+    record['paths'] = [['network', 'hostname']]
+    record['values'] = renderer._reads_digest(ctx.to_dict(), [('network', 'hostname')])
+    before = renderer.BuildPlan(ctx).fingerprint(['demo.tpl'])
+
+    fragment_tree.config('testing', 'testing: false\n')
+    ctx = fragment_tree.context()
+    assert renderer.recorded_reads('demo.tpl', ctx.to_dict()) is not None
+    assert renderer.BuildPlan(ctx).fingerprint(['demo.tpl']) != before
+
+
+@pytest.mark.parametrize('template', [
+    'dns: {{ network.dns | tojson }}\n',
+    'dns: {{ network | tojson }}\n',
+    "{% if network.dns == ['1.1.1.1', '8.8.8.8'] %}default{% endif %}\n",
+    "{% if ['1.1.1.1', '8.8.8.8'] != network.dns %}custom{% endif %}\n",
+    "{% if network == {'hostname': 'host', 'dns': ['1.1.1.1', '8.8.8.8']} %}default{% endif %}\n",
+    "{% if '8.8.8.8' in network.dns %}google{% endif %}\n",
+])
+def test_whole_value_reads_make_artifact_stale(fragment_tree, template):
+    fragment_tree.config('network', 'network:\n  hostname: host\n  dns: [1.1.1.1, 8.8.8.8]\n')
+    fragment_tree.write('demo.tpl', template)
+    ctx = fragment_tree.context()
+    _track(ctx, 'demo.tpl')
+    before = renderer.BuildPlan(ctx).fingerprint(['demo.tpl'])
+
+    fragment_tree.config('network', 'network:\n  hostname: host\n  dns: [1.1.1.1, 9.9.9.9]\n')
+    ctx = fragment_tree.context()
+    assert renderer.BuildPlan(ctx).fingerprint(['demo.tpl']) != before
+
+
+def test_comparison_records_whole_value():
+    reads = set()
+    data = TrackingDict({'network': {'dns': ['1.1.1.1'], 'hostname': 'host'}}, (), reads)
+    assert data['network']['dns'] == ['1.1.1.1']
+    assert {'dns': ['1.1.1.1'], 'hostname': 'host'} == data['network']
+    assert reads == {('network', 'dns'), ('network',)}
@@ -0,0 +1,111 @@
+"""Env override resolution: PathTrie against the original linear scan."""
+
+import os
+import random
+
+import pytest
+
+from builder import yamlio
+from builder.context import BuildContext
+
+CONFIG = {
+    'network': {
+        'hostname': 'host',
+        'interfaces': {'eth0': {'address': '10.0.0.2', 'gateway': '10.0.0.1'}},
+        'dns_servers': ['1.1.1.1'],
+        'dns': {'servers': ['8.8.8.8']},
+    },
+    'identity': {'username': 'admin', 'ssh_keys': [], 'ssh': {'keys': ['k']}},
+    'a_b': {'c': 1, 'c_d': 2},
+    'a': {'b_c': 3, 'b': {'c': 4, 'c-d': 5}},
+    'deep': {'l1': {'l2': {'l3': {'l4': {'value': 6}}}}},
+}
+
+
+def _linear_find_best_path(ctx, paths, env_name):
+    """The linear-scan _find_best_path BuildContext used before PathTrie."""
+    if env_name in paths:
+        best = max(paths[env_name], key=lambda c: ctx._path_score(c[1]))
+        return (*best, False)
+    best_match = None
+    best_len = 0
+    best_remainder = ''
+    for normalized, candidates in paths.items():
+        if env_name.startswith(normalized + '_') and len(normalized) > best_len:
+            best_len = len(normalized)
+            best_remainder = env_name[len(normalized) + 1:]
+            best_match = max(candidates, key=lambda c: ctx._path_score(c[1]))
+    if best_match:
+        path_parts, path_str = best_match
+        new_segments = [s.lower() for s in best_remainder.split('_')]
+        return (list(path_parts) + new_segments, path_str + '.' + '.'.join(new_segments), True)
+    new_segments = [s.lower() for s in env_name.split('_')]
+    return (new_segments, '.'.join(new_segments), True)
+
+
+def _linear_index(ctx, obj, path, paths):
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            _linear_index(ctx, value, path + [key], paths)
+    else:
+        path_str = '.'.join(path)
+        paths.setdefault(ctx._normalize_path(path_str), []).append((path, path_str))
+
+
+@pytest.fixture
+def ctx(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    for name in [n for n in os.environ if n.startswith('BUILDERTEST_')]:
+        monkeypatch.delenv(name)
+    for key, value in CONFIG.items():
+        with open(tmp_path / f'{key}.config.yaml', 'w') as f:
+            yamlio.dump({key: value}, f, default_flow_style=False, sort_keys=False)
+    return BuildContext(str(tmp_path), env_prefix='BUILDERTEST_')
+
+
+def _names(paths, rng):
+    """Env names hitting exact paths, prefixes with extra segments, and nothing."""
+    names = set(paths)
+    for normalized in paths:
+        segments = normalized.split('_')
+        for cut in range(1, len(segments) + 1):
+            names.add('_'.join(segments[:cut]))
+            names.add('_'.join(segments[:cut] + ['EXTRA']))
+            names.add('_'.join(segments[:cut] + ['X', 'Y']))
+    for _ in range(200):
+        names.add('_'.join(rng.choice(['A', 'B', 'C', 'D', 'NETWORK', 'DNS', 'SERVERS', 'X', ''])
+                           for _ in range(rng.randint(1, 5))))
+    return sorted(names)
+
+
+def test_trie_matches_linear_scan(ctx):
+    paths = {}
+    _linear_index(ctx, ctx._data, [], paths)
+    assert any(len(candidates) > 1 for candidates in paths.values())  # conflicting paths present
+    for name in _names(paths, random.Random(0)):
+        assert ctx._find_best_path(name) == _linear_find_best_path(ctx, paths, name), name
+
+
+def test_env_overrides_apply_like_linear_scan(tmp_path, monkeypatch, ctx):
+    overrides = {
+        'BUILDERTEST_A_B_C': '10',
+        'BUILDERTEST_A_B_C_D': 'true',
+        'BUILDERTEST_NETWORK_DNS_SERVERS': 'x',
+        'BUILDERTEST_NETWORK_INTERFACES_ETH0_MTU': '1500',
+        'BUILDERTEST_DEEP_L1_L2_L3_L4_VALUE': '7.5',
+        'BUILDERTEST_NEW_TOP_LEVEL': 'fresh',
+    }
+    paths = {}
+    _linear_index(ctx, ctx._data, [], paths)
+    expected = {}
+    for name, value in overrides.items():
+        parts = _linear_find_best_path(ctx, paths, name[len('BUILDERTEST_'):])[0]
+        expected['.'.join(parts)] = ctx._cast_value(value)
+    for name, value in overrides.items():
+        monkeypatch.setenv(name, value)
+    overridden = BuildContext(str(tmp_path), env_prefix='BUILDERTEST_')
+    for dotted, value in expected.items():
+        node = overridden._data
+        for part in dotted.split('.'):
+            node = node[part]
+        assert node == value, dotted
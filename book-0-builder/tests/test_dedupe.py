@@ -0,0 +1,89 @@
+"""Anchored dedupe output must load back equal to its input."""
+
+import copy
+import json
+import random
+
+import pytest
+
+from builder import dedupe, renderer, yamlio
+from builder.context import BuildContext
+
+SCRIPT = ''.join(f'echo "step {n}: configure the component"\n' for n in range(20))
+
+
+def _round_trip(tree, min_size=64):
+    """Dump tree without the built-in check; return (text, loaded)."""
+    original = copy.deepcopy(tree)
+    text, stats = dedupe.dump(tree, min_size, verify=False)
+    assert tree == original
+    loaded = yamlio.safe_load(text)
+    # Equal including key order
+    assert json.dumps(loaded) == json.dumps(tree)
+    return text, stats
+
+
+def test_repeated_values():
+    entry = {'path': '/usr/local/bin/a.sh', 'permissions': '0755', 'content': SCRIPT}
+    tree = {
+        'write_files': [entry, dict(entry), {'path': '/b', 'content': SCRIPT}],
+        'runcmd': [['sh', '-c', SCRIPT], ['sh', '-c', SCRIPT]],
+        'bootcmd': [SCRIPT],
+        'small': ['x', 'x'],
+    }
+    text, stats = _round_trip(tree)
+    assert '&id001' in text and '*id001' in text
+    assert stats['repeats'] > 0
+    assert text.count(SCRIPT.splitlines()[0]) == 1
+
+
+def test_below_min_size_is_not_shared():
+    tree = {'a': 'short value', 'b': 'short value'}
+    text, stats = _round_trip(tree, min_size=64)
+    assert '&' not in text
+    assert stats == {'repeats': 0, 'bytes': 0}
+
+
+def test_equal_dicts_in_different_key_order():
+    first = {'path': '/a', 'content': SCRIPT}
+    second = {'content': SCRIPT, 'path': '/a'}
+    _round_trip({'one': first, 'two': second, 'three': dict(first)})
+
+
+def test_dedupe_text_keeps_header():
+    text = '#cloud-config\n' + yamlio.dump({'a': SCRIPT, 'b': SCRIPT}, default_flow_style=False)
+    deduped, _ = dedupe.dedupe_text(text, 64)
+    assert deduped.startswith('#cloud-config\n')
+    assert yamlio.safe_load(deduped) == yamlio.safe_load(text)
+
+
+def test_rendered_config(repo_tree, monkeypatch):
+    monkeypatch.setenv('BUILDER_SALT_SECRET', 'test')
+    renderer.use_render_cache(False)
+    tree = renderer.BuildPlan(BuildContext('config')).cloud_init(exclude=['base'])
+    _round_trip(tree)
+    # Every write_files entry repeated, as for a tree embedded twice
+    _round_trip({'cloud_init': tree, 'copy': copy.deepcopy(tree)}, min_size=16)
+
+
+def _random_tree(rng, pool, depth=0):
+    kind = rng.randint(0, 5 if depth < 4 else 2)
+    if kind == 0:
+        return rng.choice(pool)
+    if kind == 1:
+        return rng.choice([1, 2.5, True, None, 'x', '', 'multi\nline\n'])
+    if kind == 2:
+        return rng.choice(pool) + rng.choice(['', ' ', '\n'])
+    if kind <= 4:
+        return {f'k{n}': _random_tree(rng, pool, depth + 1) for n in range(rng.randint(0, 4))}
+    return [_random_tree(rng, pool, depth + 1) for _ in range(rng.randint(0, 4))]
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_generated_trees(seed):
+    rng = random.Random(seed)
+    pool = [SCRIPT[:rng.randint(10, len(SCRIPT))] for _ in range(4)] + ['é' * 80, 'a: b\n' * 20]
+    tree = {f'top{n}': _random_tree(rng, pool) for n in range(rng.randint(1, 6))}
+    # Repeat whole subtrees too
+    tree['again'] = copy.deepcopy(tree)
+    _round_trip(tree, min_size=rng.choice([1, 16, 64, 256]))
@@ -0,0 +1,69 @@
+"""make dependency rules: config prerequisites of rendered artifacts."""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from builder import deps
+
+FRAGMENT = """\
+{% if testing is defined and testing %}
+packages: [testing-tools]
+{% endif %}
+hostname: {{ network.hostname }}
+{{ smtp.relay if smtp is defined else '' }}
+"""
+
+MAKEFILE = """\
+out/cloud-init.yaml:
+\tmkdir -p out && echo built >> build.log && touch $@
+include cloud-init.d
+"""
+
+
+def _prerequisites(tree):
+    rules = deps.dependency_rules(tree.context(), 'out')['cloud-init.d']
+    return rules.split('\n\n')[0].split(' \\\n  ')[1:]
+
+
+def test_only_existing_files_are_prerequisites(fragment_tree):
+    fragment_tree.fragment(template=FRAGMENT)
+
+    prerequisites = _prerequisites(fragment_tree)
+    assert 'config/network.config.yaml' in prerequisites
+    assert 'config' in prerequisites
+    assert 'config/smtp.config.yaml' not in prerequisites
+    assert 'config/testing.config.yaml' not in prerequisites
+    assert 'book-1-foundation' not in prerequisites
+    assert all(os.path.exists(path) for path in prerequisites)
+
+
+def test_existing_testing_config_is_a_prerequisite(fragment_tree):
+    fragment_tree.fragment(template=FRAGMENT)
+    fragment_tree.config('testing', 'testing: false\n')
+    assert 'config/testing.config.yaml' in _prerequisites(fragment_tree)
+
+
+@pytest.mark.skipif(shutil.which('make') is None, reason='needs GNU make')
+def test_make_rebuilds_only_when_config_changes(fragment_tree):
+    root = fragment_tree.root
+    fragment_tree.fragment(template=FRAGMENT)
+    fragment_tree.write('Makefile', MAKEFILE)
+
+    def make():
+        (root / 'cloud-init.d').write_text(deps.dependency_rules(fragment_tree.context(), 'out')['cloud-init.d'])
+        subprocess.run(['make', '-s', 'out/cloud-init.yaml'], cwd=root, check=True, capture_output=True)
+        return (root / 'build.log').read_text().count('built')
+
+    assert make() == 1
+    # Prerequisites well in the past, so timestamp granularity cannot matter
+    for path in [*_prerequisites(fragment_tree), 'out/cloud-init.yaml']:
+        past = 1_000_000_000 if path != 'out/cloud-init.yaml' else 1_000_000_100
+        os.utime(root / path, (past, past))
+    assert make() == 1
+
+    fragment_tree.config('smtp', 'smtp:\n  relay: mail\n')
+    assert make() == 2
+    assert make() == 2
@@ -0,0 +1,92 @@
+"""dump_cloud_config must write exactly what yamlio.dump writes."""
+
+import random
+
+import pytest
+
+from builder import emitter, packing, renderer, yamlio
+from builder.context import BuildContext
+
+
+def _pyyaml(data):
+    return yamlio.dump(data, default_flow_style=False, sort_keys=False, width=emitter.WIDTH)
+
+
+def _fast_path(data, monkeypatch):
+    """Return dump_cloud_config output, failing if it fell back to PyYAML."""
+    def fallback(*args, **kwargs):
+        raise AssertionError('fell back to yamlio.dump')
+    with monkeypatch.context() as m:
+        m.setattr(emitter.yamlio, 'dump', fallback)
+        return emitter.dump_cloud_config(data)
+
+
+@pytest.fixture
+def rendered(repo_tree, monkeypatch):
+    monkeypatch.setenv('BUILDER_SALT_SECRET', 'test')
+    renderer.use_render_cache(False)
+    plan = renderer.BuildPlan(BuildContext('config'))
+    # The base fragment needs the autoinstall template, which is not in the tree
+    return plan.cloud_init(exclude=['base'])
+
+
+def test_rendered_config(rendered, monkeypatch):
+    assert _fast_path(rendered, monkeypatch) == _pyyaml(rendered)
+
+
+def test_rendered_config_packed(rendered, monkeypatch):
+    packed, _ = packing.pack_write_files(rendered, threshold=64)
+    assert _fast_path(packed, monkeypatch) == _pyyaml(packed)
+
+
+CASES = {
+    'multiline': {'write_files': [{'path': '/etc/x', 'content': 'line 1\nline 2\n'}]},
+    'multiline_no_trailing_newline': {'a': 'one\ntwo'},
+    'multiline_trailing_newlines': {'a': 'one\ntwo\n\n\n'},
+    'multiline_leading_space': {'a': '  indented\nnext\n'},
+    'multiline_trailing_space': {'a': 'one \ntwo\n'},
+    'multiline_in_list': {'runcmd': ['echo a\necho b\n', ['sh', '-c', 'x\ny']]},
+    'quoted_keys': {'a: b': 1, 'yes': 2, '123': 3, '-x': 4, '#c': 5, 'null': 6, '~': 7, "it's": 8},
+    'quoted_values': {'v': ['yes', 'No', '1.5', '0x1F', '', ' pad', 'pad ', '- x', 'a #b', "'q'", '"dq"',
+                            '*ref', '&a', '!tag', '%p', '@at', '`bt', '---', '...', ':', '?', 'a:']},
+    'empty_containers': {'a': {}, 'b': [], 'c': [{}, [], {'d': []}], 'e': {'f': {}}},
+    'scalars': {'i': 1, 'n': -2, 'f': 1.5, 'e': 1e20, 'inf': float('inf'), 't': True, 'none': None},
+    'non_ascii': {'motd': 'café ☕', 'ключ': 'значение', 'multi': 'über\nstraße\n', 'emoji': ['🎉']},
+    'control_characters': {'tab': 'a\tb', 'bell': 'a\x07b', 'crlf': 'a\r\nb'},
+    'long_line': {'cmd': ' '.join(['word'] * 400), 'quoted': ': ' + 'x ' * 600},
+    'long_key': {'k' * 200: 'v'},
+    'int_keys': {1: 'a', 2: {'b': 'c'}},
+    'shared_list': (lambda shared: {'a': shared, 'b': shared})(['x']),
+}
+
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_cases(name):
+    data = CASES[name]
+    assert emitter.dump_cloud_config(data) == _pyyaml(data)
+
+
+def _random_string(rng):
+    pieces = ['a', 'word', ' ', '  ', '\n', ':', ': ', '#', ' #', '-', '- ', 'yes', 'null', '1', '0.5',
+              "'", '"', '{', '[', '*', '&', '!', '|', '>', '%', '@', '`', ',', '?', 'é', '日本', '\t']
+    return ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 8)))
+
+
+def _random_value(rng, depth):
+    kind = rng.randint(0, 9 if depth < 4 else 5)
+    if kind <= 3:
+        return _random_string(rng)
+    if kind == 4:
+        return rng.choice([0, -7, 12345, 2.5, -0.0, 1e-5, True, False, None])
+    if kind == 5:
+        return '\n'.join(_random_string(rng) for _ in range(rng.randint(1, 4))) + rng.choice(['', '\n', '\n\n'])
+    if kind <= 7:
+        return {_random_string(rng) or 'k': _random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+    return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_generated_trees(seed):
+    rng = random.Random(seed)
+    data = {_random_string(rng) or 'k': _random_value(rng, 0) for _ in range(rng.randint(1, 6))}
+    assert emitter.dump_cloud_config(data) == _pyyaml(data)
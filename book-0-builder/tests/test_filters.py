@@ -0,0 +1,111 @@
+"""sha512_hash: SHA-crypt spec vectors and deterministic salts."""
+
+import base64
+import hashlib
+import hmac
+import random
+import string
+import warnings
+
+import pytest
+
+from builder import filters
+
+# Test vectors from the SHA-crypt specification (Drepper), SHA-512 part:
+# (salt, rounds, password, expected hash)
+SPEC_VECTORS = [
+    ('saltstring', 5000, 'Hello world!',
+     'svn8UoSVapNtMuq1ukKS4tPQd8iKwSMHWjl/O817G3uBnIFNjnQJuesI68u4OTLiBFdcbYEdFCoEOfaS35inz1'),
+    ('saltstringsaltstring', 10000, 'Hello world!',
+     'OW1/O6BYHV6BcXZu8QVeXbDWra3Oeqh0sbHbbMCVNSnCM/UrjmM0Dp8vOuZeHBy/YTBmSK6H9qs/y3RnOaw5v.'),
+    ('toolongsaltstring', 5000, 'This is just a test',
+     'lQ8jolhgVRVhY4b5pZKaysCLi0QBxGoNeKQzQ3glMhwllF7oGDZxUhx1yxdYcz/e1JSbq3y6JMxxl8audkUEm0'),
+    ('anotherlongsaltstring', 1400,
+     'a very much longer text to encrypt.  This one even stretches over morethan one line.',
+     'POfYwTEok97VWcjxIiSOjiykti.o/pQs.wPvMxQ6Fm7I6IoYN3CmLs66x9t0oSwbtEW7o7UmJEiDwGqd8p4ur1'),
+    ('short', 77777, 'we have a short salt string but not a short password',
+     'WuQyW2YR.hBNpjjRhpYD/ifIw05xdfeEyQoMxIXbkvr0gge1a1x3yRULJ5CCaUeOxFmtlcGZelFl5CxtgfiAc0'),
+    ('asaltof16chars..', 123456, 'a short string',
+     'BtCwjqMJGx5hrJhZywWvt0RLE8uZ4oPwcelCjmw2kSYu.Ec6ycULevoBK25fs2xXgMNrCzIMVcgEJAstJeonj1'),
+    ('roundstoolow', 1000, 'the minimum number is still observed',
+     'kUMsbe306n21p9R.FRkW3IGn.S9NPN0x50YhH1xhLsPuWGsUSklZt58jaTfF4ZEQpyUNGc0dqbpBYYBaHHrsX.'),
+]
+
+
+@pytest.fixture
+def salt_secret(monkeypatch):
+    """Clear any salt secret; tests set one through the environment."""
+    monkeypatch.delenv(filters.SALT_SECRET_ENV, raising=False)
+    filters.set_salt_secret(None)
+    yield
+    filters.set_salt_secret(None)
+
+
+def _split(hashed):
+    """Return (rounds, salt, hash) of a $6$rounds=N$salt$hash string."""
+    _, scheme, rounds, salt, digest = hashed.split('$')
+    assert scheme == '6'
+    assert rounds.startswith('rounds=')
+    return int(rounds[len('rounds='):]), salt, digest
+
+
+@pytest.mark.parametrize('salt, rounds, password, expected', SPEC_VECTORS)
+def test_spec_vectors(salt, rounds, password, expected):
+    # The spec truncates salts to 16 characters
+    assert filters._sha512_crypt(password, salt[:16], rounds) == expected
+
+
+def test_rounds_are_clamped(salt_secret, monkeypatch):
+    monkeypatch.setenv(filters.SALT_SECRET_ENV, 'secret')
+    assert _split(filters.sha512_hash('pw', rounds=10))[0] == filters.MIN_ROUNDS
+    assert _split(filters.sha512_hash('pw', rounds='7000'))[0] == 7000
+
+
+@pytest.mark.parametrize('rounds', [1000, 1001, 4999, 5041, 5042, 12345])
+def test_matches_system_crypt(salt_secret, rounds):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        crypt = pytest.importorskip('crypt')
+    rng = random.Random(rounds)
+    for length in (0, 1, 63, 64, 65, 200):
+        password = ''.join(rng.choice(string.printable) for _ in range(length))
+        hashed = filters.sha512_hash(password, rounds=rounds)
+        if crypt.crypt(password, hashed) is None:
+            pytest.skip('system crypt lacks SHA-512')
+        assert crypt.crypt(password, hashed) == hashed
+
+
+def test_secret_salt_is_deterministic(salt_secret, monkeypatch):
+    monkeypatch.setenv(filters.SALT_SECRET_ENV, 'secret')
+    first = filters.sha512_hash('pw', key='identity.password')
+    assert filters.sha512_hash('pw', key='identity.password') == first
+
+    digest = hmac.new(b'secret', b'identity.password', hashlib.sha256).digest()
+    rounds, salt, _ = _split(first)
+    assert rounds == filters.DEFAULT_ROUNDS
+    assert salt == base64.b64encode(digest[:12], altchars=b'./').decode('ascii')
+    assert len(salt) == 16
+
+    assert _split(filters.sha512_hash('pw', key='smtp.password'))[1] != salt
+    assert filters.nondeterministic_filters() == set()
+    assert filters.config_digest() is not None
+
+    monkeypatch.setenv(filters.SALT_SECRET_ENV, 'other')
+    assert _split(filters.sha512_hash('pw', key='identity.password'))[1] != salt
+
+
+def test_set_salt_secret_overrides_environment(salt_secret, monkeypatch):
+    monkeypatch.setenv(filters.SALT_SECRET_ENV, 'secret')
+    from_env = filters.sha512_hash('pw', key='k')
+    filters.set_salt_secret('other')
+    assert filters.sha512_hash('pw', key='k') != from_env
+    assert filters.sha512_hash('pw', key='k') == filters.sha512_hash('pw', key='k')
+
+
+def test_salt_is_random_without_secret(salt_secret):
+    hashes = {filters.sha512_hash('pw', key='identity.password') for _ in range(5)}
+    assert len(hashes) == 5
+    for hashed in hashes:
+        assert len(_split(hashed)[1]) == 16
+    assert filters.nondeterministic_filters() == {'sha512_hash'}
+    assert filters.config_digest() is None
@@ -0,0 +1,73 @@
+"""render_fleet output must match rendering each host on its own."""
+
+import pytest
+
+from builder import fleet, renderer
+from builder.context import BuildContext
+from conftest import output_files
+
+LINES = ''.join(f'      echo "step {n}: configure the service"\n' for n in range(40))
+
+
+@pytest.fixture
+def tree(fragment_tree):
+    fragment_tree.config('identity', 'identity:\n  username: admin\n')
+    fragment_tree.fragment(
+        'shared',
+        template='runcmd:\n  - echo {{ identity.username }}\n'
+                 '  - echo \'{{ scripts["user.sh"] | to_base64 }}\'\n',
+        scripts={'user.sh': 'useradd {{ identity.username }}\n'},
+        iso_required=True)
+    fragment_tree.fragment(
+        'host',
+        template='hostname: {{ network.hostname }}\n'
+                 'write_files:\n  - path: /etc/motd\n    content: |\n' + LINES
+                 + 'runcmd:\n  - echo \'{{ scripts["net.sh"] | to_base64 }}\'\n',
+        scripts={'net.sh': 'hostnamectl set-hostname {{ network.hostname }}\n'},
+        build_order=2,
+        iso_required=True)
+    fragment_tree.write(renderer.AUTOINSTALL_TEMPLATE,
+                        'autoinstall:\n  user-data:\n    {{ cloud_init | to_yaml | indent(4) }}\n')
+    fragment_tree.write('hosts/web1.yaml', 'network:\n  hostname: web1\n')
+    # Same username as the base config, so identity stays shared
+    fragment_tree.write('hosts/web2.yaml', 'network:\n  hostname: web2\nidentity:\n  username: admin\n')
+    return fragment_tree
+
+
+def _render_alone(tree, host, **plan_options):
+    renderer.reset_state()
+    overlay = fleet.load_overlays('hosts')[host]
+    ctx = BuildContext('config', overlay=overlay)
+    renderer.render_all(ctx, tree.root / 'alone' / host, plan=renderer.BuildPlan(ctx, **plan_options),
+                        artifacts_path=(tree.root / 'alone' / host / 'artifacts.yaml').as_posix())
+    return output_files(tree.root / 'alone' / host)
+
+
+def test_changed_keys(tree):
+    overlays = fleet.load_overlays('hosts')
+    host_ctxs = [BuildContext('config', overlay=overlay) for overlay in overlays.values()]
+    assert fleet.changed_keys(tree.context(), host_ctxs) == {'network'}
+
+
+def test_shared_results(tree):
+    records = renderer.select_fragments(for_iso=True)
+    shared = fleet.shared_results(tree.context(), {'network'}, records)
+    assert set(shared) == {('script', 'user.sh'), ('fragment', 'shared')}
+
+
+@pytest.mark.parametrize('jobs', [None, 2])
+def test_matches_single_host_renders(tree, jobs):
+    assert fleet.render_fleet('config', 'hosts', 'fleet', jobs=jobs) == ['web1', 'web2']
+    for host in ('web1', 'web2'):
+        files = output_files(tree.root / 'fleet' / host)
+        assert set(files) == {'scripts/user.sh', 'scripts/net.sh', 'cloud-init.yaml', 'user-data'}
+        assert f'hostname: {host}'.encode() in files['cloud-init.yaml']
+        assert files == _render_alone(tree, host)
+
+
+def test_pack_and_dedupe_apply_to_each_host(tree):
+    fleet.render_fleet('config', 'hosts', 'fleet', pack_threshold=64, dedupe_min_size=64)
+    for host in ('web1', 'web2'):
+        files = output_files(tree.root / 'fleet' / host)
+        assert files == _render_alone(tree, host, pack_threshold=64, dedupe_min_size=64)
+        assert files != _render_alone(tree, host)
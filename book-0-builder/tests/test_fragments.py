@@ -0,0 +1,101 @@
+"""FragmentIndex: rescans on build.yaml and directory changes, and
+ignores unusable cache files."""
+
+import json
+import os
+
+import pytest
+
+from builder import fragments, renderer
+
+CACHE = 'cache/fragments.json'
+
+
+def _index():
+    return fragments.FragmentIndex(['book-2-cloud'], cache_path=CACHE)
+
+
+def _touch(path, offset):
+    """Move path's mtime offset seconds away from its current one."""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + offset * 10**9))
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Count FragmentIndex rescans."""
+    count = []
+    scan = fragments.FragmentIndex._scan
+
+    def counting_scan(self):
+        count.append(1)
+        scan(self)
+
+    monkeypatch.setattr(fragments.FragmentIndex, '_scan', counting_scan)
+    return count
+
+
+def test_index_is_reused_while_unchanged(fragment_tree, scans):
+    fragment_tree.fragment('demo')
+    assert [r['name'] for r in _index().records()] == ['demo']
+    index = _index()
+    assert [r['name'] for r in index.records()] == ['demo']
+    index.records()
+    assert len(scans) == 1
+
+
+def test_build_yaml_change_rescans(fragment_tree, scans):
+    fragment_tree.fragment('first', build_order=1)
+    fragment_tree.fragment('second', build_order=2)
+    index = _index()
+    assert [r['name'] for r in index.records()] == ['first', 'second']
+
+    fragment_tree.write('book-2-cloud/first/build.yaml', 'name: first\nbuild_order: 3\nbuild_layer: 1\n')
+    _touch('book-2-cloud/first/build.yaml', 1)
+    assert [r['name'] for r in index.records()] == ['second', 'first']
+    # A fresh index validates the persisted one the same way
+    _touch('book-2-cloud/first/build.yaml', 1)
+    assert [r['name'] for r in _index().records()] == ['second', 'first']
+    assert len(scans) == 3
+
+
+def test_directory_change_rescans(fragment_tree, scans):
+    fragment_tree.fragment('demo')
+    index = _index()
+    assert index.get('demo')['scripts'] == {}
+
+    fragment_tree.write('book-2-cloud/demo/scripts/setup.sh.tpl', 'true\n')
+    _touch('book-2-cloud/demo/scripts', 1)
+    assert index.get('demo')['scripts'] == {'setup.sh': 'book-2-cloud/demo/scripts/setup.sh.tpl'}
+
+    fragment_tree.fragment('other', build_order=2)
+    _touch('book-2-cloud', 1)
+    assert [r['name'] for r in _index().records()] == ['demo', 'other']
+    assert len(scans) == 3
+
+
+@pytest.mark.parametrize('content', [
+    b'{"version": 1, "base_dirs": ["book-2-cloud"], "stamps": {',
+    b'\xff\xfe\x00garbage',
+    b'[]',
+    b'null',
+    b'{"version": 0, "base_dirs": ["book-2-cloud"], "fragments": []}',
+    b'{"version": 1, "base_dirs": ["book-2-cloud"]}',
+    b'{"version": 1, "base_dirs": ["book-2-cloud"], "stamps": [], "fragments": {}}',
+])
+def test_unusable_cache_is_ignored(fragment_tree, content):
+    fragment_tree.fragment('demo')
+    (fragment_tree.root / 'cache').mkdir()
+    (fragment_tree.root / CACHE).write_bytes(content)
+
+    assert [r['name'] for r in _index().records()] == ['demo']
+    with open(CACHE) as f:
+        assert json.load(f)['version'] == fragments.INDEX_VERSION
+
+
+def test_default_template_search_path_is_working_directory(fragment_tree):
+    fragment_tree.write('book-2-cloud/demo/fragment.yaml.tpl', 'hostname: {{ network.hostname }}\n')
+    env = renderer.create_environment()
+    assert env.loader.searchpath == ['.']
+    template = env.get_template('book-2-cloud/demo/fragment.yaml.tpl')
+    assert template.render(network={'hostname': 'host'}) == 'hostname: host\n'
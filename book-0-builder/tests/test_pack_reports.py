@@ -0,0 +1,54 @@
+"""BuildPlan.pack_reports labels reports with the artifacts written."""
+
+import pytest
+
+from builder import renderer
+
+CONTENT = ''.join(f'echo "line {n}: configuring the service"\n' for n in range(100))
+
+
+@pytest.fixture
+def tree(fragment_tree):
+    fragment_tree.fragment(
+        template='write_files:\n  - path: /usr/local/bin/demo.sh\n    content: |\n'
+                 + ''.join(f'      {line}\n' for line in CONTENT.splitlines()),
+        iso_required=True)
+    fragment_tree.write(renderer.AUTOINSTALL_TEMPLATE,
+                        'autoinstall:\n  user-data:\n    {{ cloud_init | to_yaml | indent(4) }}\n')
+    renderer.use_render_cache(False)
+    return fragment_tree
+
+
+def _plan(tree):
+    return renderer.BuildPlan(tree.context(), pack_threshold=1024)
+
+
+def test_cloud_init_for_iso_is_labelled_by_file(tree):
+    plan = _plan(tree)
+    renderer.render_cloud_init_to_file(plan.ctx, 'out/cloud-init.yaml', for_iso=True, plan=plan,
+                                       artifacts_path='out/artifacts.yaml')
+    [(artifact, report)] = plan.pack_reports()
+    assert artifact == 'cloud-init.yaml'
+    assert report[0]['fragment'] == 'demo'
+
+
+def test_user_data(tree):
+    plan = _plan(tree)
+    renderer.render_autoinstall(plan.ctx, plan=plan)
+    assert [artifact for artifact, _ in plan.pack_reports()] == ['user-data']
+
+
+def test_shared_selection_lists_both_artifacts(tree):
+    plan = _plan(tree)
+    renderer.render_cloud_init_to_file(plan.ctx, 'out/cloud-init.yaml', for_iso=True, plan=plan,
+                                       artifacts_path='out/artifacts.yaml')
+    renderer.render_autoinstall(plan.ctx, plan=plan)
+    assert [artifact for artifact, _ in plan.pack_reports()] == ['cloud-init.yaml, user-data']
+
+
+def test_separate_selections(tree):
+    plan = _plan(tree)
+    renderer.render_cloud_init_to_file(plan.ctx, 'out/cloud-init.yaml', plan=plan,
+                                       artifacts_path='out/artifacts.yaml')
+    renderer.render_autoinstall(plan.ctx, plan=plan)
+    assert [artifact for artifact, _ in plan.pack_reports()] == ['cloud-init.yaml', 'user-data']
@@ -0,0 +1,54 @@
+"""Fragments rendered in a process pool (-j) and all layers in one pass
+must match serial, single-layer renders."""
+
+import pytest
+
+from builder import renderer
+from builder.context import BuildContext
+from conftest import output_files
+
+
+def test_jobs_match_serial(render_tree):
+    ctx = BuildContext('config')
+    for jobs in (None, 4):
+        renderer.reset_state()
+        renderer.render_all(ctx, render_tree / f'out-{jobs}', plan=renderer.BuildPlan(ctx, jobs=jobs),
+                            artifacts_path=(render_tree / f'out-{jobs}' / 'artifacts.yaml').as_posix())
+    serial = output_files(render_tree / 'out-None')
+    assert {'cloud-init.yaml', 'user-data'} <= set(serial)
+    assert output_files(render_tree / 'out-4') == serial
+
+
+@pytest.mark.parametrize('jobs', [None, 4])
+def test_all_layers_match_single_layer(render_tree, jobs):
+    ctx = BuildContext('config')
+    layers = sorted(renderer.load_build_layers())
+    written = renderer.render_cloud_init_layers_to_files(
+        ctx, 'layers/cloud-init.yaml', layers, plan=renderer.BuildPlan(ctx, jobs=jobs),
+        artifacts_path='layers/artifacts.yaml')
+    assert len(written) == len(layers)
+    for layer in layers:
+        renderer.reset_state()
+        renderer.render_cloud_init_to_file(ctx, f'single/{layer}.yaml', layer=layer,
+                                           plan=renderer.BuildPlan(ctx), artifacts_path='single/artifacts.yaml')
+        assert ((render_tree / 'layers' / f'cloud-init.layer-{layer:02d}.yaml').read_bytes()
+                == (render_tree / 'single' / f'{layer}.yaml').read_bytes()), f'layer {layer}'
+
+
+def test_worker_errors_are_raised_in_build_order(fragment_tree):
+    fragment_tree.fragment('first', template='a: 1\n', build_order=1)
+    fragment_tree.fragment('second', template='b: [unclosed\n', build_order=2)
+    fragment_tree.fragment('third', template='c: {unclosed\n', build_order=3)
+    fragment_tree.fragment('fourth', template='d: 4\n', build_order=4)
+    ctx = fragment_tree.context()
+    renderer.use_render_cache(False)
+
+    errors = []
+    for jobs in (None, 4):
+        renderer.reset_state()
+        with pytest.raises(renderer.FragmentValidationError) as excinfo:
+            renderer.BuildPlan(ctx, jobs=jobs).cloud_init()
+        errors.append(excinfo.value)
+    serial, parallel = errors
+    assert parallel.fragment_name == serial.fragment_name == 'second'
+    assert str(parallel) == str(serial)
@@ -0,0 +1,54 @@
+"""Fragments get only the scripts they reference, and render as they did
+with every script."""
+
+from builder import renderer, yamlio
+from builder.context import BuildContext
+from builder.fragments import get_index
+
+
+def _script_nodes(plan):
+    return {key[1] for key in plan.results() if isinstance(key, tuple) and key[0] == 'script'}
+
+
+def test_fragments_render_as_with_every_script(render_tree):
+    plan = renderer.BuildPlan(BuildContext('config'))
+    scripts = plan.scripts()
+    assert scripts
+    for record in get_index().records():
+        if record['template'] is None:
+            continue
+        expected = yamlio.safe_load(renderer.render_text(plan.ctx, record['template'], scripts=scripts))
+        assert plan.fragment(record) == expected, record['name']
+
+
+def test_selection_renders_referenced_scripts(render_tree):
+    plan = renderer.BuildPlan(BuildContext('config'))
+    plan.cloud_init(include=['users', 'ssh'])
+    assert _script_nodes(plan) == {'user-setup.sh'}
+
+    plan = renderer.BuildPlan(BuildContext('config'))
+    plan.cloud_init(layer=1)
+    assert _script_nodes(plan) == {'net-setup.sh'}
+
+
+def test_referenced_scripts(fragment_tree):
+    fragment_tree.write('const.tpl', '{{ scripts["a.sh"] }} {{ scripts[\'b.sh\'] | to_base64 }}\n')
+    fragment_tree.write('loop.tpl', '{% for name in scripts %}{{ name }}{% endfor %}\n')
+    fragment_tree.write('dynamic.tpl', '{{ scripts[network.hostname ~ ".sh"] }}\n')
+    fragment_tree.write('include.tpl', '{% include "const.tpl" %}\n')
+    fragment_tree.write('none.tpl', 'hostname: {{ network.hostname }}\n')
+    assert renderer.referenced_scripts('const.tpl') == {'a.sh', 'b.sh'}
+    assert renderer.referenced_scripts('loop.tpl') is None
+    assert renderer.referenced_scripts('dynamic.tpl') is None
+    assert renderer.referenced_scripts('include.tpl') is None
+    assert renderer.referenced_scripts('none.tpl') == set()
+
+
+def test_undeterminable_template_gets_every_script(fragment_tree):
+    fragment_tree.fragment('one', template='{% for name in scripts %}- {{ name }}\n{% endfor %}',
+                           scripts={'a.sh': 'a\n'})
+    fragment_tree.fragment('two', template='b: {{ scripts["b.sh"] }}\n', scripts={'b.sh': 'b\n'},
+                           build_order=2)
+    plan = renderer.BuildPlan(fragment_tree.context())
+    assert plan.fragment(get_index().get('one')) == ['a.sh', 'b.sh']
+    assert plan.fragment(get_index().get('two')) == {'b': 'b'}
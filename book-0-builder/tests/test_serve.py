@@ -0,0 +1,57 @@
+"""Seed server: loopback by default, no error details in responses."""
+
+import inspect
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from builder import serve
+
+
+class FailingSeed(serve.SeedServer):
+    def get(self, host, name):
+        if name == 'user-data':
+            raise ValueError('identity.password: hunter2')
+        return super().get(host, name)
+
+
+@pytest.fixture
+def server(workdir):
+    (workdir / 'config').mkdir()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), serve.SeedRequestHandler)
+    httpd.seed = FailingSeed('config')
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_binds_loopback_by_default():
+    assert serve.DEFAULT_BIND == '127.0.0.1'
+    assert inspect.signature(serve.serve).parameters['host'].default == serve.DEFAULT_BIND
+
+
+def test_error_details_are_logged_not_sent(server, capsys):
+    with pytest.raises(urllib.error.HTTPError) as info:
+        urllib.request.urlopen(f'{server}/user-data')
+    assert info.value.code == 500
+    body = info.value.read().decode()
+    assert 'hunter2' not in body
+    assert 'ValueError' not in body
+    assert 'hunter2' in capsys.readouterr().err
+
+
+def test_vendor_data(server):
+    with urllib.request.urlopen(f'{server}/vendor-data') as response:
+        assert response.read() == serve.VENDOR_DATA
+        assert response.headers['ETag']
+
+
+def test_unknown_path(server):
+    with pytest.raises(urllib.error.HTTPError) as info:
+        urllib.request.urlopen(f'{server}/unknown/user-data')
+    assert info.value.code == 404
@@ -0,0 +1,26 @@
+"""WatchSession: warm rebuilds from template sources."""
+
+from jinja2 import FileSystemLoader
+
+from builder import renderer, watch
+
+
+def test_session_renders_from_sources(fragment_tree):
+    fragment = fragment_tree.fragment()
+    renderer.compile_templates()
+    renderer.use_render_cache(False)
+
+    session = watch.WatchSession('config', 'out', artifacts_path='out/artifacts.yaml')
+    env = renderer.get_environment()
+    assert isinstance(env.loader, FileSystemLoader)
+    assert env.auto_reload
+
+    written, _ = session.build()
+    assert 'out/cloud-init.yaml' in written
+    assert session.build()[0] == []
+
+    fragment_tree.fragment(template='hostname: {{ network.hostname }}\nfqdn: {{ network.hostname }}.lan\n')
+    written, _ = session.build([fragment.as_posix()])
+    assert written == ['out/cloud-init.yaml']
+    assert 'fqdn: host.lan' in (fragment_tree.root / 'out' / 'cloud-init.yaml').read_text()
+    assert renderer.get_environment() is env
@@ -10,7 +10,7 @@ autoinstall:
   identity:
     hostname: {{ network.hostname }}
     username: {{ identity.username }}
-    password: {{ identity.password | sha512_hash }}
+    password: {{ identity.password | sha512_hash(key='identity.password') }}
 
   # Network: disabled during install - configured via early-commands
   network:
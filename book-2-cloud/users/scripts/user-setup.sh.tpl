@@ -28,7 +28,7 @@ if ! id -u {{ identity.username }} >/dev/null 2>&1; then
 fi
 
 # Set password (hashed)
-echo '{{ identity.username }}:{{ identity.password | sha512_hash }}' | chpasswd -e
+echo '{{ identity.username }}:{{ identity.password | sha512_hash(key='identity.password') }}' | chpasswd -e
 
 # Configure passwordless sudo
 echo '{{ identity.username }} ALL=(ALL) NOPASSWD:ALL' > /etc/sudoers.d/{{ identity.username }}